@@ -2,15 +2,131 @@ from django.contrib import admin
 
 # Register your models here.
 
-from django.contrib import admin
-from .models import Post, Category, Tag
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.html import format_html
+
+from .models import Post, PostImage, Category, Tag, Task
+from .paginator import EstimatedCountPaginator
+from .publishing import publish_posts, unpublish_posts
+from .signals import posts_changed_in_bulk
+
+
+class PostActionForm(ActionForm):
+    # 显示在列表页“动作”下拉框旁边，供批量修改分类、标签的动作选择目标
+    category = forms.ModelChoiceField(Category.objects.all(), required=False, label='分类')
+    tag = forms.ModelChoiceField(Tag.objects.all(), required=False, label='标签')
+
+
+# 在文章编辑页上传图片，复制 Markdown 代码粘贴到正文中。缩略图由后台任务生成，见 blog/images.py
+class PostImageInline(admin.TabularInline):
+    model = PostImage
+    extra = 1
+    fields = ['image', 'preview', 'markdown']
+    readonly_fields = ['preview', 'markdown']
+
+    def preview(self, obj):
+        thumbnail = obj.get_variants().get('thumbnail') if obj.pk else None
+        if not thumbnail:
+            return '-'
+        return format_html('<img src="{}" style="max-height: 80px">', obj.image.storage.url(thumbnail))
+    preview.short_description = '缩略图'
+
+    def markdown(self, obj):
+        return '![]({})'.format(obj.image.url) if obj.pk else '-'
+    markdown.short_description = 'Markdown'
+
 
 class PostAdmin(admin.ModelAdmin):
     # list_display 是在文章列表页面显示的字段
     # fields是在post详情页展示的字段
-    list_display = ['title', 'created_time', 'modified_time', 'category', 'author']
+    list_display = ['title', 'status', 'created_time', 'modified_time', 'category', 'author']
     # list = ['title', 'created_time', 'modified_time', 'category', 'author']
-    fields = ['title', 'body', 'excerpt', 'category', 'tags']
+    fields = ['title', 'body', 'excerpt', 'category', 'tags', 'status', 'pub_time']
+    inlines = [PostImageInline]
+
+    # 列表页显示分类和作者，用 JOIN 一次查出来，否则每一行都要各查询一次
+    list_select_related = ['category', 'author']
+    # 分类、标签、时间过滤都可以走索引：外键和多对多中间表自带索引，created_time 有 (created_time, id) 索引
+    list_filter = ['status', 'category', 'tags', 'created_time']
+    date_hierarchy = 'created_time'
+    search_fields = ['title']
+    # 分类和标签用自动补全选择，不需要在编辑页一次加载全部选项
+    autocomplete_fields = ['category', 'tags']
+    # 没有过滤条件时使用估计的总数，过滤后也不再额外统计全部文章的数量
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # 后台要管理全部文章，包括草稿和定时发布的文章，不能使用只包含已发布文章的默认 Manager
+        queryset = Post.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        # 渲染后的正文和目录在后台用不到，不需要查询这两个大字段
+        return queryset.defer('rendered_body', 'rendered_toc', 'plain_text')
+
+    # 批量动作直接用一条 UPDATE / INSERT / DELETE 修改全部选中的文章，不逐篇调用 save，
+    # 同时更新 modified_time，让片段缓存和增量导出知道这些文章变化了；最后只清除一次缓存
+    action_form = PostActionForm
+    actions = ['publish', 'unpublish', 'move_to_category', 'add_tag', 'remove_tag']
+
+    def _action_target(self, request, name):
+        field = self.action_form.base_fields[name]
+        try:
+            target = field.clean(request.POST.get(name))
+        except ValidationError:
+            target = None
+        if target is None:
+            self.message_user(request, '请先选择{}'.format(field.label), messages.WARNING)
+        return target
+
+    def publish(self, request, queryset):
+        count = publish_posts(queryset)
+        self.message_user(request, '已发布 {} 篇文章'.format(count))
+    publish.short_description = '发布选择的文章'
+
+    def unpublish(self, request, queryset):
+        count = unpublish_posts(queryset)
+        self.message_user(request, '已将 {} 篇文章改为草稿'.format(count))
+    unpublish.short_description = '将选择的文章改为草稿'
+
+    def move_to_category(self, request, queryset):
+        category = self._action_target(request, 'category')
+        if category is None:
+            return
+        count = queryset.update(category=category, modified_time=timezone.now())
+        posts_changed_in_bulk()
+        self.message_user(request, '已将 {} 篇文章移动到分类“{}”'.format(count, category))
+    move_to_category.short_description = '移动到选择的分类'
+
+    def add_tag(self, request, queryset):
+        tag = self._action_target(request, 'tag')
+        if tag is None:
+            return
+        pks = list(queryset.values_list('pk', flat=True))
+        Post.tags.through.objects.bulk_create(
+            [Post.tags.through(post_id=pk, tag_id=tag.pk) for pk in pks],
+            ignore_conflicts=True,
+        )
+        Post.all_objects.filter(pk__in=pks).update(modified_time=timezone.now())
+        posts_changed_in_bulk()
+        self.message_user(request, '已为 {} 篇文章添加标签“{}”'.format(len(pks), tag))
+    add_tag.short_description = '添加选择的标签'
+
+    def remove_tag(self, request, queryset):
+        tag = self._action_target(request, 'tag')
+        if tag is None:
+            return
+        pks = list(queryset.filter(tags=tag).values_list('pk', flat=True))
+        Post.tags.through.objects.filter(post_id__in=pks, tag=tag).delete()
+        Post.all_objects.filter(pk__in=pks).update(modified_time=timezone.now())
+        posts_changed_in_bulk()
+        self.message_user(request, '已从 {} 篇文章中移除标签“{}”'.format(len(pks), tag))
+    remove_tag.short_description = '移除选择的标签'
 
     # Postadmin 继承自 ModelAdmin，它有一个 save_model 方法，这个方法只有一行代码：obj.save()。
     # 它的作用就是将此 Modeladmin 关联注册的 model 实例（这里 Modeladmin 关联注册的是 Post）保存到数据库。
@@ -20,7 +136,27 @@ class PostAdmin(admin.ModelAdmin):
         obj.author = request.user
         super().save_model(request, obj, form, change)
 
+
+# 分类和标签需要 search_fields 才能在 PostAdmin 中使用自动补全
+class CategoryAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
+
+class TagAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
 admin.site.register(Post, PostAdmin)
-admin.site.register(Category)
-admin.site.register(Tag)
+admin.site.register(Category, CategoryAdmin)
+admin.site.register(Tag, TagAdmin)
+
+
+# 后台任务只读展示，便于查看执行失败的任务和错误信息，见 blog/tasks.py
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'args', 'status', 'attempts', 'run_at', 'created_time']
+    list_filter = ['status']
+    readonly_fields = ['name', 'args', 'key', 'status', 'attempts', 'run_at', 'started_time', 'last_error', 'created_time']
+
+    def has_add_permission(self, request):
+        return False
 
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,323 @@
+# 只读的 JSON 接口，供移动客户端使用，挂载在 /api/v1/ 下。
+#
+# - fields=id,title,...       只返回指定的字段，并且只查询这些字段需要的列，列表默认不返回正文
+# - include=category,tags,author
+#                              把关联的分类、标签、作者放在响应的 included 中，每种关联只查询一次
+# - cursor=...&limit=10        游标分页，响应中的 next_cursor 用于请求下一页，翻页再深也只需要一次索引查询
+# - 支持 ETag / If-None-Match 条件请求，内容没有变化时返回 304，且不会序列化数据
+#
+# 正文和目录直接读取后台任务渲染好的 rendered_body 和 rendered_toc，接口不会执行 Markdown 解析；
+# 刚保存、还没有渲染完成的文章 body_html 和 toc 为 null，并带有 "pending": true，客户端稍后再请求即可。
+#
+# ETag 由数据的版本号和查询参数生成（见 blog/http_cache.py），判断是否返回 304 只需要读取缓存，不查询数据库。
+import base64
+import hashlib
+import time
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.http import JsonResponse
+from django.middleware.http import ConditionalGetMiddleware
+from django.urls import path, reverse
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import decorator_from_middleware
+from django.views.decorators.http import condition, require_GET
+
+from comments.models import Comment
+from .http_cache import API, API_VERSION_KEY, cache_policy, comments_version_key, get_version
+from .models import Category, Post, Tag
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# 阅读量变化不更新版本号，文章列表的 ETag 每隔这么多秒变化一次，列表中的阅读量最多这么久之后更新
+VIEWS_ETAG_INTERVAL = 300
+
+# 接口字段与需要查询的列
+POST_FIELDS = {
+    'id': ['id'],
+    'title': ['title'],
+    'url': ['id'],
+    'excerpt': ['excerpt'],
+    'created_time': ['created_time'],
+    'modified_time': ['modified_time'],
+    'views': ['views'],
+    'category': ['category_id'],
+    'author': ['author_id'],
+    'tags': [],
+    'body_html': ['rendered_body'],
+    'toc': ['rendered_toc', 'rendered_body'],
+}
+POST_LIST_FIELDS = [f for f in POST_FIELDS if f not in ('body_html', 'toc')]
+POST_INCLUDES = ('category', 'tags', 'author')
+
+# parent 是回复的评论的 id，客户端可以据此还原评论树
+COMMENT_FIELDS = ('id', 'name', 'url', 'text', 'created_time', 'parent')
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(etag_func=None):
+    """
+    API 视图的公共处理：只允许 GET，把 APIError 转换为 JSON 错误响应，并设置 ETag。
+
+    提供 etag_func 时先用它计算 ETag，客户端缓存仍然有效时直接返回 304，不会执行视图；
+    否则根据响应内容生成 ETag，至少能节省传输的流量。
+    """
+    def decorator(view):
+        def wrapper(request, *args, **kwargs):
+            try:
+                data = view(request, *args, **kwargs)
+            except APIError as e:
+                return JsonResponse({'error': str(e)}, status=e.status, json_dumps_params={'ensure_ascii': False})
+            return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+        if etag_func is not None:
+            def safe_etag_func(request, *args, **kwargs):
+                # 参数有误时不生成 ETag，交给视图返回错误信息
+                try:
+                    return etag_func(request, *args, **kwargs)
+                except APIError:
+                    return None
+            wrapper = condition(etag_func=safe_etag_func)(wrapper)
+        wrapper = decorator_from_middleware(ConditionalGetMiddleware)(wrapper)
+        return require_GET(cache_policy(API)(wraps(view)(wrapper)))
+    return decorator
+
+
+def _version_etag(request, *parts):
+    # 由数据的版本信息和查询参数生成 ETag
+    raw = '|'.join(str(p) for p in parts + (request.GET.urlencode(),))
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def _parse_list(request, name, allowed, default):
+    value = request.GET.get(name)
+    if value is None:
+        return list(default)
+    items = [item for item in value.split(',') if item]
+    invalid = [item for item in items if item not in allowed]
+    if invalid:
+        raise APIError('不支持的 {}：{}'.format(name, '、'.join(invalid)))
+    return items
+
+
+def _parse_limit(request):
+    try:
+        return min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise APIError('limit 必须是整数')
+
+
+def encode_cursor(created_time, pk):
+    raw = '{}|{}'.format(created_time.isoformat(), pk)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        created_time, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        created_time = parse_datetime(created_time)
+        pk = int(pk)
+    except (ValueError, UnicodeError):
+        created_time = None
+    if created_time is None:
+        raise APIError('无效的 cursor')
+    return created_time, pk
+
+
+def paginate(request, queryset, columns):
+    """
+    按 (created_time, id) 倒序做游标分页，返回 (当前页的行, 下一页的游标)。
+    """
+    limit = _parse_limit(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        created_time, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_time__lt=created_time) | Q(created_time=created_time, id__lt=pk))
+
+    columns = set(columns) | {'id', 'created_time'}
+    rows = list(queryset.order_by('-created_time', '-id').values(*columns)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_time'], rows[-1]['id'])
+    return rows, next_cursor
+
+
+def filter_posts(request):
+    queryset = Post.objects.all()
+    for name in ('category', 'tag', 'author', 'year', 'month'):
+        value = request.GET.get(name)
+        if value is None:
+            continue
+        if not value.isdigit():
+            raise APIError('{} 必须是整数'.format(name))
+        if name == 'category':
+            queryset = queryset.filter(category_id=value)
+        elif name == 'tag':
+            queryset = queryset.filter(tags__id=value)
+        elif name == 'author':
+            queryset = queryset.filter(author_id=value)
+        elif name == 'year':
+            queryset = queryset.filter(created_time__year=value)
+        else:
+            queryset = queryset.filter(created_time__month=value)
+    return queryset
+
+
+def _post_tags(post_ids):
+    tags = {pk: [] for pk in post_ids}
+    for post_id, tag_id in Post.tags.through.objects.filter(post_id__in=post_ids).values_list('post_id', 'tag_id'):
+        tags[post_id].append(tag_id)
+    return tags
+
+
+def serialize_posts(rows, fields, include):
+    """
+    把 values() 查询出的行序列化为接口数据，返回 (文章列表, included)。
+    标签和 include 中的关联对象对整页文章各只查询一次，不会随文章数量增加查询次数。
+    """
+    post_ids = [row['id'] for row in rows]
+    tags = _post_tags(post_ids) if 'tags' in fields or 'tags' in include else {}
+
+    # 刚保存的文章可能还在等待后台任务渲染，接口不即时渲染，返回 null 并标记为 pending
+    wants_body = 'body_html' in fields or 'toc' in fields
+
+    posts = []
+    for row in rows:
+        data = {}
+        for field in fields:
+            if field == 'url':
+                data['url'] = reverse('blog:detail', kwargs={'pk': row['id']})
+            elif field == 'tags':
+                data['tags'] = sorted(tags[row['id']])
+            elif field in ('created_time', 'modified_time'):
+                data[field] = row[field].isoformat()
+            elif field in ('body_html', 'toc') and not row['rendered_body']:
+                data[field] = None
+            else:
+                data[field] = row[POST_FIELDS[field][0]]
+        if wants_body and not row['rendered_body']:
+            data['pending'] = True
+        posts.append(data)
+
+    included = {}
+    if 'category' in include:
+        ids = {row['category_id'] for row in rows}
+        included['categories'] = list(Category.objects.filter(pk__in=ids).values('id', 'name'))
+    if 'tags' in include:
+        ids = {tag_id for post_tags in tags.values() for tag_id in post_tags}
+        included['tags'] = list(Tag.objects.filter(pk__in=ids).values('id', 'name'))
+    if 'author' in include:
+        ids = {row['author_id'] for row in rows}
+        included['authors'] = list(User.objects.filter(pk__in=ids).values('id', 'username'))
+    return posts, included
+
+
+def _post_columns(fields, include):
+    columns = {column for field in fields for column in POST_FIELDS[field]}
+    if 'category' in include:
+        columns.add('category_id')
+    if 'author' in include:
+        columns.add('author_id')
+    return columns
+
+
+def _posts_etag(request, *parts, default_fields):
+    fields = _parse_list(request, 'fields', POST_FIELDS, default_fields)
+    views = int(time.time() // VIEWS_ETAG_INTERVAL) if 'views' in fields else None
+    return _version_etag(request, get_version(API_VERSION_KEY), views, *parts)
+
+
+def post_list_etag(request):
+    return _posts_etag(request, default_fields=POST_LIST_FIELDS)
+
+
+@api_view(etag_func=post_list_etag)
+def post_list(request):
+    fields = _parse_list(request, 'fields', POST_FIELDS, POST_LIST_FIELDS)
+    include = _parse_list(request, 'include', POST_INCLUDES, ())
+    rows, next_cursor = paginate(request, filter_posts(request), _post_columns(fields, include))
+    posts, included = serialize_posts(rows, fields, include)
+    return {'results': posts, 'included': included, 'next_cursor': next_cursor}
+
+
+def post_detail_etag(request, pk):
+    return _posts_etag(request, pk, default_fields=POST_FIELDS)
+
+
+@api_view(etag_func=post_detail_etag)
+def post_detail(request, pk):
+    fields = _parse_list(request, 'fields', POST_FIELDS, POST_FIELDS)
+    include = _parse_list(request, 'include', POST_INCLUDES, ())
+    rows = list(Post.objects.filter(pk=pk).values(*(_post_columns(fields, include) | {'id'})))
+    if not rows:
+        raise APIError('文章不存在', status=404)
+    posts, included = serialize_posts(rows, fields, include)
+    return {'result': posts[0], 'included': included}
+
+
+def comment_list_etag(request, pk):
+    return _version_etag(request, pk, get_version(comments_version_key(pk)))
+
+
+@api_view(etag_func=comment_list_etag)
+def comment_list(request, pk):
+    if not Post.objects.filter(pk=pk).exists():
+        raise APIError('文章不存在', status=404)
+    fields = _parse_list(request, 'fields', COMMENT_FIELDS, COMMENT_FIELDS)
+    rows, next_cursor = paginate(request, Comment.objects.filter(post_id=pk), fields)
+    comments = [
+        {field: row[field].isoformat() if field == 'created_time' else row[field] for field in fields}
+        for row in rows
+    ]
+    return {'results': comments, 'next_cursor': next_cursor}
+
+
+@api_view()
+def category_list(request):
+    categories = Category.objects.order_by('id')
+    return {'results': list(categories.values('id', 'name', 'num_posts'))}
+
+
+@api_view()
+def tag_list(request):
+    tags = Tag.objects.order_by('id')
+    return {'results': list(tags.values('id', 'name', 'num_posts'))}
+
+
+@api_view()
+def archive_list(request):
+    months = (
+        Post.objects
+        .annotate(month=TruncMonth('created_time'))
+        .values('month')
+        .annotate(num_posts=Count('id'))
+        .order_by('-month')
+    )
+    return {'results': [
+        {
+            'year': row['month'].year,
+            'month': row['month'].month,
+            'num_posts': row['num_posts'],
+            'url': reverse('blog:archive', kwargs={'year': row['month'].year, 'month': row['month'].month}),
+        }
+        for row in months
+    ]}
+
+
+app_name = 'api'
+urlpatterns = [
+    path('posts/', post_list, name='post_list'),
+    path('posts/<int:pk>/', post_detail, name='post_detail'),
+    path('posts/<int:pk>/comments/', comment_list, name='comment_list'),
+    path('categories/', category_list, name='category_list'),
+    path('tags/', tag_list, name='tag_list'),
+    path('archives/', archive_list, name='archive_list'),
+]
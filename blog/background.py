@@ -0,0 +1,29 @@
+# 后台执行不影响响应内容的副作用（例如文章阅读量 +1），让它们不再占用请求的响应时间。
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+# 只用一个线程，后台任务按提交顺序依次执行，也不会同时占用多个数据库连接
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='blog-background')
+
+
+def _run(func, args, kwargs):
+    # 后台线程长期存在，每次执行前后按 CONN_MAX_AGE 的设置清理失效的数据库连接
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    在后台线程中执行 func，调用方不等待其结果。
+
+    settings.BACKGROUND_TASKS_EAGER 为 True 时（开发环境和测试）直接同步执行，便于调试和断言结果。
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        func(*args, **kwargs)
+        return
+    _executor.submit(_run, func, args, kwargs)
@@ -0,0 +1,74 @@
+# 读取、删除整张表时使用的工具函数，内存占用和表的大小无关。
+#
+# 直接遍历 QuerySet 会把全部结果（包括文章的完整正文）一次性读入内存并缓存在 QuerySet 中；
+# QuerySet.delete() 在模型有信号接收者或者级联删除时，会先把要删除的全部对象查出来，再为每个对象发送 pre_delete、post_delete 信号。
+# 文章很多时这些操作的内存占用会随文章数量线性增长。
+from django.db import connections, transaction
+from django.db.models import CASCADE
+
+# 每批读取、删除的行数
+CHUNK_SIZE = 500
+
+
+def stream_queryset(queryset, chunk_size=CHUNK_SIZE):
+    """
+    逐个返回 queryset 中的对象，同一时刻只有一批 chunk_size 个对象在内存中，结果不会缓存在 queryset 中。
+
+    PostgreSQL、Oracle 使用服务端游标，SQLite 从游标中分批读取；MySQL 的驱动会把整个结果集读到客户端，
+    因此改为按主键分批查询，这时结果按主键排序。
+    """
+    if connections[queryset.db].vendor != 'mysql':
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    for pks in iter_pk_chunks(queryset, chunk_size):
+        yield from queryset.model._base_manager.using(queryset.db).filter(pk__in=pks).order_by('pk')
+
+
+def iter_pk_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """
+    按主键顺序分批返回 queryset 中对象的主键列表。每一批都是一条带 pk > 上一批最大主键 条件的查询，
+    不使用 OFFSET，后面的批次不会越来越慢，批次之间删除的行也不会导致漏掉或重复。
+    """
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        pks = list(chunk[:chunk_size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def _reverse_relations(model):
+    # 其它模型（包括多对多的中间表）指向 model 的外键
+    for field in model._meta.get_fields(include_hidden=True):
+        if (field.one_to_many or field.one_to_one) and field.auto_created and not field.concrete:
+            yield field
+
+
+def bulk_delete(queryset, chunk_size=CHUNK_SIZE):
+    """
+    分批删除 queryset 中的对象，返回删除的对象数量。
+
+    每一批先删除级联关联的行（例如评论、文章-标签中间表），再用一条 DELETE 删除这一批对象本身，
+    不会把对象查询出来，也不发送 pre_delete、post_delete 信号。信号中维护的缓存、计数等派生数据由调用者在删除完成后统一更新。
+    """
+    model = queryset.model
+    relations = list(_reverse_relations(model))
+    # 有 SET_NULL、PROTECT 等需要 django 处理的关联时，退回到逐批调用 QuerySet.delete()，每次只加载一批对象
+    raw = all(relation.on_delete is CASCADE for relation in relations)
+    deleted = 0
+    for pks in iter_pk_chunks(queryset, chunk_size):
+        objects = model._base_manager.using(queryset.db).filter(pk__in=pks)
+        if not raw:
+            deleted += objects.delete()[1].get(model._meta.label, 0)
+            continue
+        with transaction.atomic(using=queryset.db):
+            for relation in relations:
+                # 关联的模型还有自己的关联（例如评论的回复）时逐层删除
+                bulk_delete(relation.related_model._base_manager.using(queryset.db).filter(
+                    **{relation.field.name + '__in': pks}
+                ), chunk_size)
+            deleted += objects._raw_delete(queryset.db)
+    return deleted
@@ -0,0 +1,98 @@
+# 分类、标签的文章数。
+#
+# 侧边栏、标签云和接口都要显示每个分类、标签下有多少篇文章，每次都用 annotate(Count('post')) 连接文章表和
+# 文章-标签中间表做聚合，文章越多越慢。这里把文章数保存在 Category.num_posts 和 Tag.num_posts 中，
+# 读取时只需要一次带索引的查询。文章保存、删除以及标签变化时由 blog/signals.py 调用下面的函数更新受影响的行。
+#
+# 更新时不做 +1、-1，而是用子查询重新统计受影响的分类、标签的已发布文章数：状态、分类变化等各种情况都不需要分别处理，
+# 也不会因为某一次漏掉的信号产生永久的误差。每个分类、标签的统计都可以走外键和中间表的索引。
+#
+# 作者的文章数、总阅读量和最新文章时间保存在 AuthorStats 中，同样在文章变化时重新统计受影响的作者，
+# 统计走 Post 上 (status, author, created_time, id) 索引；访问文章时总阅读量直接 +1，见 Post.save_view。
+import math
+
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Category, Post, Tag
+
+
+def _count(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts), 0)
+
+
+def update_category_counts(pks=None):
+    """
+    重新统计分类的文章数，pks 为 None 时统计全部分类。
+    """
+    categories = Category.objects.all() if pks is None else Category.objects.filter(pk__in=pks)
+    categories.update(num_posts=_count(Post.objects.all(), 'category'))
+
+
+def update_tag_counts(pks=None):
+    """
+    重新统计标签的文章数，pks 为 None 时统计全部标签。
+    """
+    tags = Tag.objects.all() if pks is None else Tag.objects.filter(pk__in=pks)
+    tags.update(num_posts=_count(Post.tags.through.objects.filter(post__status=Post.PUBLISHED), 'tag'))
+
+
+def update_author_stats(pks=None, create=True):
+    """
+    重新统计作者的文章数、总阅读量和最新文章时间，pks 为 None 时统计全部写过文章的作者。
+    create 为 True 时为还没有统计数据的作者（第一次写文章）创建一行；删除文章时不创建，
+    删除用户会级联删除其文章，这时不能再为这个用户插入统计数据。
+    """
+    if pks is None:
+        pks = set(Post.all_objects.order_by().values_list('author_id', flat=True).distinct())
+        pks |= set(AuthorStats.objects.values_list('pk', flat=True))
+    pks = [pk for pk in pks if pk is not None]
+    if not pks:
+        return
+    if create:
+        AuthorStats.objects.bulk_create([AuthorStats(user_id=pk) for pk in pks], ignore_conflicts=True)
+    posts = Post.objects.filter(author=OuterRef('pk')).order_by().values('author')
+    AuthorStats.objects.filter(pk__in=pks).update(
+        num_posts=_count(Post.objects.all(), 'author'),
+        total_views=Coalesce(Subquery(posts.annotate(n=Sum('views')).values('n')), 0),
+        latest_post_time=Subquery(posts.annotate(t=Max('created_time')).values('t')),
+    )
+
+
+def update_post_counts(post, created, old):
+    """
+    文章保存后调用。old 是保存之前数据库中的 {'status', 'category_id', 'author_id', 'created_time', ...}，
+    新建的文章以及使用 update_fields 保存（不知道之前的值）时为 None。只有状态、分类、作者或创建时间变化时才需要重新统计。
+    """
+    if old is None or any(old[f] != getattr(post, f) for f in ('status', 'author_id', 'created_time')):
+        update_author_stats({post.author_id} | ({old['author_id']} if old else set()))
+    if old is not None and old['status'] == post.status and old['category_id'] == post.category_id:
+        return
+    update_category_counts({post.category_id} | ({old['category_id']} if old else set()))
+    # 新建的文章还没有标签，保存后再添加的标签由 m2m_changed 信号处理
+    if not created:
+        update_tag_counts(list(post.tags.values_list('pk', flat=True)))
+
+
+def tag_cloud(tags, buckets=5):
+    """
+    为标签云计算每个标签的字号等级 weight（1 到 buckets），返回 [(tag, weight), ...]。
+
+    按文章数的对数均匀分为 buckets 档，少数文章特别多的标签不会把其它标签都挤到最小的一档。
+    """
+    tags = [tag for tag in tags if tag.num_posts > 0]
+    if not tags:
+        return []
+    low = math.log(min(tag.num_posts for tag in tags))
+    high = math.log(max(tag.num_posts for tag in tags))
+    span = high - low
+    cloud = []
+    for tag in tags:
+        if span == 0:
+            # 全部标签的文章数相同时都使用中间的字号
+            weight = (buckets + 1) // 2
+        else:
+            weight = 1 + int((math.log(tag.num_posts) - low) / span * (buckets - 1) + 0.5)
+        cloud.append((tag, weight))
+    return cloud
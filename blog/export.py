@@ -0,0 +1,295 @@
+# 静态导出：把 blog/urls.py 中的页面（首页、文章详情、分类、标签、归档以及 RSS）预渲染成文件，
+# 写入一个 nginx 可以直接提供服务的目录树。
+#
+# 导出目录的结构和网址一一对应：
+#   /                       -> index.html
+#   /?page=2                -> page/2/index.html
+#   /posts/1/               -> posts/1/index.html
+#   /categories/1/?page=3   -> categories/1/page/3/index.html
+#   /all/rss/               -> all/rss/index.xml
+#
+# nginx 只需要类似下面的配置就能直接命中导出的文件，未命中的请求（搜索、评论提交等）仍然交给 django：
+#   index index.html index.xml;
+#   location / {
+#       try_files $uri/page/$arg_page/index.html $uri/ @django;
+#   }
+import json
+import multiprocessing
+import os
+import shutil
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Post
+from .views import IndexView
+
+# 导出目录下记录上一次导出状态的文件，增量导出时根据它判断哪些页面需要重新生成。
+MANIFEST_NAME = '.export-manifest.json'
+
+
+def _page_urls(url, total):
+    """
+    返回一个列表页全部分页的网址，即使没有文章也至少导出第一页（显示“暂时还没有发布的文章！”）。
+    """
+    per_page = IndexView.paginate_by
+    num_pages = max(1, (total + per_page - 1) // per_page)
+    return [url] + ['{}?page={}'.format(url, n) for n in range(2, num_pages + 1)]
+
+
+def _month_key(created_time):
+    # ArchiveView 按当前时区的年月过滤文章，这里必须用同样的时区计算文章所属的月份
+    created_time = timezone.localtime(created_time)
+    return '{}-{}'.format(created_time.year, created_time.month)
+
+
+def post_groups():
+    """
+    返回每篇文章所在的分类、标签和归档月份，只查询必要的列，不会加载文章正文。
+    """
+    tags = defaultdict(list)
+    for post_id, tag_id in Post.tags.through.objects.values_list('post_id', 'tag_id'):
+        tags[post_id].append(tag_id)
+
+    groups = {}
+    for pk, category_id, created_time in Post.objects.values_list('pk', 'category_id', 'created_time'):
+        groups[str(pk)] = {
+            'category': category_id,
+            'tags': sorted(tags[pk]),
+            'month': _month_key(created_time),
+        }
+    return groups
+
+
+def sidebar_state(groups):
+    """
+    侧边栏（最新文章、归档、分类、标签云）依赖的数据，侧边栏出现在每一个页面上，它一旦变化就必须全量导出。
+    """
+    tag_counts = defaultdict(int)
+    for group in groups.values():
+        for tag_id in group['tags']:
+            tag_counts[str(tag_id)] += 1
+    return {
+        'recent': [list(p) for p in Post.objects.order_by('-created_time').values_list('pk', 'title')[:5]],
+        'months': sorted({group['month'] for group in groups.values()}),
+        'categories': sorted({group['category'] for group in groups.values()}),
+        'tags': tag_counts,
+    }
+
+
+def _listing_urls(groups, categories=None, tags=None, months=None):
+    """
+    根据文章分组信息计算列表页网址。categories、tags、months 为 None 时表示全部，
+    否则只返回指定分类、标签、月份的列表页。
+    """
+    category_counts = defaultdict(int)
+    tag_counts = defaultdict(int)
+    month_counts = defaultdict(int)
+    for group in groups.values():
+        category_counts[group['category']] += 1
+        month_counts[group['month']] += 1
+        for tag_id in group['tags']:
+            tag_counts[tag_id] += 1
+
+    if categories is None:
+        categories = category_counts
+    if tags is None:
+        tags = tag_counts
+    if months is None:
+        months = month_counts
+
+    urls = _page_urls(reverse('blog:index'), len(groups))
+    for pk in categories:
+        urls += _page_urls(reverse('blog:category', kwargs={'pk': pk}), category_counts[pk])
+    for pk in tags:
+        urls += _page_urls(reverse('blog:tag', kwargs={'pk': pk}), tag_counts[pk])
+    for month in months:
+        year, month_number = month.split('-')
+        url = reverse('blog:archive', kwargs={'year': int(year), 'month': int(month_number)})
+        urls += _page_urls(url, month_counts[month])
+    return urls
+
+
+def all_urls(groups):
+    """
+    全量导出时需要生成的全部网址。
+    """
+    urls = _listing_urls(groups)
+    urls += [reverse('blog:detail', kwargs={'pk': pk}) for pk in groups]
+    urls.append(reverse('rss'))
+    return urls
+
+
+def changed_urls(groups, sidebar, manifest):
+    """
+    增量导出时需要重新生成的网址。
+
+    有文章被新建、删除，或者侧边栏的内容发生了变化时返回 None，由调用方退回到全量导出。
+    否则只重新生成修改过的文章的详情页，以及它们修改前后所在的分类、标签、归档列表页、首页和 RSS。
+    注意分类、标签改名不会修改文章，这种情况需要手动全量导出。
+    """
+    old_groups = manifest.get('posts', {})
+    if set(old_groups) != set(groups) or manifest.get('sidebar') != sidebar:
+        return None
+
+    since = parse_datetime(manifest['exported_at'])
+    changed = [str(pk) for pk in Post.objects.filter(modified_time__gt=since).values_list('pk', flat=True)]
+    if not changed:
+        return []
+
+    categories, tags, months = set(), set(), set()
+    for pk in changed:
+        for group in (old_groups[pk], groups[pk]):
+            categories.add(group['category'])
+            tags.update(group['tags'])
+            months.add(group['month'])
+
+    urls = _listing_urls(groups, categories=categories, tags=tags, months=months)
+    urls += [reverse('blog:detail', kwargs={'pk': pk}) for pk in changed]
+    urls.append(reverse('rss'))
+    return urls
+
+
+def url_to_path(url, content_type='text/html'):
+    """
+    把网址转换为导出目录下的相对文件路径。
+    """
+    path, _, query = url.partition('?')
+    parts = [p for p in path.split('/') if p]
+    if query:
+        parts += ['page', query.split('=', 1)[1]]
+    filename = 'index.xml' if 'xml' in content_type else 'index.html'
+    return os.path.join(*(parts + [filename]))
+
+
+class PageRenderer:
+    """
+    不经过 HTTP，直接用 django 的请求处理流程（包括全部中间件）渲染页面。
+    """
+
+    def __init__(self):
+        # 使用站点的域名发起请求，否则生产环境中 ALLOWED_HOSTS 会拒绝 RequestFactory 默认的 testserver，
+        # RSS 等页面中的绝对网址也会使用正确的域名
+        hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+        self.factory = RequestFactory(SERVER_NAME=hosts[0]) if hosts else RequestFactory()
+        self.handler = BaseHandler()
+        self.handler.load_middleware()
+
+    def render(self, url):
+        return self.handler.get_response(self.factory.get(url))
+
+
+def _write_atomic(filename, chunks):
+    # 先写临时文件再替换，nginx 永远不会读到写了一半的页面
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, filename)
+
+
+_renderer = None
+
+
+def _init_worker():
+    # fork 出的子进程不能和父进程共用数据库连接，关掉后每个子进程会按需建立自己的连接
+    global _renderer
+    connections.close_all()
+    _renderer = PageRenderer()
+
+
+def render_urls(urls, output_dir):
+    """
+    渲染一批网址并写入导出目录，返回 (写入的文件数, 失败的网址列表)。
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = PageRenderer()
+
+    written, failed = 0, []
+    for url in urls:
+        response = _renderer.render(url)
+        if response.status_code != 200:
+            failed.append(url)
+            continue
+        path = url_to_path(url, response.get('Content-Type', ''))
+        # RSS 是流式响应，边生成边写入文件，不在内存中拼出完整的内容
+        chunks = response.streaming_content if response.streaming else [response.content]
+        _write_atomic(os.path.join(output_dir, path), chunks)
+        written += 1
+    return written, failed
+
+
+def _render_chunk(args):
+    return render_urls(*args)
+
+
+def _clear_stale_pages(urls, output_dir):
+    # 列表页的文章数量可能变少，先删除旧的分页目录，避免残留已经不存在的分页
+    for url in urls:
+        if '?' not in url:
+            path = os.path.dirname(url_to_path(url))
+            shutil.rmtree(os.path.join(output_dir, path, 'page'), ignore_errors=True)
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def export_site(output_dir, incremental=False, jobs=1, chunk_size=50):
+    """
+    导出整个站点，返回 (是否全量导出, 写入的文件数, 失败的网址列表)。
+
+    jobs 大于 1 时使用多进程并行渲染，每个进程每次领取 chunk_size 个网址。
+    """
+    # 在收集网址之前记录时间，导出过程中被修改的文章会在下一次增量导出时被重新生成
+    exported_at = timezone.now()
+    groups = post_groups()
+    sidebar = sidebar_state(groups)
+
+    urls = None
+    manifest = load_manifest(output_dir) if incremental else None
+    if manifest is not None:
+        urls = changed_urls(groups, sidebar, manifest)
+    full = urls is None
+    if full:
+        # 全量导出先写到一个新目录，完成后再整体替换旧目录，导出期间 nginx 仍然使用旧的页面
+        target_dir = output_dir.rstrip(os.sep) + '.new'
+        shutil.rmtree(target_dir, ignore_errors=True)
+        urls = all_urls(groups)
+    else:
+        target_dir = output_dir
+        _clear_stale_pages(urls, output_dir)
+
+    chunks = [(urls[i:i + chunk_size], target_dir) for i in range(0, len(urls), chunk_size)]
+    if jobs > 1 and len(chunks) > 1:
+        connections.close_all()
+        with multiprocessing.Pool(processes=jobs, initializer=_init_worker) as pool:
+            results = pool.map(_render_chunk, chunks)
+    else:
+        results = [_render_chunk(chunk) for chunk in chunks]
+
+    written = sum(r[0] for r in results)
+    failed = [url for r in results for url in r[1]]
+
+    manifest = {'exported_at': exported_at.isoformat(), 'posts': groups, 'sidebar': sidebar}
+    _write_atomic(os.path.join(target_dir, MANIFEST_NAME), [json.dumps(manifest).encode('utf-8')])
+
+    if full:
+        old_dir = output_dir.rstrip(os.sep) + '.old'
+        if os.path.exists(output_dir):
+            os.replace(output_dir, old_dir)
+        os.replace(target_dir, output_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return full, written, failed
@@ -1,9 +1,81 @@
-from django.contrib.syndication.views import Feed
+import uuid
+from io import StringIO
 
-from .models import Post
+from django.contrib.sites.shortcuts import get_current_site
+from django.contrib.syndication.views import Feed, add_domain
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.feedgenerator import Rss201rev2Feed
+from django.utils.translation import get_language
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views.decorators.http import condition
+
+from .bulk import stream_queryset
+from .http_cache import FEED, add_surrogate_keys, author_key, cache_policy
+from .models import AuthorStats, Post
+
+# RSS 的版本号和生成时间，用于条件请求（ETag、Last-Modified）。发布、修改文章时由 blog/signals.py 清除，
+# 下一次请求时重新生成，阅读器再次请求时才会拿到新的内容，否则直接返回 304
+FEED_CACHE_KEY = 'blog:feed:all'
+
+
+def get_feed_state():
+    return cache.get_or_set(
+        FEED_CACHE_KEY, lambda: {'etag': uuid.uuid4().hex, 'last_modified': timezone.now()}, timeout=None
+    )
+
+
+def invalidate_feed():
+    cache.delete(FEED_CACHE_KEY)
+
+
+class StreamingRssFeed(Rss201rev2Feed):
+    """
+    边生成边输出的 RSS。父类的 write 需要先把全部条目加入 self.items，这里每个条目写出后就丢弃，
+    内存中只有当前这一个条目。
+    """
+
+    def __init__(self, *args, last_build_date=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_build_date = last_build_date
+
+    def latest_post_date(self):
+        # 父类遍历全部条目求最新的时间，条目是逐个生成的，使用预先给出的时间
+        return self.last_build_date or super().latest_post_date()
+
+    def stream(self, items, encoding='utf-8'):
+        """
+        逐段返回 RSS 的内容，items 是 add_item 参数组成的可迭代对象。
+        """
+        buffer = StringIO()
+        handler = SimplerXMLGenerator(buffer, encoding)
+
+        def flush():
+            content = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return content
+
+        handler.startDocument()
+        handler.startElement('rss', self.rss_attributes())
+        handler.startElement('channel', self.root_attributes())
+        self.add_root_elements(handler)
+        yield flush()
+        for item in items:
+            self.add_item(**item)
+            self.write_items(handler)
+            self.items.clear()
+            yield flush()
+        self.endChannelElement(handler)
+        handler.endElement('rss')
+        yield flush()
 
 
 class AllPostsRssFeed(Feed):
+    feed_type = StreamingRssFeed
+
     # 显示在聚合阅读器上的标题
     title = "duanlt-blog"
 
@@ -13,9 +85,12 @@ class AllPostsRssFeed(Feed):
     # 显示在聚合阅读器上的描述信息
     description = "duanlt-blog 全部文章"
 
-    # 需要显示的内容条目
+    # 需要显示的内容条目。逐批从数据库读取，不会一次把全部文章加载到内存中；
+    # 条目标题中显示分类，一并查询出来，避免每篇文章再查询一次分类；描述只用到渲染后的正文，不读取 Markdown 原文
     def items(self):
-        return Post.objects.all()
+        return stream_queryset(
+            Post.objects.select_related('category').defer('body', 'plain_text')
+        )
 
     # 聚合器中显示的内容条目的标题
     def item_title(self, item):
@@ -23,4 +98,71 @@ class AllPostsRssFeed(Feed):
 
     # 聚合器中显示的内容条目的描述
     def item_description(self, item):
-        return item.body_html
\ No newline at end of file
+        return item.body_html
+
+    def feed_info(self, obj):
+        # 返回 (标题, 地址, 描述)，obj 是 get_object 的返回值
+        return self.title, self.link, self.description
+
+    def feed_items(self, obj):
+        return self.items()
+
+    def item_pubdate(self, item):
+        return item.created_time
+
+    def _item_kwargs(self, item, domain, secure):
+        link = add_domain(domain, item.get_absolute_url(), secure)
+        return {
+            'title': self.item_title(item),
+            'link': link,
+            'description': self.item_description(item),
+            'unique_id': link,
+            'pubdate': self.item_pubdate(item),
+        }
+
+    def __call__(self, request, *args, **kwargs):
+        # 父类先生成全部条目再一次性输出，这里改为流式输出，并且内容没有变化时直接返回 304
+        state = get_feed_state()
+
+        @cache_policy(FEED)
+        @condition(etag_func=lambda request: state['etag'], last_modified_func=lambda request: state['last_modified'])
+        def feed(request):
+            obj = self.get_object(request, *args, **kwargs)
+            title, link, description = self.feed_info(obj)
+            domain = get_current_site(request).domain
+            secure = request.is_secure()
+            feedgen = self.feed_type(
+                title=title,
+                link=add_domain(domain, link, secure),
+                description=description,
+                language=get_language(),
+                feed_url=add_domain(domain, request.path, secure),
+                last_build_date=state['last_modified'],
+            )
+            items = (self._item_kwargs(item, domain, secure) for item in self.feed_items(obj))
+            return StreamingHttpResponse(feedgen.stream(items), content_type=feedgen.content_type)
+
+        return feed(request)
+
+
+class AuthorPostsRssFeed(AllPostsRssFeed):
+    """
+    某个作者的文章，例如 /authors/1/rss/。条目只按作者读取，走 Post 上 (status, author, created_time, id) 索引。
+    """
+
+    def get_object(self, request, pk):
+        stats = get_object_or_404(AuthorStats.objects.select_related('user'), pk=pk, num_posts__gt=0)
+        add_surrogate_keys(request, author_key(pk))
+        return stats.user
+
+    def feed_info(self, author):
+        return (
+            '{} - {}'.format(self.title, author),
+            author.author_stats.get_absolute_url(),
+            '{} 的全部文章'.format(author),
+        )
+
+    def feed_items(self, author):
+        return stream_queryset(
+            Post.objects.filter(author=author).select_related('category').defer('body', 'plain_text')
+        )
@@ -0,0 +1,179 @@
+# 响应的 HTTP 缓存策略，让 CDN、nginx proxy_cache 或 varnish 可以安全地缓存页面。
+#
+# 每个视图用 cache_policy 装饰器声明自己的策略：浏览器缓存多久（max-age）、共享缓存缓存多久（s-maxage），
+# 以及过期之后还可以先返回旧内容、同时在后台重新请求的时间（stale-while-revalidate）。
+# 和访问者有关的响应一律标记为 private, no-cache，不允许共享缓存保存：
+# - 页面中显示了提示消息（例如“评论发表成功！”），或者还有等待显示的消息
+# - 视图读取了 session
+# - 页面中使用了 CSRF token，或者响应设置了其它 cookie
+#
+# 响应的 Surrogate-Key 头列出了页面依赖的数据，例如 'post-1 category-2 sidebar all'。文章、分类、标签被修改时，
+# blog/signals.py 调用 purge 清除包含对应键的缓存页面，因此共享缓存的时间可以设置得比较长。
+# settings.HTTP_CACHE_PURGE_URL 为清除缓存的地址（例如本机 varnish 的地址），清除请求使用 HTTP_CACHE_PURGE_METHOD 方法，
+# 要清除的键放在 Surrogate-Key 头中；没有配置时不发送清除请求。varnish 可以使用 xkey 模块按这个头清除缓存，
+# 并在返回给浏览器之前删除 Surrogate-Key 头。
+import urllib.request
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+
+from .tasks import enqueue
+
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+# 所有响应都带有的键，清除它就清除全部缓存
+ALL_KEY = 'all'
+# 侧边栏（最新文章、归档、分类、标签云）出现在每一个 HTML 页面中
+SIDEBAR_KEY = 'sidebar'
+FEED_KEY = 'feed'
+SITEMAP_KEY = 'sitemap'
+API_KEY = 'api'
+# 作者列表页
+AUTHORS_KEY = 'authors'
+
+
+# 接口 ETag 使用的数据版本号（见 blog/api.py）。文章、分类、标签变化时换一个新的 API_VERSION_KEY，
+# 文章的评论变化时换一个新的 comments_version_key(文章 id)；判断是否返回 304 只需要读取一次缓存，不需要查询数据库
+API_VERSION_KEY = 'http-cache:api-version'
+COMMENTS_VERSION_KEY = 'http-cache:comments-version:{}'
+
+
+def comments_version_key(post_id):
+    return COMMENTS_VERSION_KEY.format(post_id)
+
+
+def get_version(key):
+    return cache.get_or_set(key, lambda: uuid.uuid4().hex, timeout=None)
+
+
+def bump_version(*keys):
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+
+
+def post_key(pk):
+    return 'post-{}'.format(pk)
+
+
+def category_key(pk):
+    return 'category-{}'.format(pk)
+
+
+def tag_key(pk):
+    return 'tag-{}'.format(pk)
+
+
+def author_key(pk):
+    return 'author-{}'.format(pk)
+
+
+class CachePolicy:
+    """
+    一种缓存策略。max_age 是浏览器的缓存时间，s_maxage 是共享缓存的缓存时间（为 None 时和 max_age 相同），
+    keys 是使用这个策略的响应都带有的 Surrogate-Key。public 为 False 时所有响应都是 private 的。
+    """
+
+    def __init__(self, max_age=0, s_maxage=None, stale_while_revalidate=0, keys=(), public=True):
+        self.max_age = max_age
+        self.s_maxage = max_age if s_maxage is None else s_maxage
+        self.stale_while_revalidate = stale_while_revalidate
+        self.keys = keys
+        self.public = public
+
+    def is_private(self, request, response):
+        # CSRF、session、消息的 cookie 由中间件在视图返回之后设置，这里根据 request 上的标记判断
+        if not self.public or response.cookies or request.META.get('CSRF_COOKIE_USED'):
+            return True
+        session = getattr(request, 'session', None)
+        if session is not None and session.accessed:
+            return True
+        # 模板显示过的消息和新加入的消息都在 storage 中，有消息的页面只属于当前访问者
+        return hasattr(request, '_messages') and len(get_messages(request)) > 0
+
+    def apply(self, request, response):
+        # 只有成功的 GET、HEAD 响应可以缓存，视图自己设置过 Cache-Control 的不修改
+        if request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304):
+            return
+        if response.has_header('Cache-Control'):
+            return
+        if self.is_private(request, response):
+            patch_cache_control(response, private=True, no_cache=True)
+            return
+        directives = {'public': True, 'max_age': self.max_age, 's_maxage': self.s_maxage}
+        if self.stale_while_revalidate:
+            directives['stale_while_revalidate'] = self.stale_while_revalidate
+        patch_cache_control(response, **directives)
+        keys = [ALL_KEY]
+        for key in list(self.keys) + list(getattr(request, '_surrogate_keys', ())):
+            if key not in keys:
+                keys.append(key)
+        response[SURROGATE_KEY_HEADER] = ' '.join(keys)
+
+
+# 列表页和文章详情页：文章修改、发表评论后会清除共享缓存，共享缓存可以保存较长时间；浏览器只缓存一分钟。
+# 页面上显示的阅读量不触发清除，共享缓存中最多一小时后更新；阅读量本身由页面加载后单独发送的请求统计，
+# 不受缓存影响，见 blog/views.py 的 record_view
+PAGE = CachePolicy(max_age=60, s_maxage=3600, stale_while_revalidate=60, keys=(SIDEBAR_KEY,))
+# 搜索结果没有对应的清除键，共享缓存也只保存几分钟
+SEARCH = CachePolicy(max_age=60, s_maxage=300, stale_while_revalidate=60, keys=(SIDEBAR_KEY,))
+# 输入提示和热门文章的 JSON
+JSON = CachePolicy(max_age=30, s_maxage=60, stale_while_revalidate=30)
+FEED = CachePolicy(max_age=300, s_maxage=3600, stale_while_revalidate=300, keys=(FEED_KEY,))
+SITEMAP = CachePolicy(max_age=3600, s_maxage=86400, stale_while_revalidate=3600, keys=(SITEMAP_KEY,))
+# API 的客户端每次都用 ETag 验证，共享缓存保存一分钟
+API = CachePolicy(max_age=0, s_maxage=60, stale_while_revalidate=30, keys=(API_KEY,))
+# 只属于当前访问者的响应，例如带有 CSRF token 的评论表单
+PRIVATE = CachePolicy(public=False)
+
+
+def add_surrogate_keys(request, *keys):
+    """
+    视图声明这次响应依赖的数据，由 cache_policy 写入 Surrogate-Key 头。
+    """
+    if not hasattr(request, '_surrogate_keys'):
+        request._surrogate_keys = []
+    request._surrogate_keys.extend(keys)
+
+
+def cache_policy(policy):
+    """
+    为视图设置缓存策略的装饰器。TemplateResponse 在视图返回之后才渲染，渲染时才知道页面依赖的数据和是否显示了消息，
+    因此在渲染完成后再设置响应头。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if getattr(response, 'is_rendered', True):
+                policy.apply(request, response)
+            else:
+                response.add_post_render_callback(lambda response: policy.apply(request, response))
+            return response
+        return wrapper
+    return decorator
+
+
+def send_purge(keys):
+    """
+    后台任务：请求 settings.HTTP_CACHE_PURGE_URL，清除带有 keys 中任意一个键的缓存。
+    """
+    url = getattr(settings, 'HTTP_CACHE_PURGE_URL', None)
+    if not url:
+        return
+    request = urllib.request.Request(
+        url, method=getattr(settings, 'HTTP_CACHE_PURGE_METHOD', 'PURGE'),
+        headers={SURROGATE_KEY_HEADER: ' '.join(keys)},
+    )
+    # 清除失败时抛出异常，由任务队列重试
+    with urllib.request.urlopen(request, timeout=5):
+        pass
+
+
+def purge(*keys):
+    """
+    内容变化后调用，清除依赖这些数据的缓存页面。没有配置清除地址时什么也不做。
+    """
+    if getattr(settings, 'HTTP_CACHE_PURGE_URL', None) and keys:
+        enqueue(send_purge, sorted(set(keys)))
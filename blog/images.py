@@ -0,0 +1,145 @@
+# 文章图片的缩放版本和响应式图片。
+#
+# 在后台上传的图片（PostImage）以内容哈希命名保存，后台任务 generate_image_variants 再生成一张缩略图和几种宽度的缩小版本，
+# 缩小版本的文件名在原图的名字后面加上宽度，例如 posts/3f2a...-640w.jpg，原图不变它们的地址也不变。
+# 生成图片在任务队列的 worker 中执行，上传图片、保存文章的请求不需要等待。
+#
+# 渲染文章时 responsive_images 为正文中引用已上传图片的 <img> 加上 srcset、sizes 以及宽高，浏览器按屏幕宽度下载合适的版本；
+# 所有图片都加上 loading="lazy"，屏幕外的图片滚动到附近时才下载。
+#
+# 生成缩放版本需要 Pillow（见 Pipfile），没有安装时导入这个模块就会失败，不会悄悄地不生成缩放版本。
+import io
+import json
+import os
+import re
+from html import unescape
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .http_cache import post_key, purge
+from .models import Post, PostImage, render_post_content
+
+# 生成的宽度，只生成比原图窄的版本
+IMAGE_WIDTHS = (320, 640, 960, 1280)
+THUMBNAIL_SIZE = (300, 200)
+JPEG_QUALITY = 85
+# 正文栏最宽 800 像素，窄屏上占满屏幕宽度
+IMAGE_SIZES = '(max-width: 800px) 100vw, 800px'
+
+IMG_RE = re.compile(r'<img\b([^>]*?)\s*/?>')
+SRC_RE = re.compile(r'\bsrc="([^"]*)"')
+
+
+def variant_name(name, suffix):
+    root, ext = os.path.splitext(name)
+    return '{}-{}{}'.format(root, suffix, ext)
+
+
+def _save_variant(storage, name, image, format):
+    buffer = io.BytesIO()
+    if format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.save(buffer, format=format, quality=JPEG_QUALITY, optimize=True)
+    # 文件名由原图的哈希决定，重新生成时覆盖旧的文件
+    storage.delete(name)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def generate_image_variants(pk):
+    """
+    后台任务：生成图片的缩略图和缩小版本，然后重新渲染图片所属的文章，让正文中的图片用上 srcset。
+    """
+    image = PostImage.objects.filter(pk=pk).first()
+    if image is None:
+        return
+    storage = image.image.storage
+    with image.image.open('rb') as f:
+        original = Image.open(f)
+        original.load()
+        format = original.format
+        # 按 EXIF 中的方向信息旋转，手机拍的照片才不会横过来
+        original = ImageOps.exif_transpose(original)
+
+    widths = {}
+    for width in IMAGE_WIDTHS:
+        if width >= original.width:
+            break
+        resized = original.resize((width, round(original.height * width / original.width)), Image.LANCZOS)
+        widths[str(width)] = _save_variant(storage, variant_name(image.image.name, '{}w'.format(width)), resized, format)
+    thumbnail = ImageOps.fit(original, THUMBNAIL_SIZE, Image.LANCZOS)
+    variants = {
+        'thumbnail': _save_variant(storage, variant_name(image.image.name, 'thumb'), thumbnail, format),
+        'widths': widths,
+    }
+    PostImage.objects.filter(pk=pk).update(
+        width=original.width, height=original.height, variants=json.dumps(variants),
+    )
+    refresh_post(image.post_id)
+
+
+def refresh_post(pk):
+    """
+    重新渲染文章正文。渲染结果直接写入数据库，不修改 modified_time，因此还要清除模板中以 modified_time 为键的正文片段缓存，
+    以及共享缓存中的文章页面。
+    """
+    render_post_content(pk)
+    modified_time = Post.all_objects.filter(pk=pk).values_list('modified_time', flat=True).first()
+    if modified_time is not None:
+        cache.delete(make_template_fragment_key('post_body', [pk, modified_time]))
+    purge(post_key(pk))
+
+
+def delete_image_files(image):
+    # 删除原图和生成的全部版本
+    storage = image.image.storage
+    variants = image.get_variants()
+    names = [image.image.name, variants.get('thumbnail')] + list(variants.get('widths', {}).values())
+    for name in names:
+        if name:
+            storage.delete(name)
+
+
+def _media_name(src):
+    src = unquote(unescape(src))
+    if src.startswith(settings.MEDIA_URL):
+        return src[len(settings.MEDIA_URL):]
+    return None
+
+
+def responsive_images(html):
+    """
+    为 HTML 中的 <img> 加上 loading="lazy"，已上传并且生成了缩小版本的图片再加上 srcset、sizes、width 和 height。
+    """
+    matches = list(IMG_RE.finditer(html))
+    if not matches:
+        return html
+    names = set()
+    for match in matches:
+        src = SRC_RE.search(match.group(1))
+        name = _media_name(src.group(1)) if src else None
+        if name:
+            names.add(name)
+    images = {image.image.name: image for image in PostImage.objects.filter(image__in=names)} if names else {}
+
+    def replace(match):
+        attrs = match.group(1)
+        src = SRC_RE.search(attrs)
+        image = images.get(_media_name(src.group(1))) if src else None
+        # 后台任务生成缩小版本之后才知道原图的宽高
+        if image is not None and image.width and 'srcset=' not in attrs:
+            widths = sorted(image.get_variants().get('widths', {}).items(), key=lambda item: int(item[0]))
+            candidates = ['{} {}w'.format(image.image.storage.url(name), width) for width, name in widths]
+            candidates.append('{} {}w'.format(image.image.url, image.width))
+            attrs += ' srcset="{}" sizes="{}"'.format(', '.join(candidates), IMAGE_SIZES)
+            if 'width=' not in attrs:
+                attrs += ' width="{}" height="{}"'.format(image.width, image.height)
+        if 'loading=' not in attrs:
+            attrs += ' loading="lazy"'
+        return '<img{} />'.format(attrs)
+
+    return IMG_RE.sub(replace, html)
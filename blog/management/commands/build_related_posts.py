@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = '重新计算全部文章的相关文章并写入缓存'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_related_posts()
+        self.stdout.write(self.style.SUCCESS('已计算 {} 篇文章的相关文章，耗时 {:.2f} 秒'.format(
+            count, time.perf_counter() - start,
+        )))
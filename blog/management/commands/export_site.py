@@ -0,0 +1,46 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.export import MANIFEST_NAME, export_site
+
+
+class Command(BaseCommand):
+    help = '把博客的全部页面预渲染为静态文件，供 nginx 直接提供服务'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.STATIC_EXPORT_ROOT,
+            help='导出目录，默认为 settings.STATIC_EXPORT_ROOT',
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='只重新生成上一次导出之后修改过的文章涉及的页面',
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=os.cpu_count() or 1,
+            help='并行渲染的进程数，默认为 CPU 核数',
+        )
+
+    def handle(self, *args, **options):
+        output_dir = os.path.abspath(options['output'])
+        # 全量导出会整体替换导出目录，为了避免误删，只允许导出到空目录或者之前导出过的目录
+        if (os.path.isdir(output_dir) and os.listdir(output_dir)
+                and not os.path.exists(os.path.join(output_dir, MANIFEST_NAME))):
+            raise CommandError('{} 不是空目录，也不是之前导出的目录'.format(output_dir))
+
+        start = time.perf_counter()
+        full, written, failed = export_site(
+            output_dir,
+            incremental=options['incremental'],
+            jobs=max(1, options['jobs']),
+        )
+        elapsed = time.perf_counter() - start
+
+        for url in failed:
+            self.stderr.write('渲染失败：{}'.format(url))
+        self.stdout.write(self.style.SUCCESS('{}导出完成：写入 {} 个文件，耗时 {:.2f} 秒，目录 {}'.format(
+            '全量' if full else '增量', written, elapsed, output_dir,
+        )))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.publishing import publish_due_posts
+
+
+class Command(BaseCommand):
+    help = '发布到达发布时间的定时发布文章，建议每分钟执行一次'
+
+    def handle(self, *args, **options):
+        count = publish_due_posts()
+        self.stdout.write(self.style.SUCCESS('发布了 {} 篇定时发布的文章'.format(count)))
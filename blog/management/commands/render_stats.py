@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.rendering import get_render_stats
+
+
+class Command(BaseCommand):
+    help = '查看 Markdown 渲染的统计数据，以及最近的慢渲染、超时和被拒绝渲染的文章'
+
+    def handle(self, *args, **options):
+        stats = get_render_stats()
+        self.stdout.write('渲染 {total} 次，慢渲染 {slow} 次，超时 {timeout} 次，超出大小限制 {rejected} 次，出错 {failed} 次'.format(
+            **stats
+        ))
+        for record in stats['recent']:
+            self.stdout.write('{} {:<8} {:<12} {:>8.3f}s {:>8} 字符 {}'.format(
+                timezone.localtime(record['time']).strftime('%Y-%m-%d %H:%M:%S'), record['stat'], record['name'],
+                record['seconds'], record['length'], record['reason'],
+            ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.trending import rollup
+
+
+class Command(BaseCommand):
+    help = '把较早的小时阅读量合并为天阅读量，并删除过期的阅读量统计，建议每小时执行一次'
+
+    def handle(self, *args, **options):
+        merged, expired = rollup()
+        self.stdout.write(self.style.SUCCESS('合并了 {} 个小时桶，删除了 {} 个过期的桶'.format(merged, expired)))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from blog.tasks import work
+
+
+class Command(BaseCommand):
+    help = '启动后台任务 worker，执行 blog.tasks.enqueue 加入队列的任务。生产环境由 supervisor 守护运行'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='执行完当前到期的任务后退出，而不是一直等待新的任务',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='队列为空时等待的秒数，默认 1 秒',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            succeeded, failed = work(once=options['once'], sleep=options['sleep'])
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS('执行了 {} 个任务，{} 个失败'.format(succeeded + failed, failed)))
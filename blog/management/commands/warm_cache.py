@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.warmup import HOT_POSTS_NUM, warm_caches
+
+
+class Command(BaseCommand):
+    help = '部署后、重新启动应用前预热缓存：编译模板，计算侧边栏、RSS、相关文章和热门文章，并预渲染热门文章'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=HOT_POSTS_NUM,
+            help='预渲染的热门文章数量，默认 {}'.format(HOT_POSTS_NUM),
+        )
+
+    def handle(self, *args, **options):
+        report = warm_caches(options['posts'])
+        self.stdout.write(self.style.SUCCESS(
+            '缓存预热完成：编译模板 {templates} 个，预渲染页面 {pages} 个（热门文章 {posts} 篇），'
+            '写入缓存 {keys} 项，耗时 {seconds:.2f} 秒'.format(**report)
+        ))
+        if report['failed']:
+            # 预渲染失败说明新代码或数据有问题，让部署脚本在重新启动应用之前停下来
+            raise CommandError('以下页面渲染失败：{}'.format('、'.join(report['failed'])))
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.3 on 2026-10-19 14:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_auto_20261019_2238'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('h', '小时'), ('d', '天')], max_length=1, verbose_name='时间粒度')),
+                ('start', models.DateTimeField(verbose_name='开始时间')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='阅读量')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='blog.Post', verbose_name='文章')),
+            ],
+            options={
+                'verbose_name': '文章阅读量统计',
+                'verbose_name_plural': '文章阅读量统计',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postviewcount',
+            index=models.Index(fields=['start', 'post'], name='blog_postvi_start_a4d159_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postviewcount',
+            unique_together={('post', 'period', 'start')},
+        ),
+    ]
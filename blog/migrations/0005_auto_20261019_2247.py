@@ -0,0 +1,41 @@
+# Generated by Django 2.2.3 on 2026-10-19 14:47
+
+from django.db import migrations, models
+
+
+def render_existing_posts(apps, schema_editor):
+    # 为已有的文章生成渲染后的正文和目录，迁移中无法调用模型的 save 方法，因此直接调用渲染函数
+    from blog.models import generate_rich_content
+
+    Post = apps.get_model('blog', 'Post')
+    for post in Post.objects.only('id', 'body').iterator():
+        rich_content = generate_rich_content(post.body)
+        Post.objects.filter(pk=post.pk).update(
+            rendered_body=rich_content['content'],
+            rendered_toc=rich_content['toc'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_auto_20261019_2246'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='rendered_body',
+            field=models.TextField(blank=True, editable=False, verbose_name='正文 HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rendered_toc',
+            field=models.TextField(blank=True, editable=False, verbose_name='目录 HTML'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_time', 'id'], name='blog_post_created_0c6d64_idx'),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 2.2.3 on 2026-10-19 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_auto_20261019_2256'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'default_manager_name': 'objects', 'ordering': ['-created_time'], 'verbose_name': '文章', 'verbose_name_plural': '文章'},
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='pub_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='定时发布时间'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('draft', '草稿'), ('scheduled', '定时发布'), ('published', '已发布')], default='published', max_length=10, verbose_name='状态'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'created_time', 'id'], name='blog_post_status_7953da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'pub_time'], name='blog_post_status_cd2fc3_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.3 on 2026-10-19 15:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_posts(apps, schema_editor):
+    # 统计已有的文章数，迁移中的模型没有自定义的 Manager，需要自己加上已发布的条件
+    Category = apps.get_model('blog', 'Category')
+    Tag = apps.get_model('blog', 'Tag')
+    Post = apps.get_model('blog', 'Post')
+
+    def count(queryset, field):
+        counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(counts), 0)
+
+    Category.objects.update(num_posts=count(Post.objects.filter(status='published'), 'category'))
+    Tag.objects.update(num_posts=count(Post.tags.through.objects.filter(post__status='published'), 'tag'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_auto_20261019_2304'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='num_posts',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='文章数'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='num_posts',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='文章数'),
+        ),
+        migrations.RunPython(count_existing_posts, migrations.RunPython.noop),
+    ]
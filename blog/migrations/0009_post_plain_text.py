@@ -0,0 +1,28 @@
+# Generated by Django 2.2.3 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+def extract_plain_text(apps, schema_editor):
+    # 从已经渲染好的正文生成纯文本；还没有渲染的文章由渲染任务一起生成
+    from blog.models import html_to_text
+
+    Post = apps.get_model('blog', 'Post')
+    for pk, rendered_body in Post.objects.exclude(rendered_body='').values_list('pk', 'rendered_body').iterator():
+        Post.objects.filter(pk=pk).update(plain_text=html_to_text(rendered_body))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_taxonomy_num_posts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='plain_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='纯文本'),
+        ),
+        migrations.RunPython(extract_plain_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.3 on 2026-10-19 15:28
+
+import blog.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_post_plain_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.FileField(upload_to=blog.models.post_image_upload_to, verbose_name='图片')),
+                ('width', models.PositiveIntegerField(editable=False, null=True, verbose_name='宽度')),
+                ('height', models.PositiveIntegerField(editable=False, null=True, verbose_name='高度')),
+                ('variants', models.TextField(blank=True, editable=False, verbose_name='缩放版本')),
+                ('created_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='上传时间')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='blog.Post', verbose_name='文章')),
+            ],
+            options={
+                'verbose_name': '文章图片',
+                'verbose_name_plural': '文章图片',
+                'ordering': ['created_time', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.3 on 2026-10-19 15:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_existing_posts(apps, schema_editor):
+    # 为已经写过文章的作者生成统计数据，迁移中的模型没有自定义的 Manager，需要自己加上已发布的条件
+    AuthorStats = apps.get_model('blog', 'AuthorStats')
+    Post = apps.get_model('blog', 'Post')
+
+    author_ids = Post.objects.order_by().values_list('author_id', flat=True).distinct()
+    AuthorStats.objects.bulk_create([AuthorStats(user_id=pk) for pk in author_ids])
+    posts = Post.objects.filter(status='published', author=OuterRef('pk')).order_by().values('author')
+    AuthorStats.objects.update(
+        num_posts=Coalesce(Subquery(posts.annotate(n=Count('pk')).values('n')), 0),
+        total_views=Coalesce(Subquery(posts.annotate(n=Sum('views')).values('n')), 0),
+        latest_post_time=Subquery(posts.annotate(t=Max('created_time')).values('t')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('blog', '0010_post_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='作者')),
+                ('num_posts', models.PositiveIntegerField(default=0, verbose_name='文章数')),
+                ('total_views', models.PositiveIntegerField(default=0, verbose_name='总阅读量')),
+                ('latest_post_time', models.DateTimeField(null=True, verbose_name='最新文章时间')),
+            ],
+            options={
+                'verbose_name': '作者统计',
+                'verbose_name_plural': '作者统计',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'author', 'created_time', 'id'], name='blog_post_status_d573d9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='authorstats',
+            index=models.Index(fields=['latest_post_time', 'user'], name='blog_author_latest__1b8abf_idx'),
+        ),
+        migrations.RunPython(count_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.3 on 2026-10-19 16:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_author_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stat', models.CharField(max_length=20, verbose_name='类型')),
+                ('name', models.CharField(blank=True, max_length=100, verbose_name='名称')),
+                ('seconds', models.FloatField(verbose_name='耗时')),
+                ('length', models.PositiveIntegerField(verbose_name='字符数')),
+                ('reason', models.CharField(blank=True, max_length=200, verbose_name='原因')),
+                ('created_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='时间')),
+            ],
+            options={
+                'verbose_name': '渲染记录',
+                'verbose_name_plural': '渲染记录',
+                'ordering': ['-pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RenderStat',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False, verbose_name='统计项')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='次数')),
+            ],
+            options={
+                'verbose_name': '渲染统计',
+                'verbose_name_plural': '渲染统计',
+            },
+        ),
+    ]
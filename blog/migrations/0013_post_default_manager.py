@@ -0,0 +1,24 @@
+# Generated by Django 2.2.3 on 2026-10-19 16:09
+
+from django.db import migrations
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_render_stats'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'default_manager_name': 'all_objects', 'ordering': ['-created_time'], 'verbose_name': '文章', 'verbose_name_plural': '文章'},
+        ),
+        migrations.AlterModelManagers(
+            name='post',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
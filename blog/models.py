@@ -1,18 +1,24 @@
+import hashlib
+import json
+import os
 import re
+from html import unescape
 
 from django.db import models
 
 # Create your models here.
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.urls import reverse
-import markdown
 from django.utils.functional import cached_property
 from django.utils.html import strip_tags
-from markdown.extensions.toc import TocExtension
-from django.utils.text import slugify
+
+from .background import run_in_background
+from .rendering import render_markdown
 
 class Category(models.Model):
     """
@@ -25,6 +31,8 @@ class Category(models.Model):
     https://docs.djangoproject.com/en/2.2/ref/models/fields/#field-types
     """
     name = models.CharField(max_length=100)
+    # 已发布的文章数，由 blog/counters.py 维护，侧边栏按 num_posts > 0 筛选时可以走索引
+    num_posts = models.PositiveIntegerField('文章数', default=0, editable=False, db_index=True)
 
     # 定义好 __str__ 方法后，解释器显示的内容将会是 __str__ 方法返回的内容。
     # 这里 Category 返回分类名 name ，Tag 返回标签名，而 Post 返回它的 title。
@@ -42,6 +50,7 @@ class Tag(models.Model):
     再次强调一定要继承 models.Model 类！
     """
     name = models.CharField(max_length=100)
+    num_posts = models.PositiveIntegerField('文章数', default=0, editable=False, db_index=True)
 
     def __str__(self):
         return self.name
@@ -51,10 +60,33 @@ class Tag(models.Model):
         verbose_name_plural = verbose_name
 
 
+class PublishedManager(models.Manager):
+    """
+    只返回已发布文章的 Manager，即 Post.objects。视图、RSS、站点地图、接口和侧边栏都通过 Post.objects 读取文章，
+    不需要在每一处重复过滤条件。
+
+    它不是 Post 的默认 Manager：django 用默认 Manager 校验外键表单、查找后台的 raw_id 和自动补全，
+    默认 Manager 只有已发布的文章时，后台就不能把评论、图片关联到草稿和定时发布的文章上。
+    因此默认 Manager 是包含全部文章的 all_objects，category.post_set 之类的关联查询也会包含未发布的文章，
+    公开的页面不能使用它们。
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(status=Post.PUBLISHED)
+
+
 class Post(models.Model):
     """
     文章的数据库表稍微复杂一点，主要是涉及的字段更多。
     """
+    DRAFT = 'draft'
+    SCHEDULED = 'scheduled'
+    PUBLISHED = 'published'
+    STATUS_CHOICES = (
+        (DRAFT, '草稿'),
+        (SCHEDULED, '定时发布'),
+        (PUBLISHED, '已发布'),
+    )
 
     # 首先看到 rich_content 这个方法，它返回的是 generate_rich_content 函数调用后的结果，即将 body 属性的值经 Markdown 解析后的内容。
     # 但要注意的是我们使用了 django 提供的 cached_property 装饰器，这个装饰器和 Python 内置的 property 装饰器功能一样，可以将方法转为属性，
@@ -74,7 +106,16 @@ class Post(models.Model):
 
     @cached_property
     def rich_content(self):
-        return generate_rich_content(self.body)
+        # 保存文章时已经把渲染结果存入 rendered_body 和 rendered_toc，读取时不再需要 Markdown 解析
+        if self.rendered_body:
+            return {"content": self.rendered_body, "toc": self.rendered_toc}
+        return generate_rich_content(self.body, 'post:{}'.format(self.pk))
+
+    # 渲染后的正文和目录，在 save 方法中由 body 生成，不允许在 admin 后台编辑
+    rendered_body = models.TextField('正文 HTML', blank=True, editable=False)
+    rendered_toc = models.TextField('目录 HTML', blank=True, editable=False)
+    # 渲染后的正文去掉 HTML 标签得到的纯文本，用于搜索和截取搜索结果的摘要，见 blog/search.py
+    plain_text = models.TextField('纯文本', blank=True, editable=False)
 
     # 新增 views 字段记录阅读量,注意 views 字段的类型为 PositiveIntegerField，该类型的值只允许为正整数或 0，因为阅读量不可能为负值。
     # 初始化时 views 的值为 0。将 editable 参数设为 False 将不允许通过 django admin 后台编辑此字段的内容。
@@ -122,9 +163,22 @@ class Post(models.Model):
     # Category 类似。
     author = models.ForeignKey(User,verbose_name='作者', on_delete=models.CASCADE)
 
+    # 发布状态。草稿和定时发布的文章只在 admin 后台可见，定时发布的文章到了 pub_time 之后
+    # 由 python manage.py publish_scheduled 改为已发布，见 blog/publishing.py
+    status = models.CharField('状态', max_length=10, choices=STATUS_CHOICES, default=PUBLISHED)
+    pub_time = models.DateTimeField('定时发布时间', null=True, blank=True)
+
+    # objects 只包含已发布的文章，公开的页面都使用它；admin 后台、后台任务等需要全部文章的地方使用 all_objects
+    objects = PublishedManager()
+    all_objects = models.Manager()
+
     def __str__(self):
         return self.title
 
+    def clean(self):
+        if self.status == self.SCHEDULED and self.pub_time is None:
+            raise ValidationError({'pub_time': '定时发布的文章需要设置发布时间'})
+
     # 配置model的一些特性是通过model的内部类Meta中来定义。
     # 通过 verbose_name 来指定对应的 model 在 admin 后台的显示名称，这里 verbose_name_plural 用来表示多篇文章时的复数显示形式。
     # 英语中，如果有多篇文章，就会显示为 Posts，表示复数，中文没有复数表现形式，所以定义为和 verbose_name一样。
@@ -134,6 +188,17 @@ class Post(models.Model):
         # django 允许我们在 models.Model 的子类里定义一个名为 Meta 的内部类，通过这个内部类指定一些属性的值来规定这个模型类该有的一些特性，
         # 例如在这里我们要指定 Post 的排序方式。首先看到 Post 的代码，在 Post 模型的内部定义的 Meta 类中，指定排序属性 ordering：
         ordering = ['-created_time']
+        # 文章列表按 (created_time, id) 做游标分页，见 blog/api.py
+        # Post.objects 总是带着 status = 'published' 的条件，(status, created_time, id) 索引可以直接按顺序读出已发布的文章；
+        # (status, pub_time) 索引用于查找到期的定时发布文章
+        indexes = [
+            models.Index(fields=['created_time', 'id']),
+            models.Index(fields=['status', 'created_time', 'id']),
+            models.Index(fields=['status', 'pub_time']),
+            # 作者页面按作者读取已发布的文章，同样按 (created_time, id) 做游标分页，见 blog/views.py
+            models.Index(fields=['status', 'author', 'created_time', 'id']),
+        ]
+        default_manager_name = 'all_objects'
 
     def save(self, *args, **kwargs):
         self.modified_time = timezone.now()
@@ -150,8 +215,43 @@ class Post(models.Model):
         # # 从文本摘取前 54 个字符赋给 excerpt
         # self.excerpt = strip_tags(md.convert(self.body))[:54]
 
+        # 正文被修改时清空旧的渲染结果，由后台任务重新渲染 Markdown（见 blog/signals.py），保存文章不需要等待渲染，
+        # 渲染完成之前读取 rich_content 会即时渲染。只更新其它字段（例如 update_fields=['views']）时跳过
+        update_fields = kwargs.get('update_fields')
+        old = self.stored_values() if update_fields is None else None
+        # 保存之前的状态和分类，用于更新分类、标签的文章数，见 blog/counters.py
+        self._stored_values = old
+
+        # 草稿或者定时发布的文章改为已发布时，以发布的时间作为文章的时间，让它出现在文章列表的最前面
+        if old is not None and old['status'] != self.PUBLISHED and self.status == self.PUBLISHED:
+            self.created_time = self.modified_time
+
+        if update_fields is None:
+            self._render_pending = old is None or old['body'] != self.body
+        else:
+            self._render_pending = 'body' in update_fields and self.body_changed()
+        if self._render_pending:
+            self.rendered_body = ''
+            self.rendered_toc = ''
+            self.plain_text = ''
+            self.__dict__.pop('rich_content', None)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'rendered_body', 'rendered_toc', 'plain_text'}
+
         super().save(*args, **kwargs)
 
+    def stored_values(self):
+        # 数据库中保存的标题、正文、状态、分类、作者和创建时间，新建的文章返回 None
+        if self.pk is None:
+            return None
+        return Post.all_objects.filter(pk=self.pk).values(
+            'title', 'body', 'status', 'category_id', 'author_id', 'created_time',
+        ).first()
+
+    def body_changed(self):
+        old = self.stored_values()
+        return old is None or old['body'] != self.body
+
     # 自定义 get_absolute_url 方法
     # 看到这个 reverse 函数，它的第一个参数的值是 'blog:detail'，意思是 blog 应用下的 name=detail 的函数，
     # 由于我们在上面通过 app_name = 'blog' 告诉了 django 这个 URL 模块是属于 blog 应用的，
@@ -165,23 +265,237 @@ class Post(models.Model):
     """
     一旦用户访问了某篇文章，这时就应该将 views 的值 +1，
     increase_views 方法首先将自身对应的 views 字段的值 +1（此时数据库中的值还没变），
-    然后调用 save 方法将更改后的值保存到数据库。注意这里使用了 update_fields 参数来告诉 Django 只更新数据库中 views 字段的值，以提高效率。
-    
+    然后用 F 表达式让数据库在原值的基础上 +1，并发访问时不会互相覆盖，也不会触发 save 中对 modified_time 的更新。
+    写数据库不影响本次响应的内容，因此交给后台线程执行，不占用响应时间。
+    同时在按小时分桶的阅读量中记录这次访问，用于统计热门文章。
     """
     def increase_views(self):
         self.views += 1
-        self.save(update_fields=['views'])
-
-def generate_rich_content(value):
-    md = markdown.Markdown(
-        extensions=[
-            "markdown.extensions.extra",
-            "markdown.extensions.codehilite",
-            # 记得在顶部引入 TocExtension 和 slugify
-            TocExtension(slugify=slugify),
-        ]
+        run_in_background(self.save_view)
+
+    def save_view(self):
+        Post.all_objects.filter(pk=self.pk).update(views=F('views') + 1)
+        PostViewCount.record(self.pk)
+        AuthorStats.objects.filter(pk=self.author_id).update(total_views=F('total_views') + 1)
+
+
+class PostViewCount(models.Model):
+    """
+    按时间分桶的文章阅读量。最近的访问按小时计数，python manage.py rollup_post_views 把较早的小时桶合并为天桶，
+    并删除超出最长统计窗口的数据，表的大小只和文章数量、统计窗口长度有关，和访问量无关。
+    """
+    HOUR = 'h'
+    DAY = 'd'
+    PERIOD_CHOICES = (
+        (HOUR, '小时'),
+        (DAY, '天'),
     )
-    content = md.convert(value)
-    m = re.search(r'<div class="toc">\s*<ul>(.*)</ul>\s*</div>', md.toc, re.S)
-    toc = m.group(1) if m is not None else ""
-    return {"content": content, "toc": toc}
\ No newline at end of file
+
+    post = models.ForeignKey(Post, verbose_name='文章', on_delete=models.CASCADE)
+    period = models.CharField('时间粒度', max_length=1, choices=PERIOD_CHOICES)
+    start = models.DateTimeField('开始时间')
+    count = models.PositiveIntegerField('阅读量', default=0)
+
+    class Meta:
+        verbose_name = '文章阅读量统计'
+        verbose_name_plural = verbose_name
+        unique_together = [('post', 'period', 'start')]
+        # 热门文章按时间范围统计，start 在前的索引可以直接定位到统计窗口内的行
+        indexes = [models.Index(fields=['start', 'post'])]
+
+    @classmethod
+    def record(cls, post_id, count=1, now=None):
+        start = (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+        cls.add(post_id, cls.HOUR, start, count)
+
+    @classmethod
+    def add(cls, post_id, period, start, count):
+        lookup = {'post_id': post_id, 'period': period, 'start': start}
+        if cls.objects.filter(**lookup).update(count=F('count') + count):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(count=count, **lookup)
+        except IntegrityError:
+            # 另一个请求抢先创建了这个桶
+            cls.objects.filter(**lookup).update(count=F('count') + count)
+
+class AuthorStats(models.Model):
+    """
+    作者的统计数据：已发布的文章数、这些文章的总阅读量和最新一篇文章的发布时间，由 blog/counters.py 维护。
+    作者列表和作者页面直接读取这张表，不需要每次在文章表上按作者聚合。
+    """
+    user = models.OneToOneField(
+        User, verbose_name='作者', primary_key=True, related_name='author_stats', on_delete=models.CASCADE,
+    )
+    num_posts = models.PositiveIntegerField('文章数', default=0)
+    total_views = models.PositiveIntegerField('总阅读量', default=0)
+    latest_post_time = models.DateTimeField('最新文章时间', null=True)
+
+    class Meta:
+        verbose_name = '作者统计'
+        verbose_name_plural = verbose_name
+        # 作者列表按最新文章时间倒序做游标分页
+        indexes = [models.Index(fields=['latest_post_time', 'user'])]
+
+    def __str__(self):
+        return str(self.user)
+
+    def get_absolute_url(self):
+        return reverse('blog:author', kwargs={'pk': self.pk})
+
+
+def post_image_upload_to(instance, filename):
+    """
+    上传的图片以内容的哈希值命名，内容不变地址就不变，可以让浏览器和 CDN 永久缓存。
+    """
+    sha = hashlib.sha256()
+    for chunk in instance.image.chunks():
+        sha.update(chunk)
+    ext = os.path.splitext(filename)[1].lower()
+    return 'posts/{}{}'.format(sha.hexdigest()[:20], ext)
+
+
+class PostImage(models.Model):
+    """
+    文章中使用的图片。上传后由后台任务生成缩略图和不同宽度的版本（见 blog/images.py），
+    正文中用 Markdown 引用原图的地址，渲染时自动加上 srcset。
+    """
+    post = models.ForeignKey(Post, verbose_name='文章', on_delete=models.CASCADE, related_name='images')
+    image = models.FileField('图片', upload_to=post_image_upload_to)
+    width = models.PositiveIntegerField('宽度', null=True, editable=False)
+    height = models.PositiveIntegerField('高度', null=True, editable=False)
+    # 生成的版本，JSON 格式：{"thumbnail": 文件名, "widths": {"320": 文件名, ...}}，为空表示还没有生成
+    variants = models.TextField('缩放版本', blank=True, editable=False)
+    created_time = models.DateTimeField('上传时间', default=timezone.now)
+
+    class Meta:
+        verbose_name = '文章图片'
+        verbose_name_plural = verbose_name
+        ordering = ['created_time', 'id']
+
+    def __str__(self):
+        return self.image.name
+
+    def get_variants(self):
+        return json.loads(self.variants) if self.variants else {}
+
+
+def generate_rich_content(value, name=''):
+    # 作者编写的 Markdown 可能非常耗时，在 blog/rendering.py 中有时间和大小限制地渲染，超出限制时返回转义后的纯文本
+    # 正文中引用的已上传图片加上 srcset，所有图片延迟加载。images 模块需要查询 PostImage，在这里导入避免循环导入
+    from .images import responsive_images
+
+    rich_content = render_markdown(value, name)
+    rich_content['content'] = responsive_images(rich_content['content'])
+    return rich_content
+
+
+def html_to_text(html):
+    """
+    把渲染后的正文转为纯文本，连续的空白合并为一个空格。
+    """
+    return re.sub(r'\s+', ' ', unescape(strip_tags(html))).strip()
+
+
+def render_post_content(pk):
+    """
+    后台任务：渲染文章的 Markdown 并保存到 rendered_body 和 rendered_toc，同时保存纯文本 plain_text。
+    只有渲染期间正文没有被再次修改时才保存，否则交给修改正文时新加入的任务。
+    只修改状态、分类、标签等不会重新加入任务，因此按正文而不是按修改时间判断，这些修改不会让渲染结果被丢弃。
+    """
+    body = Post.all_objects.filter(pk=pk).values_list('body', flat=True).first()
+    if body is None:
+        return
+    rich_content = generate_rich_content(body, 'post:{}'.format(pk))
+    updated = Post.all_objects.filter(pk=pk, body=body).update(
+        rendered_body=rich_content['content'],
+        rendered_toc=rich_content['toc'],
+        plain_text=html_to_text(rich_content['content']),
+    )
+    if updated:
+        # 接口中等待渲染的正文现在可以返回了，更新接口的版本号
+        from .http_cache import API_VERSION_KEY, bump_version
+        bump_version(API_VERSION_KEY)
+
+
+class Task(models.Model):
+    """
+    保存在数据库中的后台任务，由 python manage.py run_tasks 启动的 worker 进程执行，见 blog/tasks.py。
+    name 是任务函数的导入路径，args 是 JSON 格式的参数列表。
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, '等待执行'),
+        (RUNNING, '正在执行'),
+        (FAILED, '执行失败'),
+    )
+
+    name = models.CharField('任务', max_length=200)
+    args = models.TextField('参数', default='[]')
+    # 相同 key 的任务在等待执行时只保留一个，默认为任务名加参数，例如同一篇文章的多次修改只渲染一次
+    key = models.CharField('去重键', max_length=255, db_index=True)
+    status = models.CharField('状态', max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField('执行次数', default=0)
+    run_at = models.DateTimeField('计划执行时间', default=timezone.now)
+    started_time = models.DateTimeField('开始执行时间', null=True, blank=True)
+    last_error = models.TextField('错误信息', blank=True)
+    created_time = models.DateTimeField('创建时间', default=timezone.now)
+
+    class Meta:
+        verbose_name = '后台任务'
+        verbose_name_plural = verbose_name
+        # worker 按 (status, run_at) 查找到期的任务
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return '{}({})'.format(self.name, self.args)
+
+
+class RenderStat(models.Model):
+    """
+    Markdown 渲染的计数器（总次数、慢渲染、超时、被拒绝、出错），见 blog/rendering.py。
+    计数用 UPDATE ... SET count = count + 1 累加，多个进程同时记录也不会丢失。
+    """
+    name = models.CharField('统计项', max_length=20, primary_key=True)
+    count = models.PositiveIntegerField('次数', default=0)
+
+    class Meta:
+        verbose_name = '渲染统计'
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return '{}: {}'.format(self.name, self.count)
+
+    @classmethod
+    def incr(cls, name):
+        if cls.objects.filter(name=name).update(count=F('count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, count=1)
+        except IntegrityError:
+            # 另一个进程抢先创建了这一行
+            cls.objects.filter(name=name).update(count=F('count') + 1)
+
+
+class RenderRecord(models.Model):
+    """
+    最近的慢渲染、超时、被拒绝和出错的渲染，每次一行，只保留最新的几行，见 blog/rendering.py。
+    """
+    stat = models.CharField('类型', max_length=20)
+    name = models.CharField('名称', max_length=100, blank=True)
+    seconds = models.FloatField('耗时')
+    length = models.PositiveIntegerField('字符数')
+    reason = models.CharField('原因', max_length=200, blank=True)
+    created_time = models.DateTimeField('时间', default=timezone.now)
+
+    class Meta:
+        verbose_name = '渲染记录'
+        verbose_name_plural = verbose_name
+        ordering = ['-pk']
+
+    def __str__(self):
+        return '{} {}'.format(self.stat, self.name)
@@ -0,0 +1,129 @@
+# admin 列表页使用的分页器。
+#
+# django 的分页器需要用 COUNT(*) 计算总数，PostgreSQL、MySQL(InnoDB) 的 COUNT(*) 要扫描整张表，
+# 评论达到几十万条后每次打开 admin 列表页都要等这一条查询。没有任何过滤条件时，总数只用来显示页码，
+# 不需要精确，改为读取数据库统计信息中的估计行数；有过滤条件或者表很小时仍然精确计数。
+#
+# 前台的作者列表和作者页面使用游标分页（keyset_page），和 blog/api.py 的接口一样：按排序字段记住上一页最后一行的值，
+# 下一页从这个值之后开始读，不需要 COUNT(*)，也不需要 OFFSET 跳过前面的行，翻页再深也只是一次索引范围查询。
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# 估计行数小于这个值时精确计数，小表的 COUNT(*) 很快，估计值反而可能偏差较大
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimate_count(model, using='default'):
+    """
+    从数据库的统计信息中读取表的估计行数，数据库不支持时返回 None。
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    elif connection.vendor == 'mysql':
+        sql = 'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s'
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """
+    游标分页的一页。cursor 是这一页的游标（第一页为 None），next_cursor 是下一页的游标，没有下一页时为 None。
+    """
+
+    def __init__(self, object_list, cursor, next_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def is_first(self):
+        return self.cursor is None
+
+
+def _ordering_fields(model, ordering):
+    fields = []
+    for name in ordering:
+        name = name.lstrip('-')
+        fields.append(model._meta.pk if name == 'pk' else model._meta.get_field(name))
+    return fields
+
+
+def encode_keyset_cursor(values):
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_keyset_cursor(cursor, fields):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise InvalidCursor(cursor)
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValueError, UnicodeError, ValidationError):
+        raise InvalidCursor(cursor)
+    if any(value is None for value in values):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def keyset_page(queryset, ordering, per_page, cursor=None):
+    """
+    按 ordering（例如 ('-created_time', '-id')，最后一个字段必须唯一）做游标分页，返回 KeysetPage。
+    游标无效时抛出 InvalidCursor。排序字段应该有对应的索引，否则每一页仍然要排序整张表。
+    """
+    fields = _ordering_fields(queryset.model, ordering)
+    if cursor:
+        values = decode_keyset_cursor(cursor, fields)
+        # (a, b) < (x, y) 展开为 a < x OR (a = x AND b < y)，数据库可以用索引做范围查询
+        condition = Q()
+        for i, name in enumerate(ordering):
+            lookup = '{}__{}'.format(name.lstrip('-'), 'lt' if name.startswith('-') else 'gt')
+            clause = Q(**{lookup: values[i]})
+            for previous, value in zip(ordering[:i], values):
+                clause &= Q(**{previous.lstrip('-'): value})
+            condition |= clause
+        queryset = queryset.filter(condition)
+
+    object_list = list(queryset.order_by(*ordering)[:per_page + 1])
+    next_cursor = None
+    if len(object_list) > per_page:
+        object_list = object_list[:per_page]
+        last = object_list[-1]
+        next_cursor = encode_keyset_cursor([getattr(last, field.attname) for field in fields])
+    return KeysetPage(object_list, cursor, next_cursor)
@@ -0,0 +1,43 @@
+# 定时发布。编辑在 admin 后台把文章设为“定时发布”并填写发布时间，python manage.py publish_scheduled
+# 把到期的文章改为已发布。不管同时到期多少篇文章，都只用一条 UPDATE 修改，之后只清除一次缓存（见 blog/signals.py）。
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Post
+from .signals import posts_changed_in_bulk
+
+
+def publish_posts(queryset, now=None):
+    """
+    把 queryset 中还没有发布的文章改为已发布，返回发布的文章数量。
+
+    文章的时间改为发布的时间：已经到期的定时发布文章使用设定的发布时间，其它文章（包括提前手动发布的）使用当前时间。
+    """
+    now = now or timezone.now()
+    queryset = queryset.exclude(status=Post.PUBLISHED)
+    scheduled = queryset.filter(status=Post.SCHEDULED, pub_time__lte=now).update(
+        status=Post.PUBLISHED, created_time=F('pub_time'), modified_time=now,
+    )
+    others = queryset.update(status=Post.PUBLISHED, created_time=now, modified_time=now)
+    if scheduled or others:
+        posts_changed_in_bulk()
+    return scheduled + others
+
+
+def publish_due_posts(now=None):
+    """
+    发布到期的定时发布文章，返回发布的文章数量。
+    """
+    now = now or timezone.now()
+    due = Post.all_objects.filter(status=Post.SCHEDULED, pub_time__lte=now)
+    return publish_posts(due, now)
+
+
+def unpublish_posts(queryset):
+    """
+    把 queryset 中已发布的文章改为草稿，返回修改的文章数量。
+    """
+    count = queryset.filter(status=Post.PUBLISHED).update(status=Post.DRAFT, modified_time=timezone.now())
+    if count:
+        posts_changed_in_bulk()
+    return count
@@ -0,0 +1,252 @@
+# 相关文章：根据文章之间共同的标签和分类计算相似度，预先算好每篇文章的相关文章列表并放入缓存，
+# 详情页只需要一次缓存读取。
+#
+# 相似度 = 共同标签数 * 2 + 是否同一分类，只给至少有一个共同标签的文章打分；相关文章不足 RELATED_POSTS_NUM 篇时，
+# 读取时用同一分类下最新的文章补足。共同标签数不逐篇求交集，而是用 Counter 一次数出这篇文章每个标签的倒排表中
+# 每篇文章出现的次数，计数在 C 实现的 Counter 中完成，只有至少一个共同标签的候选文章才会出现在结果中。
+#
+# 缓存中保存了一份持久的倒排索引，文章被修改时只增量更新，不需要读取全部文章：
+# - 每篇文章一项：{'title', 'category', 'tags', 'created', 'posts': [[文章 id, 标题, 分数, 创建时间], ...], 'more'}，
+#   保存分类和标签是为了文章被修改后能找到修改前与它相关的文章，more 表示候选文章多于列表中的文章
+# - 每个标签一项：有这个标签的文章 id 列表（「标签 -> 文章」的倒排表）
+# - 每个分类一项：分类下最新的几篇文章 [[文章 id, 标题], ...]，用于补足相关文章
+#
+# 文章被修改时，只从数据库重新读取它增加或去掉的标签的倒排表，只重新计算它自己的相关文章；和它有共同标签的文章
+# 只需要在各自的列表中插入、移除或更新这一篇文章，只有它原本在列表中且分数下降时才需要重新计算那篇文章。
+# 缓存中的项被淘汰时，标签的倒排表从数据库重新读取，文章的相关文章在读取时由后台任务重新计算。
+#
+# 全量重建（python manage.py build_related_posts）会一次写入全部文章的缓存。文件缓存（FileBasedCache）每次写入
+# 都会列出整个缓存目录检查是否需要淘汰，写入 n 项的耗时和 n 的平方成正比，文章较多时生产环境应该使用
+# memcached、redis 等缓存，见 blogproject/settings/production.py。
+import heapq
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.core.cache import cache
+
+from .models import Post
+from .tasks import enqueue
+
+RELATED_POSTS_NUM = 5
+RELATED_POSTS_CACHE_KEY = 'blog:related_posts:{}'
+TAG_POSTS_CACHE_KEY = 'blog:related_posts:tag:{}'
+CATEGORY_POSTS_CACHE_KEY = 'blog:related_posts:category:{}'
+# 缓存未命中时加入计算任务的标记，在这段时间（秒）内同一篇文章的请求不会重复加入任务
+PENDING_CACHE_KEY = 'blog:related_posts:pending:{}'
+PENDING_TIMEOUT = 60
+
+TAG_WEIGHT = 2
+CATEGORY_WEIGHT = 1
+
+
+def cache_key(pk):
+    return RELATED_POSTS_CACHE_KEY.format(pk)
+
+
+def tag_posts_key(tag_id):
+    return TAG_POSTS_CACHE_KEY.format(tag_id)
+
+
+def category_posts_key(category_id):
+    return CATEGORY_POSTS_CACHE_KEY.format(category_id)
+
+
+def load_posts(pks=None):
+    """
+    从数据库读取文章的标题、分类、标签和创建时间，返回 {文章 id: 缓存项}，缓存项中还没有相关文章。
+    pks 为 None 时读取全部文章。只读取这几个字段，不会加载正文。
+    """
+    posts = Post.objects.order_by()
+    through = Post.tags.through.objects.all()
+    if pks is not None:
+        posts = posts.filter(pk__in=pks)
+        through = through.filter(post_id__in=pks)
+    tags = defaultdict(list)
+    for post_id, tag_id in through.values_list('post_id', 'tag_id'):
+        tags[post_id].append(tag_id)
+    return {
+        pk: {
+            'title': title, 'category': category_id, 'tags': sorted(tags[pk]),
+            'created': created_time.timestamp(), 'posts': None, 'more': False,
+        }
+        for pk, title, category_id, created_time in posts.values_list('pk', 'title', 'category_id', 'created_time')
+    }
+
+
+def load_tag_posts(tag_id):
+    return list(Post.objects.filter(tags=tag_id).order_by().values_list('pk', flat=True))
+
+
+def load_category_posts(category_id):
+    # 多取一篇，补足时要去掉文章自己
+    return [
+        list(row) for row in Post.objects.filter(category_id=category_id)
+        .order_by('-created_time', '-pk').values_list('pk', 'title')[:RELATED_POSTS_NUM + 1]
+    ]
+
+
+def score(entry, other):
+    common = len(set(entry['tags']).intersection(other['tags']))
+    if not common:
+        return 0
+    return common * TAG_WEIGHT + (CATEGORY_WEIGHT if entry['category'] == other['category'] else 0)
+
+
+def _sort_key(item):
+    # 分数相同时新文章优先
+    return item[2], item[3]
+
+
+def compute_related(pk, entry, tag_posts, entries):
+    """
+    计算一篇文章的相关文章，写入 entry。tag_posts 为 {标签 id: 文章 id 列表}，entries 为 {文章 id: 缓存项}，
+    需要包含和这篇文章有共同标签的全部文章。
+    """
+    # 每篇候选文章在这篇文章各个标签的倒排表中出现的次数就是共同标签数
+    common = Counter(chain.from_iterable(tag_posts.get(tag_id, ()) for tag_id in entry['tags']))
+    common.pop(pk, None)
+    category = entry['category']
+    scored = []
+    for other, count in common.items():
+        other_entry = entries.get(other)
+        if other_entry is not None:
+            points = count * TAG_WEIGHT + (CATEGORY_WEIGHT if other_entry['category'] == category else 0)
+            scored.append([other, other_entry['title'], points, other_entry['created']])
+    # 只需要前几篇，用堆取最大的几个而不对全部候选排序
+    entry['posts'] = heapq.nlargest(RELATED_POSTS_NUM, scored, key=_sort_key)
+    entry['more'] = len(scored) > RELATED_POSTS_NUM
+    return entry
+
+
+def _get_tag_posts(tag_ids):
+    # 缓存中没有的倒排表从数据库读取并写回缓存
+    keys = {tag_posts_key(tag_id): tag_id for tag_id in tag_ids}
+    tag_posts = {keys[key]: pks for key, pks in cache.get_many(keys).items()}
+    missing = {tag_id: load_tag_posts(tag_id) for tag_id in tag_ids if tag_id not in tag_posts}
+    if missing:
+        cache.set_many({tag_posts_key(tag_id): pks for tag_id, pks in missing.items()}, timeout=None)
+        tag_posts.update(missing)
+    return tag_posts
+
+
+def _get_entries(pks):
+    # 缓存中没有的文章从数据库读取，只用于打分，不写回缓存
+    keys = {cache_key(pk): pk for pk in pks}
+    entries = {keys[key]: entry for key, entry in cache.get_many(keys).items()}
+    missing = [pk for pk in pks if pk not in entries]
+    if missing:
+        entries.update(load_posts(missing))
+    return entries
+
+
+def _compute_entry(pk, entry):
+    tag_posts = _get_tag_posts(entry['tags'])
+    candidates = set().union(*tag_posts.values()) - {pk} if tag_posts else set()
+    return compute_related(pk, entry, tag_posts, _get_entries(candidates))
+
+
+def rebuild_related_posts():
+    """
+    重新计算全部文章的相关文章，返回文章数量。
+    """
+    entries = load_posts()
+    tag_posts = defaultdict(list)
+    category_posts = defaultdict(list)
+    for pk, entry in entries.items():
+        for tag_id in entry['tags']:
+            tag_posts[tag_id].append(pk)
+        category_posts[entry['category']].append(pk)
+    for pk, entry in entries.items():
+        compute_related(pk, entry, tag_posts, entries)
+
+    values = {cache_key(pk): entry for pk, entry in entries.items()}
+    values.update((tag_posts_key(tag_id), pks) for tag_id, pks in tag_posts.items())
+    for category_id, pks in category_posts.items():
+        latest = heapq.nlargest(RELATED_POSTS_NUM + 1, pks, key=lambda pk: (entries[pk]['created'], pk))
+        values[category_posts_key(category_id)] = [[pk, entries[pk]['title']] for pk in latest]
+    cache.set_many(values, timeout=None)
+    return len(entries)
+
+
+def build_related_posts_entry(pk):
+    """
+    后台任务：缓存中没有这篇文章的相关文章时只计算它自己，其它文章的列表在它们被修改时已经更新过。
+    """
+    entry = load_posts([pk]).get(pk)
+    if entry is None:
+        return
+    values = {cache_key(pk): _compute_entry(pk, entry)}
+    if cache.get(category_posts_key(entry['category'])) is None:
+        values[category_posts_key(entry['category'])] = load_category_posts(entry['category'])
+    cache.set_many(values, timeout=None)
+
+
+def refresh_related_posts(pk):
+    """
+    文章被新建、修改或删除后，更新倒排表，刷新它自己以及修改前后和它有共同标签的文章的相关文章。
+    """
+    old = cache.get(cache_key(pk))
+    new = load_posts([pk]).get(pk)
+    old_tags = set(old['tags']) if old is not None else set()
+    new_tags = set(new['tags']) if new is not None else set()
+
+    # 只重新读取增加或去掉的标签的倒排表；不知道修改前的状态时重新读取全部标签的
+    if old is not None and new is not None:
+        changed_tags = old_tags ^ new_tags
+    else:
+        changed_tags = old_tags | new_tags
+    values = {tag_posts_key(tag_id): load_tag_posts(tag_id) for tag_id in changed_tags}
+    categories = {entry['category'] for entry in (old, new) if entry is not None}
+    values.update((category_posts_key(category_id), load_category_posts(category_id)) for category_id in categories)
+    cache.set_many(values, timeout=None)
+
+    if new is not None:
+        values = {cache_key(pk): _compute_entry(pk, new)}
+    else:
+        values = {}
+        cache.delete(cache_key(pk))
+
+    # 修改前后和它有共同标签的文章，只有缓存中已经有相关文章的才需要更新
+    tag_posts = _get_tag_posts(old_tags | new_tags)
+    affected = set().union(*tag_posts.values()) - {pk} if tag_posts else set()
+    keys = {cache_key(other): other for other in affected}
+    for key, entry in cache.get_many(keys).items():
+        old_item = next((item for item in entry['posts'] if item[0] == pk), None)
+        points = score(entry, new) if new is not None else 0
+        # 这篇文章原本在列表中且分数下降时，列表之外的候选可能排到它前面，需要重新计算
+        if old_item is not None and entry['more'] and points < old_item[2]:
+            values[key] = _compute_entry(keys[key], entry)
+            continue
+        posts = [item for item in entry['posts'] if item[0] != pk]
+        if points:
+            posts.append([pk, new['title'], points, new['created']])
+        posts.sort(key=_sort_key, reverse=True)
+        more = entry['more'] or len(posts) > RELATED_POSTS_NUM
+        posts = posts[:RELATED_POSTS_NUM]
+        if posts != entry['posts'] or more != entry['more']:
+            entry['posts'] = posts
+            entry['more'] = more
+            values[key] = entry
+    if values:
+        cache.set_many(values, timeout=None)
+
+
+def get_related_posts(pk, category_id):
+    """
+    返回文章的相关文章 [[文章 id, 标题], ...]，文章自己的相关文章和它所在分类的最新文章一起用一次 get_many 读取。
+    缓存中还没有时（例如刚部署）返回空列表，并加入后台任务计算这篇文章的相关文章；加入任务需要查询和写入数据库，
+    先在缓存中放一个短期的标记，任务执行之前的其它请求不会重复加入。
+    """
+    values = cache.get_many([cache_key(pk), category_posts_key(category_id)])
+    entry = values.get(cache_key(pk))
+    if entry is None:
+        if cache.add(PENDING_CACHE_KEY.format(pk), True, timeout=PENDING_TIMEOUT):
+            enqueue(build_related_posts_entry, pk)
+        return []
+    related = [item[:2] for item in entry['posts']]
+    if len(related) < RELATED_POSTS_NUM:
+        # 有共同标签的文章不足时，用同一分类下最新的文章补足
+        latest = values.get(category_posts_key(category_id), [])
+        seen = {pk} | {item[0] for item in related}
+        related += [item for item in latest if item[0] not in seen][:RELATED_POSTS_NUM - len(related)]
+    return related
@@ -0,0 +1,178 @@
+# 有时间和大小限制的 Markdown 渲染。
+#
+# 文章正文由作者随意编写，某些写法会让 Markdown 解析非常慢：几千个标题（生成目录时的锚点去重是平方复杂度）、
+# 几万行的代码块（codehilite 逐行高亮），甚至两万个连续的“[”就要解析一分多钟。渲染卡住的进程在这段时间里不能处理其它请求或任务。
+#
+# 因此渲染分两道防线：
+# - 渲染前先检查正文的长度、标题数、表格行数、代码块行数，超出限制的直接放弃渲染；
+# - settings.MARKDOWN_RENDER_TIMEOUT 不为 None 时，在单独的渲染进程中执行，超时后结束这个进程，
+#   调用方不会被拖住。渲染进程在第一次使用时启动，之后一直复用。
+# 放弃渲染或者超时时返回转义后的纯文本（保留段落和换行），页面仍然可以正常显示。
+#
+# 每次渲染都会计入数据库中的统计数据（RenderStat，用 UPDATE 累加，多个进程同时记录也不会丢失），
+# 慢的渲染、超时和被拒绝的正文还会各记录一行（RenderRecord，只保留最近的几条），用 python manage.py render_stats 查看。
+#
+# 本模块不在顶层导入任何模型，渲染进程使用 spawn 方式启动，只需要导入 markdown 相关的代码。
+# markdown 在第一次渲染时才导入：启动进程时不需要渲染，导入它会让每个进程的启动多花十几毫秒，
+# 在使用渲染进程时主进程甚至完全用不到它。
+import logging
+import multiprocessing
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.utils.html import linebreaks
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+# 正文的限制，超出任何一项都不渲染
+MAX_LENGTH = 200000
+MAX_HEADINGS = 500
+MAX_TABLE_ROWS = 2000
+MAX_CODE_LINES = 5000
+# 超过这个时间（秒）的渲染记为慢渲染
+SLOW_RENDER = 0.5
+
+RENDER_STATS = ('total', 'slow', 'timeout', 'rejected', 'failed')
+# 最近的慢渲染、超时和被拒绝的记录保留的条数
+RECENT_RENDERS = 20
+
+HEADING_RE = re.compile(r'^(#{1,6}\s|[=-]{2,}\s*$)', re.M)
+TABLE_ROW_RE = re.compile(r'^\s*\|', re.M)
+FENCE_RE = re.compile(r'^\s*(```|~~~)', re.M)
+
+
+def markdown_to_html(value):
+    """
+    直接渲染 Markdown，返回 {'content': 正文 HTML, 'toc': 目录 HTML}，没有任何限制。
+    """
+    # 第一次调用之后模块已经在 sys.modules 中，再次导入只是一次字典查找
+    import markdown
+    from markdown.extensions.toc import TocExtension
+
+    md = markdown.Markdown(
+        extensions=[
+            "markdown.extensions.extra",
+            "markdown.extensions.codehilite",
+            TocExtension(slugify=slugify),
+        ]
+    )
+    content = md.convert(value)
+    m = re.search(r'<div class="toc">\s*<ul>(.*)</ul>\s*</div>', md.toc, re.S)
+    toc = m.group(1) if m is not None else ""
+    return {"content": content, "toc": toc}
+
+
+def plain_content(value):
+    """
+    不能渲染时使用的内容：转义 HTML，空行分段，换行保留。
+    """
+    return {'content': linebreaks(value, autoescape=True), 'toc': ''}
+
+
+def check_limits(value):
+    """
+    正文超出限制时返回原因，否则返回 None。
+    """
+    if len(value) > MAX_LENGTH:
+        return '正文超过 {} 个字符'.format(MAX_LENGTH)
+    if len(HEADING_RE.findall(value)) > MAX_HEADINGS:
+        return '标题超过 {} 个'.format(MAX_HEADINGS)
+    if len(TABLE_ROW_RE.findall(value)) > MAX_TABLE_ROWS:
+        return '表格超过 {} 行'.format(MAX_TABLE_ROWS)
+    # 代码块按围栏计算，只统计围栏之间的行数
+    fences = [m.start() for m in FENCE_RE.finditer(value)]
+    for start, end in zip(fences[::2], fences[1::2]):
+        if value.count('\n', start, end) > MAX_CODE_LINES:
+            return '代码块超过 {} 行'.format(MAX_CODE_LINES)
+    return None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 用 spawn 启动全新的进程，不继承当前进程的数据库连接和线程
+            context = multiprocessing.get_context('spawn')
+            _pool = context.Pool(processes=getattr(settings, 'MARKDOWN_RENDER_PROCESSES', 1))
+        return _pool
+
+
+def shutdown_pool():
+    """
+    结束渲染进程，下一次渲染时重新启动。超时后用它结束卡住的进程。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool = None
+
+
+def _record(stat, seconds, length, name, reason=''):
+    # stat 为 None 表示一次正常的渲染
+    from .models import RenderRecord, RenderStat
+
+    for key in ('total', stat):
+        if key is not None:
+            RenderStat.incr(key)
+    if stat is None:
+        return
+    logger.warning('Markdown render %s: %s %.3fs %d chars %s', stat, name, seconds, length, reason)
+    record = RenderRecord.objects.create(
+        stat=stat, name=name[:100], seconds=round(seconds, 3), length=length, reason=reason[:200],
+    )
+    # 每一行都是单独插入的，并发记录不会互相覆盖；删除比最近 RECENT_RENDERS 条更早的记录
+    RenderRecord.objects.filter(pk__lte=record.pk - RECENT_RENDERS).delete()
+
+
+def get_render_stats():
+    from .models import RenderRecord, RenderStat
+
+    stats = dict.fromkeys(RENDER_STATS, 0)
+    stats.update(RenderStat.objects.filter(name__in=RENDER_STATS).values_list('name', 'count'))
+    stats['recent'] = [
+        {
+            'time': record.created_time, 'stat': record.stat, 'name': record.name,
+            'seconds': record.seconds, 'length': record.length, 'reason': record.reason,
+        }
+        for record in RenderRecord.objects.all()[:RECENT_RENDERS]
+    ]
+    return stats
+
+
+def render_markdown(value, name=''):
+    """
+    在限制内渲染 Markdown，返回 {'content', 'toc'}。超出限制、超时或者渲染出错时返回 plain_content(value)。
+    name 用于记录统计数据，例如 'post:12'。
+    """
+    reason = check_limits(value)
+    if reason is not None:
+        _record('rejected', 0, len(value), name, reason)
+        return plain_content(value)
+
+    timeout = getattr(settings, 'MARKDOWN_RENDER_TIMEOUT', None)
+    start = time.perf_counter()
+    try:
+        if timeout is None:
+            result = markdown_to_html(value)
+        else:
+            result = _get_pool().apply_async(markdown_to_html, (value,)).get(timeout)
+    except multiprocessing.TimeoutError:
+        # 渲染进程还在处理这篇正文，只能结束它
+        shutdown_pool()
+        _record('timeout', time.perf_counter() - start, len(value), name, '超过 {} 秒'.format(timeout))
+        return plain_content(value)
+    except Exception as e:
+        _record('failed', time.perf_counter() - start, len(value), name, repr(e))
+        return plain_content(value)
+
+    seconds = time.perf_counter() - start
+    _record('slow' if seconds > SLOW_RENDER else None, seconds, len(value), name)
+    return result
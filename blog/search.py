@@ -0,0 +1,123 @@
+# 站内搜索。
+#
+# 搜索结果中为每篇文章显示命中关键词附近的摘要，并高亮关键词，让读者知道这篇文章为什么被搜索出来。
+# 摘要从 Post.plain_text（渲染后的正文去掉 HTML 标签得到的纯文本，由后台任务和 Markdown 渲染一起保存）中截取，
+# 不需要在搜索时再解析 Markdown；只为当前页的文章生成摘要，并且每篇文章的处理时间有上限，
+# 很长的文章或者出现次数很多的关键词也不会拖慢搜索页面。
+import re
+import time
+
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+# 最多使用的关键词个数
+MAX_TERMS = 5
+# 每篇文章的摘要由最多 MAX_FRAGMENTS 个片段组成，每个片段在命中位置前后各取 FRAGMENT_CONTEXT 个字符
+MAX_FRAGMENTS = 3
+FRAGMENT_CONTEXT = 40
+# 只在正文的前 SCAN_LIMIT 个字符中查找命中位置，每个关键词最多记录 MAX_POSITIONS 个位置
+SCAN_LIMIT = 100000
+MAX_POSITIONS = 50
+# 每篇文章生成摘要的时间上限（秒），超时后使用已经找到的位置
+SNIPPET_TIME_LIMIT = 0.005
+
+def parse_terms(q):
+    # 按空白切分关键词，去掉重复的，较长的关键词优先，避免短词的高亮切断长词
+    terms = list(dict.fromkeys(term for term in q.split() if term))[:MAX_TERMS]
+    return sorted(terms, key=len, reverse=True)
+
+
+def search_posts(terms):
+    """
+    标题或正文包含全部关键词的文章。还没有生成纯文本的文章（渲染任务还在队列中）使用 Markdown 原文匹配。
+    """
+    queryset = Post.objects.all()
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(plain_text__icontains=term) | Q(plain_text='', body__icontains=term)
+        )
+    return queryset
+
+
+def find_positions(text, terms, deadline=None):
+    """
+    返回关键词在 text 中出现的位置 [(start, end), ...]，按 start 排序，重叠的位置只保留先出现的。
+    """
+    # 直接在原文上做忽略大小写的匹配，找到的位置就是原文中的位置。不能先 lower() 或 casefold() 再查找：
+    # 有些字符转换后长度会变（'İ'.lower() 是两个字符，ß casefold 后是 ss），之后的位置都会错开
+    text = text[:SCAN_LIMIT]
+    positions = []
+    for term in terms:
+        if not term:
+            continue
+        for count, match in enumerate(re.finditer(re.escape(term), text, re.I)):
+            if count >= MAX_POSITIONS:
+                break
+            positions.append(match.span())
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+    positions.sort()
+    merged = []
+    for start, end in positions:
+        if merged and start < merged[-1][1]:
+            continue
+        merged.append((start, end))
+    return merged
+
+
+def highlight(text, positions):
+    """
+    转义 text，并用 <mark> 包裹 positions 中的位置。positions 必须按顺序排列且互不重叠。
+    """
+    parts = []
+    last = 0
+    for start, end in positions:
+        parts.append(escape(text[last:start]))
+        parts.append('<mark>{}</mark>'.format(escape(text[start:end])))
+        last = end
+    parts.append(escape(text[last:]))
+    return mark_safe(''.join(parts))
+
+
+def make_snippet(text, terms, time_limit=SNIPPET_TIME_LIMIT):
+    """
+    从 text 中截取包含关键词的片段并高亮，片段之间用省略号连接。没有命中时返回开头的一段文字。
+    """
+    deadline = time.perf_counter() + time_limit
+    positions = find_positions(text, terms, deadline)
+    if not positions:
+        snippet = escape(text[:FRAGMENT_CONTEXT * 2])
+        return mark_safe(snippet + ('…' if len(text) > FRAGMENT_CONTEXT * 2 else ''))
+
+    # 把相邻的命中位置合并到同一个片段中
+    windows = []
+    for start, end in positions:
+        left, right = max(start - FRAGMENT_CONTEXT, 0), min(end + FRAGMENT_CONTEXT, len(text))
+        if windows and left <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], right)
+            windows[-1][2].append((start, end))
+        elif len(windows) < MAX_FRAGMENTS:
+            windows.append([left, right, [(start, end)]])
+        else:
+            break
+
+    fragments = []
+    for left, right, hits in windows:
+        fragment = highlight(text[left:right], [(start - left, end - left) for start, end in hits])
+        fragments.append('{}{}{}'.format('…' if left > 0 else '', fragment, '…' if right < len(text) else ''))
+    return mark_safe(' '.join(fragments))
+
+
+def annotate_results(posts, terms):
+    """
+    为一页搜索结果中的每篇文章生成高亮的标题 title_html 和摘要 snippet。
+    """
+    for post in posts:
+        post.title_html = highlight(post.title, find_positions(post.title, terms))
+        post.snippet = make_snippet(post.plain_text or post.body, terms)
+    return posts
@@ -0,0 +1,62 @@
+# 侧边栏数据的缓存。侧边栏出现在每一个页面上，最新文章、归档、分类和标签云每次都要查询数据库并做聚合，
+# 而这些数据只有在发布、修改文章或者修改分类、标签时才会变化，因此缓存起来，数据变化时由 blog/signals.py 清除。
+from django.core.cache import cache
+
+from .models import Category, Post, Tag
+
+SIDEBAR_CACHE_KEY = 'blog:sidebar:{}'
+SIDEBAR_CACHE_NAMES = ('recent', 'archives', 'categories', 'tags')
+
+# 缓存的最新文章数量，侧边栏显示的数量不超过它时直接从缓存中截取
+RECENT_POSTS_CACHED = 10
+
+
+def _cached(name, func):
+    key = SIDEBAR_CACHE_KEY.format(name)
+    value = cache.get(key)
+    if value is None:
+        value = func()
+        cache.set(key, value, timeout=None)
+    return value
+
+
+def get_recent_posts(num=5):
+    # 侧边栏只显示标题和链接，不需要加载正文
+    queryset = Post.objects.only('id', 'title').order_by('-created_time')
+    if num > RECENT_POSTS_CACHED:
+        return list(queryset[:num])
+    return _cached('recent', lambda: list(queryset[:RECENT_POSTS_CACHED]))[:num]
+
+
+def get_archives():
+    return _cached('archives', lambda: list(
+        Post.objects.dates('created_time', 'month', order='DESC')
+    ))
+
+
+def get_categories():
+    return _cached('categories', lambda: list(
+        # 文章数由 blog/counters.py 维护，不需要连接文章表做聚合
+        Category.objects.filter(num_posts__gt=0)
+    ))
+
+
+def get_tags():
+    return _cached('tags', lambda: list(
+        Tag.objects.filter(num_posts__gt=0)
+    ))
+
+
+def warm_sidebar():
+    """
+    预先计算侧边栏的全部数据，部署后第一个访问者不需要等待聚合查询。
+    """
+    invalidate_sidebar()
+    get_recent_posts()
+    get_archives()
+    get_categories()
+    get_tags()
+
+
+def invalidate_sidebar():
+    cache.delete_many([SIDEBAR_CACHE_KEY.format(name) for name in SIDEBAR_CACHE_NAMES])
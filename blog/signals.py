@@ -0,0 +1,154 @@
+# 文章相关的信号处理，在 BlogConfig.ready 中导入后生效。
+# 保存文章后需要更新的派生数据都放到后台任务队列中执行（见 blog/tasks.py），保存文章的请求不需要等待。
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from comments.models import Comment
+from . import images, suggest
+from .counters import update_author_stats, update_category_counts, update_post_counts, update_tag_counts
+from .feeds import get_feed_state, invalidate_feed
+from .http_cache import (
+    ALL_KEY, API_KEY, API_VERSION_KEY, AUTHORS_KEY, FEED_KEY, SIDEBAR_KEY, SITEMAP_KEY, author_key, bump_version,
+    category_key, comments_version_key, post_key, purge, tag_key,
+)
+from .models import Category, Post, PostImage, Tag, render_post_content
+from .related import rebuild_related_posts, refresh_related_posts
+from .sidebar import invalidate_sidebar, warm_sidebar
+from .sitemaps import invalidate_post_sitemap, invalidate_sitemaps
+from .tasks import enqueue
+
+
+def refresh_listings():
+    # 清除缓存很快，同步执行，保证保存之后的下一个请求就能看到新的侧边栏和 RSS；
+    # 重新计算交给后台任务，之后的访问者直接命中缓存
+    invalidate_sidebar()
+    invalidate_feed()
+    enqueue(warm_sidebar)
+    enqueue(get_feed_state)
+
+
+def posts_changed_in_bulk():
+    # 批量修改文章（QuerySet.update 等，不会发送信号）之后调用，不管修改了多少篇文章都只清除一次缓存，
+    # 相关文章也只加入一个全量重建的任务，而不是每篇文章一个；分类、标签的文章数用两条 UPDATE 全部重新统计
+    update_category_counts()
+    update_tag_counts()
+    update_author_stats()
+    refresh_listings()
+    invalidate_sitemaps()
+    suggest.invalidate_index()
+    enqueue(rebuild_related_posts)
+    bump_version(API_VERSION_KEY)
+    purge(ALL_KEY)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    # 只修改阅读量不影响相关文章、侧边栏和 RSS
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and set(update_fields) <= {'views'}:
+        return
+    # 正文被修改时 Post.save 会清空渲染结果，由后台任务重新渲染
+    if kwargs['signal'] is post_save and getattr(instance, '_render_pending', False):
+        enqueue(render_post_content, instance.pk)
+    bump_version(API_VERSION_KEY)
+    # 先更新文章数，之后重建的侧边栏才能读到新的值
+    if kwargs['signal'] is post_save:
+        old = getattr(instance, '_stored_values', None)
+        update_post_counts(instance, kwargs['created'], old)
+        # 搜索提示只包含已发布文章的标题
+        if old is None or old['title'] != instance.title or old['status'] != instance.status:
+            suggest.post_changed(instance)
+        # 只修改正文时只需要清除这篇文章所在的页面，标题、状态、分类变化会改变侧边栏，也就是所有页面
+        keys = [post_key(instance.pk), FEED_KEY, API_KEY, author_key(instance.author_id)]
+        if old is None or any(old[f] != getattr(instance, f) for f in ('title', 'status', 'category_id')):
+            keys += [SIDEBAR_KEY, SITEMAP_KEY, category_key(instance.category_id)]
+            if old is not None:
+                keys.append(category_key(old['category_id']))
+        # 作者列表显示每个作者的文章数和最新文章时间
+        if old is None or any(old[f] != getattr(instance, f) for f in ('status', 'author_id', 'created_time')):
+            keys.append(AUTHORS_KEY)
+            if old is not None:
+                keys.append(author_key(old['author_id']))
+        purge(*keys)
+    else:
+        update_category_counts([instance.category_id])
+        update_tag_counts(getattr(instance, '_tag_ids', []))
+        update_author_stats([instance.author_id], create=False)
+        suggest.post_changed(instance, deleted=True)
+        purge(
+            post_key(instance.pk), SIDEBAR_KEY, SITEMAP_KEY, FEED_KEY, API_KEY, AUTHORS_KEY,
+            author_key(instance.author_id),
+        )
+    refresh_listings()
+    # 站点地图只重新生成这篇文章所在的块
+    invalidate_post_sitemap(instance.pk)
+    enqueue(refresh_related_posts, instance.pk)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # 删除文章时中间表的行会先于文章被删除，post_delete 中已经查不到文章的标签
+    instance._tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def taxonomy_changed(sender, instance, **kwargs):
+    # 在后台编辑分类、标签时会把读取时的文章数原样写回，重新统计一次，避免覆盖期间发生的变化
+    if kwargs['signal'] is post_save and not kwargs['created']:
+        update = update_category_counts if sender is Category else update_tag_counts
+        update([instance.pk])
+    suggest.taxonomy_changed(instance, deleted=kwargs['signal'] is post_delete)
+    key = category_key(instance.pk) if sender is Category else tag_key(instance.pk)
+    bump_version(API_VERSION_KEY)
+    purge(key, SIDEBAR_KEY, FEED_KEY, API_KEY)
+    # 分类、标签改名或删除会改变侧边栏以及 RSS 条目标题中的分类名
+    refresh_listings()
+    invalidate_sitemaps()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        # post_clear 时 pk_set 为 None，先记下被清除的标签
+        instance._cleared_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        update_tag_counts([instance.pk])
+    elif action == 'post_clear':
+        update_tag_counts(getattr(instance, '_cleared_tag_ids', []))
+    else:
+        update_tag_counts(pk_set)
+    refresh_listings()
+    invalidate_sitemaps()
+    # 标签云的文章数变化，所有页面都需要清除
+    bump_version(API_VERSION_KEY)
+    purge(SIDEBAR_KEY, API_KEY)
+    if not reverse:
+        enqueue(refresh_related_posts, instance.pk)
+    else:
+        # 从标签一侧修改关联（tag.post_set.add(...)）时 instance 是标签，pk_set 是文章
+        for pk in pk_set or ():
+            enqueue(refresh_related_posts, pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    # 评论接口的 ETag 由每篇文章的评论版本号生成；批量修改评论的地方（见 comments/admin.py）自己更新版本号
+    bump_version(comments_version_key(instance.post_id))
+
+
+@receiver(post_save, sender=PostImage)
+def post_image_saved(sender, instance, **kwargs):
+    # 缩略图和缩小版本由后台任务生成
+    enqueue(images.generate_image_variants, instance.pk)
+
+
+@receiver(post_delete, sender=PostImage)
+def post_image_deleted(sender, instance, **kwargs):
+    images.delete_image_files(instance)
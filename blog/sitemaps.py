@@ -0,0 +1,159 @@
+# 站点地图，让搜索引擎直接找到全部文章，而不需要一页一页地翻首页的分页。
+#
+#   /sitemap.xml               站点地图索引，列出下面的各个站点地图
+#   /sitemap-pages.xml         首页以及全部分类、标签、归档页
+#   /sitemap-posts-<n>.xml     文章，按 id 分块，第 n 块包含 id 在 (n * SITEMAP_CHUNK_SIZE, (n + 1) * SITEMAP_CHUNK_SIZE] 的文章
+#
+# 生成时只查询 id 和 modified_time 等必要的列，用 iterator() 逐行读取并边生成边发送，不会把全部文章加载到内存中。
+# 生成的内容放入缓存，文章被修改时只让它所在的那一块以及索引失效（见 blog/signals.py），其它块继续使用缓存。
+import uuid
+from collections import defaultdict
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+from django.db.models import Max, Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .http_cache import SITEMAP, cache_policy
+from .models import Category, Post, Tag
+
+# 每个站点地图最多包含 50000 个网址，这里每块取得小一些，单块重新生成的代价也更小
+SITEMAP_CHUNK_SIZE = 5000
+
+SITEMAP_CACHE_KEY = 'blog:sitemap:{}:{}:{}:{}'
+SITEMAP_VERSION_KEY = 'blog:sitemap-version:{}'
+CONTENT_TYPE = 'application/xml; charset=utf-8'
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def chunk_of(pk):
+    return (pk - 1) // SITEMAP_CHUNK_SIZE
+
+
+def _version(name):
+    # 每个站点地图有一个版本号，失效时换一个新的版本号，不需要知道缓存中有哪些域名对应的旧内容
+    return cache.get_or_set(SITEMAP_VERSION_KEY.format(name), lambda: uuid.uuid4().hex, timeout=None)
+
+
+def _bump(*names):
+    cache.set_many({SITEMAP_VERSION_KEY.format(name): uuid.uuid4().hex for name in names}, timeout=None)
+
+
+def invalidate_post_sitemap(pk):
+    """
+    文章被新建、修改或删除后调用，只让它所在的块、分类标签归档页以及索引失效。
+    """
+    _bump('posts-{}'.format(chunk_of(pk)), 'pages', 'index')
+
+
+def invalidate_sitemaps():
+    """
+    批量修改文章、修改分类标签后调用，全部站点地图失效。
+    """
+    _bump('all')
+
+
+def _url(loc, lastmod=None):
+    if lastmod is None:
+        return '<url><loc>{}</loc></url>\n'.format(escape(loc))
+    return '<url><loc>{}</loc><lastmod>{}</lastmod></url>\n'.format(escape(loc), lastmod.isoformat())
+
+
+def _month_key(created_time):
+    created_time = timezone.localtime(created_time)
+    return created_time.year, created_time.month
+
+
+def generate_index(base):
+    chunks = {}
+    for pk, modified_time in Post.objects.order_by().values_list('pk', 'modified_time').iterator():
+        chunk = chunk_of(pk)
+        if chunk not in chunks or modified_time > chunks[chunk]:
+            chunks[chunk] = modified_time
+
+    yield XML_HEADER + '<sitemapindex xmlns="{}">\n'.format(XMLNS)
+    yield '<sitemap><loc>{}</loc></sitemap>\n'.format(escape(base + reverse('sitemap_pages')))
+    for chunk in sorted(chunks):
+        loc = base + reverse('sitemap_posts', kwargs={'chunk': chunk})
+        yield '<sitemap><loc>{}</loc><lastmod>{}</lastmod></sitemap>\n'.format(escape(loc), chunks[chunk].isoformat())
+    yield '</sitemapindex>\n'
+
+
+def generate_pages(base):
+    yield XML_HEADER + '<urlset xmlns="{}">\n'.format(XMLNS)
+    yield _url(base + reverse('blog:index'), Post.objects.aggregate(lastmod=Max('modified_time'))['lastmod'])
+
+    # 分类、标签页的最后修改时间取其中文章最新的修改时间，没有文章的分类、标签不会出现在站点地图中
+    for model, name in ((Category, 'blog:category'), (Tag, 'blog:tag')):
+        rows = model.objects.annotate(lastmod=Max('post__modified_time', filter=Q(post__status=Post.PUBLISHED))).filter(lastmod__isnull=False)
+        for pk, lastmod in rows.order_by('pk').values_list('pk', 'lastmod').iterator():
+            yield _url(base + reverse(name, kwargs={'pk': pk}), lastmod)
+
+    months = defaultdict(lambda: None)
+    for created_time, modified_time in Post.objects.order_by().values_list('created_time', 'modified_time').iterator():
+        month = _month_key(created_time)
+        if months[month] is None or modified_time > months[month]:
+            months[month] = modified_time
+    for (year, month), lastmod in sorted(months.items(), reverse=True):
+        yield _url(base + reverse('blog:archive', kwargs={'year': year, 'month': month}), lastmod)
+    yield '</urlset>\n'
+
+
+def generate_posts(base, chunk):
+    start = chunk * SITEMAP_CHUNK_SIZE
+    posts = (
+        Post.objects
+        .filter(pk__gt=start, pk__lte=start + SITEMAP_CHUNK_SIZE)
+        .order_by('pk')
+        .values_list('pk', 'modified_time')
+    )
+    yield XML_HEADER + '<urlset xmlns="{}">\n'.format(XMLNS)
+    for pk, modified_time in posts.iterator():
+        yield _url(base + reverse('blog:detail', kwargs={'pk': pk}), modified_time)
+    yield '</urlset>\n'
+
+
+def _cached_response(request, name, generate, *args):
+    """
+    缓存命中时直接返回缓存的内容；否则边生成边发送，全部发送完成后再写入缓存。
+    """
+    base = '{}://{}'.format(request.scheme, request.get_host())
+    key = SITEMAP_CACHE_KEY.format(name, _version('all'), _version(name), base)
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content, content_type=CONTENT_TYPE)
+
+    def stream():
+        parts = []
+        for part in generate(base, *args):
+            parts.append(part)
+            yield part
+        cache.set(key, ''.join(parts), timeout=None)
+
+    return StreamingHttpResponse(stream(), content_type=CONTENT_TYPE)
+
+
+@require_GET
+@cache_policy(SITEMAP)
+def index(request):
+    return _cached_response(request, 'index', generate_index)
+
+
+@require_GET
+@cache_policy(SITEMAP)
+def pages(request):
+    return _cached_response(request, 'pages', generate_pages)
+
+
+@require_GET
+@cache_policy(SITEMAP)
+def posts(request, chunk):
+    start = chunk * SITEMAP_CHUNK_SIZE
+    if not Post.objects.filter(pk__gt=start, pk__lte=start + SITEMAP_CHUNK_SIZE).exists():
+        raise Http404('站点地图不存在')
+    return _cached_response(request, 'posts-{}'.format(chunk), generate_posts, chunk)
@@ -29,6 +29,29 @@ $("#search-menu").click(function(e){
     }
 });
 
+// 搜索框输入提示，停止输入 150 毫秒后请求一次，结果填入 datalist
+var suggestTimer = null;
+
+$("#searchform input[name=q]").on("input", function(){
+    var input = $(this);
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(function(){
+        var q = $.trim(input.val());
+        var list = $("#search-suggestions").empty();
+        if (!q) {
+            return;
+        }
+        $.getJSON(input.data("suggest-url"), {q: q}, function(data){
+            if (data.q !== q) {
+                return;
+            }
+            $.each(data.results, function(i, item){
+                list.append($("<option>").attr("value", item.title));
+            });
+        });
+    }, 150);
+});
+
 /*!
  * classie - class helper functions
  * from bonzo https://github.com/ded/bonzo
@@ -149,4 +172,22 @@ if ( typeof define === 'function' && define.amd ) {
 
     triggerBttn.addEventListener( 'click', toggleOverlay );
     closeBttn.addEventListener( 'click', toggleOverlay );
-})();
\ No newline at end of file
+})();
+
+// 文章详情页会被共享缓存保存，评论表单中的 CSRF token 每个访问者各不相同，从不缓存的地址单独加载
+$('.comment-form-placeholder').each(function () {
+    var placeholder = $(this);
+    $.get(placeholder.data('url')).done(function (html) {
+        placeholder.replaceWith(html);
+    });
+});
+
+// 阅读量由页面加载后发送的请求统计，详情页由共享缓存返回时也会计入，见 blog/views.py 的 record_view
+$('[data-view-url]').each(function () {
+    var url = $(this).data('view-url');
+    if (navigator.sendBeacon) {
+        navigator.sendBeacon(url);
+    } else {
+        $.post(url);
+    }
+});
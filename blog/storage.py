@@ -0,0 +1,119 @@
+# 静态文件流水线：在 collectstatic 时合并、压缩博客的 CSS 和 JS，生成带内容哈希的文件名，
+# 并为每个文件预先生成 gzip 和 brotli 压缩版本。
+#
+# 文件名包含内容哈希后，内容变化文件名就会变化，nginx 可以放心地让浏览器长期缓存，例如：
+#   location /static/ {
+#       expires max;
+#       gzip_static on;
+#       brotli_static on;
+#   }
+#
+# 生成 .br 文件需要 brotli，压缩 JS 需要 rjsmin（见 Pipfile），没有安装时 collectstatic 直接失败，
+# 不会悄悄地跳过 brotli 压缩或者只合并不压缩。
+import gzip
+import os
+import re
+
+import brotli
+import rjsmin
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+# 只有文本文件压缩后才会明显变小
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.xml', '.json')
+
+
+# 注释和引号中的字符串，字符串（例如 content: "a , b"、url("x; y")）原样保留
+CSS_TOKEN_RE = re.compile(r'''(?P<comment>/\*.*?\*/)|(?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', re.S)
+
+
+def _minify_css_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([{};,])\s*', r'\1', code)
+    return code.replace(';}', '}')
+
+
+def minify_css(css):
+    """
+    去掉注释和多余的空白。这里只处理不会改变语义的部分，例如选择器中的空格可能代表后代选择器，需要保留；
+    字符串中的内容不做任何修改。
+    """
+    parts = []
+    code = ''
+    pos = 0
+    for match in CSS_TOKEN_RE.finditer(css):
+        code += css[pos:match.start()]
+        pos = match.end()
+        if match.lastgroup == 'string':
+            parts += [_minify_css_code(code), match.group()]
+            code = ''
+    parts.append(_minify_css_code(code + css[pos:]))
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    # JavaScript 无法用正则表达式安全地压缩，使用 rjsmin
+    return rjsmin.jsmin(js)
+
+
+class BundledManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    先按 settings.STATIC_BUNDLES 生成合并后的文件，再交给 ManifestStaticFilesStorage 计算哈希文件名，
+    最后为所有带哈希的文件生成 .gz 和 .br 文件。
+    """
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def safe_converter(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError:
+                # 第三方 CSS 引用了仓库中不存在的文件（例如 bootstrap.min.css 引用的字体），保留原来的引用
+                return matchobj.group(0)
+        return safe_converter
+
+    def build_bundle(self, name, sources, paths):
+        contents = []
+        for source in sources:
+            storage, path = paths[source]
+            with storage.open(path) as f:
+                contents.append(f.read().decode('utf-8'))
+        if name.endswith('.css'):
+            return minify_css('\n'.join(contents))
+        # 每个脚本末尾补上分号，避免合并后前一个文件的最后一条语句和后一个文件连在一起
+        return minify_js(';\n'.join(contents))
+
+    def compress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        variants = [
+            ('.gz', gzip.compress(content, compresslevel=9, mtime=0)),
+            ('.br', brotli.compress(content)),
+        ]
+        for suffix, compressed in variants:
+            # 压缩后没有变小的文件不值得让 nginx 发送压缩版本
+            if len(compressed) >= len(content):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+
+        paths = dict(paths)
+        for name, sources in getattr(settings, 'STATIC_BUNDLES', {}).items():
+            content = self.build_bundle(name, sources, paths)
+            if self.exists(name):
+                self.delete(name)
+            self._save(name, ContentFile(content.encode('utf-8')))
+            paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for name in set(self.hashed_files.values()):
+            if os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS:
+                self.compress(name)
@@ -0,0 +1,208 @@
+# 搜索框的输入提示（type-ahead）。
+#
+# 用户每输入一个字都会请求一次，如果每次都用 icontains 扫描文章表，数据库很快就会成为瓶颈。
+# 这里在每个进程的内存中维护一个按前缀查找的索引：把文章标题、分类名和标签名的每个“词的开头”作为键，
+# 放在一个有序的列表中，查找时用 bisect 二分定位到第一个以输入内容开头的键，再顺序读出后面的几个，
+# 不需要访问数据库，一次查找只需要几微秒。
+#
+# 中文没有空格分词，标题中每个汉字的位置都当作一个词的开头，例如“博客教程”可以用“博客”或者“教程”找到；
+# 英文等按单词切分，输入不区分大小写和全角半角。
+#
+# 本进程中文章、分类、标签被修改时由 blog/signals.py 调用 post_changed 等函数增量更新索引；同时更新缓存中的版本号，
+# 其它进程在 SUGGEST_CHECK_INTERVAL 秒内发现版本号变化后重新从数据库构建自己的索引。
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from .models import Category, Post, Tag
+
+SUGGEST_VERSION_KEY = 'blog:suggest-version'
+# 检查其它进程是否修改过数据的间隔（秒），两次检查之间只读内存
+SUGGEST_CHECK_INTERVAL = 5
+# 输入提示最多返回的条数
+SUGGEST_LIMIT = 10
+
+POST, CATEGORY, TAG = 'post', 'category', 'tag'
+# 同样匹配时文章排在分类、标签前面
+KIND_ORDER = {POST: 0, CATEGORY: 1, TAG: 2}
+
+# 连续的中日韩字符，其中每个字符的位置都是一个词的开头
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text).casefold().strip()
+
+
+def prefix_keys(text):
+    """
+    返回 text 中每个词开头的后缀，例如 'Django 博客教程' 得到 'django 博客教程'、'博客教程'、'客教程'、'教程'、'程'。
+    """
+    text = normalize(text)
+    starts = set()
+    for match in WORD_RE.finditer(text):
+        starts.add(match.start())
+    for match in CJK_RE.finditer(text):
+        starts.update(range(match.start(), match.end()))
+    return {text[start:] for start in starts}
+
+
+class PrefixIndex:
+    """
+    有序数组实现的前缀索引。_keys 是按 (键, 类型, id) 排序的列表，_entries 保存每个条目的显示文字、链接和全部键。
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, kind, pk, text, url):
+        self.remove(kind, pk)
+        keys = prefix_keys(text)
+        self._entries[kind, pk] = (text, url, keys)
+        for key in keys:
+            insort(self._keys, (key, kind, pk))
+
+    def remove(self, kind, pk):
+        entry = self._entries.pop((kind, pk), None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            i = bisect_left(self._keys, (key, kind, pk))
+            if i < len(self._keys) and self._keys[i] == (key, kind, pk):
+                del self._keys[i]
+
+    def bulk_load(self, items):
+        """
+        一次性加载 [(kind, pk, text, url), ...]，比逐个 add 少了每次插入的移动。
+        """
+        keys = []
+        for kind, pk, text, url in items:
+            entry_keys = prefix_keys(text)
+            self._entries[kind, pk] = (text, url, entry_keys)
+            keys.extend((key, kind, pk) for key in entry_keys)
+        keys.sort()
+        self._keys = keys
+
+    def search(self, prefix, limit=SUGGEST_LIMIT):
+        """
+        返回以 prefix 开头的条目 [{'type', 'title', 'url'}, ...]。
+        从整个标题开头匹配的排在前面，其次按类型和标题长度排序。
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = {}
+        i = bisect_left(self._keys, (prefix,))
+        # 最多检查 limit * 10 个键，常见的单字前缀也不会扫描整个索引
+        for key, kind, pk in self._keys[i:i + limit * 10]:
+            if not key.startswith(prefix):
+                break
+            text = self._entries[kind, pk][0]
+            # 最长的键就是整个标题
+            whole = len(key) == len(normalize(text))
+            if (kind, pk) not in matches or whole:
+                matches[kind, pk] = (not whole, KIND_ORDER[kind], len(text), text)
+        ranked = sorted(matches.items(), key=lambda item: item[1])[:limit]
+        return [
+            {'type': kind, 'title': self._entries[kind, pk][0], 'url': self._entries[kind, pk][1]}
+            for (kind, pk), _ in ranked
+        ]
+
+
+def _post_item(pk, title):
+    return POST, pk, title, reverse('blog:detail', kwargs={'pk': pk})
+
+
+def _category_item(pk, name):
+    return CATEGORY, pk, name, reverse('blog:category', kwargs={'pk': pk})
+
+
+def _tag_item(pk, name):
+    return TAG, pk, name, reverse('blog:tag', kwargs={'pk': pk})
+
+
+def build_index():
+    index = PrefixIndex()
+    items = [_post_item(pk, title) for pk, title in Post.objects.values_list('pk', 'title').iterator()]
+    items += [_category_item(pk, name) for pk, name in Category.objects.values_list('pk', 'name')]
+    items += [_tag_item(pk, name) for pk, name in Tag.objects.values_list('pk', 'name')]
+    index.bulk_load(items)
+    return index
+
+
+_lock = threading.Lock()
+_index = None
+_version = None
+_checked = 0
+
+
+def _current_version():
+    return cache.get_or_set(SUGGEST_VERSION_KEY, lambda: uuid.uuid4().hex, timeout=None)
+
+
+def get_index():
+    """
+    返回本进程的索引，第一次调用或者其它进程修改过数据时从数据库重新构建。
+    """
+    global _index, _version, _checked
+    now = time.monotonic()
+    if _index is not None and now - _checked < SUGGEST_CHECK_INTERVAL:
+        return _index
+    with _lock:
+        version = _current_version()
+        if _index is None or version != _version:
+            _index = build_index()
+            _version = version
+        _checked = now
+        return _index
+
+
+def suggest(prefix, limit=SUGGEST_LIMIT):
+    return get_index().search(prefix, limit)
+
+
+def _update(change):
+    # 修改本进程的索引并换一个新的版本号，其它进程之后会重新构建；本进程已经是最新的，不需要重新构建
+    global _version
+    with _lock:
+        version = uuid.uuid4().hex
+        cache.set(SUGGEST_VERSION_KEY, version, timeout=None)
+        if _index is not None:
+            change(_index)
+            _version = version
+
+
+def post_changed(post, deleted=False):
+    if deleted or post.status != Post.PUBLISHED:
+        _update(lambda index: index.remove(POST, post.pk))
+    else:
+        _update(lambda index: index.add(*_post_item(post.pk, post.title)))
+
+
+def taxonomy_changed(instance, deleted=False):
+    kind, item = (CATEGORY, _category_item) if isinstance(instance, Category) else (TAG, _tag_item)
+    if deleted:
+        _update(lambda index: index.remove(kind, instance.pk))
+    else:
+        _update(lambda index: index.add(*item(instance.pk, instance.name)))
+
+
+def invalidate_index():
+    """
+    批量修改文章后调用，所有进程（包括本进程）都在下一次查找时重新构建索引。
+    """
+    global _index
+    with _lock:
+        cache.set(SUGGEST_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        _index = None
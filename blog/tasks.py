@@ -0,0 +1,124 @@
+# 保存在数据库中的后台任务队列。
+#
+# 保存文章等写操作之后还有很多派生数据需要更新：渲染 Markdown、重新计算相关文章、重建侧边栏和 RSS 的缓存等，
+# 它们不影响这次请求的结果，却会拖慢编辑和评论者的请求。写请求中只需要调用 enqueue 把任务写入数据库，
+# 由 python manage.py run_tasks 启动的 worker 进程依次执行。
+#
+# - 任务保存在数据库中，应用重启不会丢失；任务和触发它的写操作在同一个事务中提交
+# - 相同 key 的任务在等待执行时只保留一个，例如短时间内多次保存同一篇文章只会渲染一次
+# - 任务抛出异常后按指数退避重试，超过 MAX_ATTEMPTS 次后标记为失败，可以在 admin 后台查看错误信息
+# - worker 异常退出时正在执行的任务在 TASK_TIMEOUT 之后会被重新执行
+#
+# 任务函数必须是模块级别的函数，参数必须可以序列化为 JSON。
+# 文章阅读量 +1 这类频繁、丢失也无妨的小操作仍然交给 blog/background.py 的后台线程执行。
+import hashlib
+import json
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+MAX_ATTEMPTS = 5
+# 第 n 次失败后等待 RETRY_DELAY * 2 ** (n - 1) 再重试
+RETRY_DELAY = timedelta(seconds=30)
+TASK_TIMEOUT = timedelta(minutes=10)
+
+
+def task_name(func):
+    return '{}.{}'.format(func.__module__, func.__qualname__)
+
+
+def enqueue(func, *args, key=None):
+    """
+    把 func(*args) 加入任务队列，返回创建的 Task；已有相同 key 的任务在等待执行时不重复创建，返回 None。
+
+    settings.BACKGROUND_TASKS_EAGER 为 True 时（开发环境和测试）直接同步执行。
+    """
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        func(*args)
+        return None
+
+    name = task_name(func)
+    args = json.dumps(args)
+    if key is None:
+        key = '{}:{}'.format(name, args)
+    if len(key) > Task._meta.get_field('key').max_length:
+        key = hashlib.md5(key.encode('utf-8')).hexdigest()
+    # 只和等待执行的任务去重：正在执行的任务可能已经读取了修改前的数据，需要再执行一次
+    if Task.objects.filter(key=key, status=Task.PENDING).exists():
+        return None
+    return Task.objects.create(name=name, args=args, key=key)
+
+
+def _runnable(now):
+    return Q(status=Task.PENDING, run_at__lte=now) | Q(status=Task.RUNNING, started_time__lt=now - TASK_TIMEOUT)
+
+
+def claim(now=None):
+    """
+    领取一个到期的任务，返回 Task 或者 None。
+
+    先查出候选任务，再用带条件的 UPDATE 把状态改为 RUNNING，只有更新成功的 worker 才能执行它，
+    多个 worker 同时运行也不会重复执行同一个任务。
+    """
+    now = now or timezone.now()
+    candidates = Task.objects.filter(_runnable(now)).order_by('run_at', 'id').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = Task.objects.filter(_runnable(now), pk=pk).update(
+            status=Task.RUNNING,
+            started_time=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def run_task(task):
+    """
+    执行一个已经领取的任务，成功后删除任务，失败时安排重试或者标记为失败。返回是否成功。
+    """
+    try:
+        func = import_string(task.name)
+        func(*json.loads(task.args))
+    except Exception:
+        error = traceback.format_exc()
+        if task.attempts >= MAX_ATTEMPTS:
+            Task.objects.filter(pk=task.pk).update(status=Task.FAILED, last_error=error)
+        else:
+            Task.objects.filter(pk=task.pk).update(
+                status=Task.PENDING,
+                run_at=timezone.now() + RETRY_DELAY * 2 ** (task.attempts - 1),
+                last_error=error,
+            )
+        return False
+    Task.objects.filter(pk=task.pk).delete()
+    return True
+
+
+def work(once=False, sleep=1.0):
+    """
+    循环领取并执行任务。once 为 True 时执行完当前到期的任务后返回，否则队列为空时等待 sleep 秒后继续。
+    返回 (成功数, 失败数)。
+    """
+    succeeded = failed = 0
+    while True:
+        # worker 长期运行，按 CONN_MAX_AGE 的设置清理失效的数据库连接
+        close_old_connections()
+        task = claim()
+        if task is None:
+            if once:
+                return succeeded, failed
+            time.sleep(sleep)
+            continue
+        if run_task(task):
+            succeeded += 1
+        else:
+            failed += 1
@@ -1,7 +1,15 @@
 from django import template
-from django.db.models import Count
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
 
-from ..models import Post, Category, Tag
+from ..storage import BundledManifestStaticFilesStorage
+
+from ..counters import tag_cloud
+from ..related import get_related_posts
+from ..sidebar import get_archives, get_categories, get_recent_posts, get_tags
+from ..trending import get_trending_posts
 
 #首先导入 template 这个模块，然后实例化了一个 template.Library 类，
 # 并将函数 show_recent_posts 装饰为 register.inclusion_tag，这样就告诉 django，这个函数是我们自定义的一个类型为 inclusion_tag 的模板标签。
@@ -19,7 +27,15 @@ register = template.Library()
 @register.inclusion_tag('blog/inclusions/_recent_posts.html', takes_context=True)
 def show_recent_posts(context, num=5):
     return {
-        'recent_post_list': Post.objects.all().order_by('-created_time')[:num],
+        # 侧边栏的数据都从缓存中读取，文章、分类、标签变化时缓存会被清除，见 blog/sidebar.py
+        'recent_post_list': get_recent_posts(num),
+    }
+
+# 热门文章，统计窗口内阅读量最高的文章，结果缓存一段时间，见 blog/trending.py
+@register.inclusion_tag('blog/inclusions/_trending_posts.html', takes_context=True)
+def show_trending_posts(context, window='week', num=5):
+    return {
+        'trending_post_list': get_trending_posts(window, num),
     }
 
 # ？和最新文章模板标签一样，先写好函数，然后将函数注册为模板标签即可。
@@ -29,21 +45,49 @@ def show_recent_posts(context, num=5):
 def show_archives(context):
 
     return {
-        'date_list': Post.objects.dates('created_time', 'month', order='DESC'),
+        'date_list': get_archives(),
     }
 
 # 过程还是一样，先写好函数，然后将函数注册为模板标签。注意分类模板标签函数中使用到了 Category 类，其定义在 blog.models.py 文件中，
 @register.inclusion_tag('blog/inclusions/_categories.html', takes_context=True)
 def show_categories(context):
-    category_list = Category.objects.annotate(num_posts=Count('post')).filter(num_posts__gt=0)
     return {
-        'category_list': category_list
+        'category_list': get_categories()
     }
 
 # 标签和分类其实是很类似的，模板标签：
 @register.inclusion_tag('blog/inclusions/_tags.html', takes_context=True)
 def show_tags(context):
-    tag_list = Tag.objects.annotate(num_posts=Count('post')).filter(num_posts__gt=0)
     return {
-        'tag_list': tag_list,
-    }
\ No newline at end of file
+        'tag_list': get_tags(),
+    }
+
+
+# 加权的标签云，按标签的文章数把字号分为 buckets 档。文章数来自 Tag.num_posts，分档在缓存的标签列表上计算，
+# 不需要查询数据库，见 blog/counters.py
+@register.inclusion_tag('blog/inclusions/_tag_cloud.html', takes_context=True)
+def show_tag_cloud(context, buckets=5):
+    return {
+        'tag_cloud': tag_cloud(get_tags(), buckets),
+    }
+
+
+# 相关文章，从预先计算好的缓存中读取，详情页不需要再做标签和分类的关联查询；
+# 文章的分类已经随文章一起查询，同一分类下的最新文章和相关文章一起读取
+@register.inclusion_tag('blog/inclusions/_related_posts.html', takes_context=True)
+def show_related_posts(context, post):
+    return {
+        'related_post_list': get_related_posts(post.pk, post.category_id),
+    }
+
+# 引入 settings.STATIC_BUNDLES 中定义的合并文件。只有使用 BundledManifestStaticFilesStorage 时合并文件才存在，
+# 引入的是合并、压缩后带哈希的文件；否则（例如本地开发）逐个引入源文件，修改后刷新页面即可生效。
+@register.simple_tag
+def static_bundle(name):
+    if isinstance(staticfiles_storage, BundledManifestStaticFilesStorage):
+        urls = [static(name)]
+    else:
+        urls = [static(source) for source in settings.STATIC_BUNDLES[name]]
+    if name.endswith('.css'):
+        return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((url,) for url in urls))
+    return format_html_join('\n', '<script src="{}"></script>', ((url,) for url in urls))
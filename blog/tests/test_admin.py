@@ -0,0 +1,117 @@
+#测试文章后台
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Category, Post, Tag
+from blog.paginator import ESTIMATE_THRESHOLD, EstimatedCountPaginator
+
+
+class PostAdminTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.client.login(username='admin', password='admin')
+        self.cate = Category.objects.create(name='测试分类')
+        self.tag = Tag.objects.create(name='测试标签')
+        self.url = reverse('admin:blog_post_changelist')
+
+    def create_posts(self, num):
+        for i in range(num):
+            post = Post.objects.create(title='测试标题{}'.format(i), body='测试内容', category=self.cate, author=self.user)
+            post.tags.add(self.tag)
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.create_posts(2)
+        few = self.changelist_queries()
+        self.create_posts(10)
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_filters(self):
+        self.create_posts(2)
+        response = self.client.get(self.url, {'tags__id__exact': self.tag.pk, 'category__id__exact': self.cate.pk})
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertContains(self.client.get(self.url, {'q': '测试标题1'}), '测试标题1')
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+    def test_count(self):
+        # 后台使用包含全部文章的 all_objects，没有过滤条件
+        queryset = Post.all_objects.all()
+        # SQLite 没有估计行数，使用精确计数
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 0)
+
+        with mock.patch('blog.paginator.estimate_count', return_value=ESTIMATE_THRESHOLD * 10):
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count, ESTIMATE_THRESHOLD * 10)
+            # 有过滤条件时精确计数
+            self.assertEqual(EstimatedCountPaginator(queryset.filter(title='a'), 10).count, 0)
+
+        with mock.patch('blog.paginator.estimate_count', return_value=5):
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 0)
+
+
+class PostAdminActionsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.client.login(username='admin', password='admin')
+        self.cate1 = Category.objects.create(name='分类一')
+        self.cate2 = Category.objects.create(name='分类二')
+        self.tag = Tag.objects.create(name='测试标签')
+        self.url = reverse('admin:blog_post_changelist')
+
+    def create_posts(self, num):
+        return [
+            Post.objects.create(title='测试标题{}'.format(i), body='测试内容', category=self.cate1, author=self.user)
+            for i in range(num)
+        ]
+
+    def run_action(self, action, posts, **data):
+        data.update({'action': action, '_selected_action': [post.pk for post in posts]})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+        return len(queries)
+
+    def test_move_to_category(self):
+        posts = self.create_posts(2)
+        few = self.run_action('move_to_category', posts, category=self.cate2.pk)
+        self.assertEqual(Post.objects.filter(category=self.cate2).count(), 2)
+
+        # 查询次数和文章数量无关
+        posts = self.create_posts(10)
+        self.assertEqual(self.run_action('move_to_category', posts, category=self.cate2.pk), few)
+        self.assertEqual(Post.objects.filter(category=self.cate2).count(), 12)
+
+    def test_add_and_remove_tag(self):
+        posts = self.create_posts(3)
+        posts[0].tags.add(self.tag)
+        modified_time = Post.objects.get(pk=posts[1].pk).modified_time
+
+        self.run_action('add_tag', posts, tag=self.tag.pk)
+        self.assertEqual(self.tag.post_set.count(), 3)
+        self.assertGreater(Post.objects.get(pk=posts[1].pk).modified_time, modified_time)
+
+        self.run_action('remove_tag', posts[:2], tag=self.tag.pk)
+        self.assertEqual(list(self.tag.post_set.values_list('pk', flat=True)), [posts[2].pk])
+
+    def test_missing_target(self):
+        posts = self.create_posts(1)
+        self.run_action('move_to_category', posts)
+        self.assertEqual(Post.objects.get().category, self.cate1)
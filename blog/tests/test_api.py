@@ -0,0 +1,123 @@
+#测试 JSON 接口
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from blog import api
+from blog.models import Category, Post, Tag
+from comments.models import Comment
+
+
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='测试分类')
+        self.tag = Tag.objects.create(name='测试标签')
+        now = timezone.now()
+        self.posts = []
+        for i in range(5):
+            post = Post.objects.create(
+                title='测试标题{}'.format(i),
+                body='# 标题{}'.format(i),
+                category=self.cate,
+                author=self.user,
+                created_time=now - timedelta(days=i),
+            )
+            post.tags.add(self.tag)
+            self.posts.append(post)
+
+    def test_post_list_with_sparse_fields_and_includes(self):
+        url = reverse('api:post_list')
+        # 文章、文章标签、分类、标签、作者各一次查询，与文章数量无关；ETag 只读取缓存中的版本号
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'fields': 'id,title,tags', 'include': 'category,tags,author'})
+        data = response.json()
+        self.assertEqual(data['results'][0], {'id': self.posts[0].pk, 'title': '测试标题0', 'tags': [self.tag.pk]})
+        self.assertEqual(data['included']['categories'], [{'id': self.cate.pk, 'name': '测试分类'}])
+        self.assertEqual(data['included']['tags'], [{'id': self.tag.pk, 'name': '测试标签'}])
+        self.assertEqual(data['included']['authors'], [{'id': self.user.pk, 'username': 'admin'}])
+
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        url = reverse('api:post_list')
+        seen = []
+        params = {'fields': 'id', 'limit': 2}
+        while True:
+            data = self.client.get(url, params).json()
+            seen += [post['id'] for post in data['results']]
+            if data['next_cursor'] is None:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(seen, [post.pk for post in self.posts])
+        self.assertEqual(self.client.get(url, {'cursor': 'invalid'}).status_code, 400)
+
+    def test_post_detail_does_not_render_markdown(self):
+        url = reverse('api:post_detail', kwargs={'pk': self.posts[0].pk})
+        with mock.patch('blog.models.generate_rich_content') as generate_rich_content:
+            data = self.client.get(url).json()
+        generate_rich_content.assert_not_called()
+        self.assertHTMLEqual(data['result']['body_html'], '<h1 id="标题0">标题0</h1>')
+        self.assertEqual(self.client.get(reverse('api:post_detail', kwargs={'pk': 100})).status_code, 404)
+
+    def test_conditional_get(self):
+        url = reverse('api:post_detail', kwargs={'pk': self.posts[0].pk})
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # 阅读量变化不更新版本号，ETag 按时间段变化
+        self.posts[0].increase_views()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with mock.patch('blog.api.time.time', return_value=time.time() + api.VIEWS_ETAG_INTERVAL):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.posts[0].title = '新标题'
+        self.posts[0].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_etag_uses_version(self):
+        url = reverse('api:post_list')
+        params = {'fields': 'id,title'}
+        etag = self.client.get(url, params)['ETag']
+        # 判断是否返回 304 不需要查询数据库
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # 查询参数不同时 ETag 也不同
+        self.assertNotEqual(self.client.get(url, {'fields': 'id'})['ETag'], etag)
+
+        self.posts[0].title = '新标题'
+        self.posts[0].save()
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        url = reverse('api:comment_list', kwargs={'pk': self.posts[0].pk})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Comment.objects.create(name='评论者', email='a@a.com', text='评论内容', post=self.posts[0])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_comments(self):
+        post = self.posts[0]
+        Comment.objects.create(name='评论者', email='a@a.com', text='评论内容', post=post)
+        data = self.client.get(reverse('api:comment_list', kwargs={'pk': post.pk})).json()
+        self.assertEqual(data['results'][0]['text'], '评论内容')
+        self.assertNotIn('email', data['results'][0])
+
+    def test_taxonomies_and_archives(self):
+        self.assertEqual(self.client.get(reverse('api:category_list')).json()['results'][0]['num_posts'], 5)
+        self.assertEqual(self.client.get(reverse('api:tag_list')).json()['results'][0]['num_posts'], 5)
+        archives = self.client.get(reverse('api:archive_list')).json()['results']
+        self.assertEqual(sum(month['num_posts'] for month in archives), 5)
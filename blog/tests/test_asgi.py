@@ -0,0 +1,116 @@
+#测试 ASGI 入口
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from blogproject import asgi
+from blogproject.asgi import application, build_environ
+
+
+class ASGIApplicationTestCase(SimpleTestCase):
+    def request(self, scope, body=b''):
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(application(scope, receive, send))
+        return sent
+
+    def test_build_environ(self):
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': '/搜索/',
+            'query_string': b'q=django',
+            'headers': [(b'cookie', b'a=1'), (b'cookie', b'b=2'), (b'content-type', b'text/plain')],
+            'client': ('10.0.0.1', 1234),
+        }
+        environ = build_environ(scope, b'body')
+        self.assertEqual(environ['PATH_INFO'], '/搜索/'.encode('utf-8').decode('latin-1'))
+        self.assertEqual(environ['QUERY_STRING'], 'q=django')
+        self.assertEqual(environ['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['CONTENT_LENGTH'], '4')
+        self.assertEqual(environ['REMOTE_ADDR'], '10.0.0.1')
+        self.assertEqual(environ['wsgi.input'].read(), b'body')
+
+    def test_http_request(self):
+        sent = self.request({'type': 'http', 'method': 'GET', 'path': '/not-found/', 'headers': []})
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 404)
+        self.assertEqual(sent[1]['type'], 'http.response.body')
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_streams_response_chunks(self):
+        closed = []
+
+        class Response:
+            def __iter__(self):
+                yield b'first'
+                yield b''
+                yield b'second'
+
+            def close(self):
+                closed.append(True)
+
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return Response()
+
+        with mock.patch.object(asgi, 'wsgi_application', wsgi_application):
+            sent = self.request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': []})
+        self.assertEqual(sent[0], {
+            'type': 'http.response.start', 'status': 200, 'headers': [(b'content-type', b'text/plain')],
+        })
+        # 每一块单独发送，最后一条消息表示响应结束
+        self.assertEqual([message['body'] for message in sent[1:]], [b'first', b'second', b''])
+        self.assertEqual([message.get('more_body', False) for message in sent[1:]], [True, True, False])
+        self.assertEqual(closed, [True])
+
+    def test_cancel_mid_stream(self):
+        closed = threading.Event()
+
+        class Response:
+            def __iter__(self):
+                # 比队列能放下的块多，客户端不读取时线程会等待队列的空位
+                for _ in range(asgi.RESPONSE_QUEUE_SIZE * 4):
+                    yield b'chunk'
+
+            def close(self):
+                closed.set()
+
+        def wsgi_application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return Response()
+
+        async def main():
+            first_body = asyncio.Event()
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.body':
+                    first_body.set()
+                    # 模拟一直不读取的慢速客户端
+                    await asyncio.Event().wait()
+
+            task = asyncio.ensure_future(
+                application({'type': 'http', 'method': 'GET', 'path': '/', 'headers': []}, receive, send)
+            )
+            await first_body.wait()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(asgi, 'wsgi_application', wsgi_application):
+            asyncio.run(main())
+            # 线程停止迭代并关闭了响应，没有一直卡在队列上
+            self.assertTrue(closed.wait(asgi.PUT_TIMEOUT * 5))
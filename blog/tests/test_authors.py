@@ -0,0 +1,111 @@
+#测试作者统计、作者页面和作者的 RSS
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.counters import update_author_stats
+from blog.models import AuthorStats, Category, Post
+from blog.paginator import keyset_page
+from blog.views import AUTHOR_POSTS_PAGE_SIZE
+
+
+class AuthorsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.other = User.objects.create_user(username='other', password='other')
+        self.cate = Category.objects.create(name='测试分类')
+
+    def create_post(self, author=None, **kwargs):
+        kwargs.setdefault('title', '测试标题')
+        return Post.objects.create(body='测试内容', category=self.cate, author=author or self.user, **kwargs)
+
+    def stats(self, user):
+        stats = AuthorStats.objects.get(pk=user.pk)
+        return stats.num_posts, stats.total_views, stats.latest_post_time
+
+    def test_stats_maintained(self):
+        post1 = self.create_post()
+        post2 = self.create_post()
+        self.create_post(status=Post.DRAFT)
+        self.assertEqual(self.stats(self.user), (2, 0, post2.created_time))
+
+        post2.save_view()
+        post2.save_view()
+        self.assertEqual(self.stats(self.user)[1], 2)
+
+        # 换作者时两个作者都重新统计
+        post2.refresh_from_db()
+        post2.author = self.other
+        post2.save()
+        self.assertEqual(self.stats(self.user), (1, 0, post1.created_time))
+        self.assertEqual(self.stats(self.other), (1, 2, post2.created_time))
+
+        post1.delete()
+        self.assertEqual(self.stats(self.user), (0, 0, None))
+
+        # 统计出现偏差时全部重新统计即可恢复
+        AuthorStats.objects.update(num_posts=100)
+        update_author_stats()
+        self.assertEqual(self.stats(self.other), (1, 2, post2.created_time))
+
+    def test_delete_user(self):
+        self.create_post(author=self.other)
+        self.other.delete()
+        self.assertFalse(AuthorStats.objects.filter(pk=self.other.pk).exists())
+
+    def test_keyset_page(self):
+        now = timezone.now()
+        # 相同的创建时间按 id 排序，翻页时既不会重复也不会遗漏
+        posts = [self.create_post(created_time=now - timedelta(days=i // 2)) for i in range(7)]
+        expected = sorted(posts, key=lambda post: (post.created_time, post.pk), reverse=True)
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_page(Post.objects.all(), ('-created_time', '-id'), 3, cursor)
+            seen += list(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_author_pages(self):
+        for _ in range(AUTHOR_POSTS_PAGE_SIZE + 1):
+            self.create_post()
+        self.create_post(author=self.other)
+
+        response = self.client.get(reverse('blog:authors'))
+        self.assertEqual([stats.user for stats in response.context['author_list']], [self.other, self.user])
+        self.assertIn('authors', response['Surrogate-Key'].split())
+
+        url = reverse('blog:author', kwargs={'pk': self.user.pk})
+        # 作者统计、一页文章和这一页的评论数各一条查询
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['post_list']), AUTHOR_POSTS_PAGE_SIZE)
+        self.assertIn('author-{}'.format(self.user.pk), response['Surrogate-Key'].split())
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(url, {'cursor': next_cursor})
+        self.assertEqual(len(response.context['post_list']), 1)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+        self.assertEqual(self.client.get(url, {'cursor': 'invalid'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('blog:author', kwargs={'pk': 999})).status_code, 404)
+
+    def test_author_feed(self):
+        self.create_post(title='我的文章')
+        self.create_post(title='别人的文章', author=self.other)
+        response = self.client.get(reverse('author_rss', kwargs={'pk': self.user.pk}))
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('我的文章', content)
+        self.assertNotIn('别人的文章', content)
+        self.assertIn('author-{}'.format(self.user.pk), response['Surrogate-Key'].split())
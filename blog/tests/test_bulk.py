@@ -0,0 +1,66 @@
+#测试整表的分批读取、删除
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.test import TestCase
+from django.urls import reverse
+
+from blog.bulk import bulk_delete, iter_pk_chunks, stream_queryset
+from blog.models import Category, Post, PostViewCount, Tag
+from comments.models import Comment
+
+
+class BulkTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='测试分类')
+        self.tag = Tag.objects.create(name='测试标签')
+        self.posts = []
+        for i in range(5):
+            post = Post.objects.create(title='文章 {}'.format(i), body='内容', category=self.cate, author=self.user)
+            post.tags.add(self.tag)
+            Comment.objects.create(name='评论者', email='a@b.com', text='评论', post=post)
+            PostViewCount.record(post.pk)
+            self.posts.append(post)
+
+    def test_iter_pk_chunks(self):
+        chunks = list(iter_pk_chunks(Post.objects.all(), chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(sum(chunks, []), sorted(post.pk for post in self.posts))
+
+    def test_stream_queryset(self):
+        titles = [post.title for post in stream_queryset(Post.objects.order_by('pk'), chunk_size=2)]
+        self.assertEqual(titles, ['文章 {}'.format(i) for i in range(5)])
+
+    def test_bulk_delete(self):
+        deleted = []
+        receiver = lambda sender, instance, **kwargs: deleted.append(instance)
+        post_delete.connect(receiver, sender=Post)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Post)
+
+        self.assertEqual(bulk_delete(Post.objects.filter(pk__in=[p.pk for p in self.posts[:3]]), chunk_size=2), 3)
+        # 级联删除评论、标签关联和阅读量统计，不发送删除信号
+        self.assertEqual(deleted, [])
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(Post.tags.through.objects.count(), 2)
+        self.assertEqual(PostViewCount.objects.count(), 2)
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_streaming_rss(self):
+        response = self.client.get(reverse('rss'))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        for post in self.posts:
+            self.assertIn('[测试分类] {}'.format(post.title), content)
+        self.assertTrue(content.rstrip().endswith('</rss>'))
+
+        # 不修改文章时 RSS 不变，阅读器用 If-Modified-Since 再次请求时返回 304
+        response = self.client.get(reverse('rss'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
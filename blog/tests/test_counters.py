@@ -0,0 +1,95 @@
+#测试分类、标签的文章数和标签云
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+
+from blog.counters import tag_cloud, update_category_counts, update_tag_counts
+from blog.models import Category, Post, Tag
+from blog.sidebar import get_categories, get_tags
+
+
+class CountersTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate1 = Category.objects.create(name='分类一')
+        self.cate2 = Category.objects.create(name='分类二')
+        self.tag1 = Tag.objects.create(name='标签一')
+        self.tag2 = Tag.objects.create(name='标签二')
+        self.post = self.create_post()
+        self.post.tags.add(self.tag1, self.tag2)
+
+    def create_post(self, **kwargs):
+        kwargs.setdefault('category', self.cate1)
+        return Post.objects.create(title='测试标题', body='测试内容', author=self.user, **kwargs)
+
+    def assertCounts(self, cate1, cate2, tag1, tag2):
+        counts = dict(Category.objects.values_list('name', 'num_posts'))
+        counts.update(Tag.objects.values_list('name', 'num_posts'))
+        self.assertEqual(
+            [counts['分类一'], counts['分类二'], counts['标签一'], counts['标签二']],
+            [cate1, cate2, tag1, tag2],
+        )
+
+    def test_save_and_delete(self):
+        self.assertCounts(1, 0, 1, 1)
+        self.post.category = self.cate2
+        self.post.save()
+        self.assertCounts(0, 1, 1, 1)
+
+        # 草稿不计入文章数
+        self.post.status = Post.DRAFT
+        self.post.save()
+        self.assertCounts(0, 0, 0, 0)
+        self.post.status = Post.PUBLISHED
+        self.post.save()
+        self.assertCounts(0, 1, 1, 1)
+
+        self.post.delete()
+        self.assertCounts(0, 0, 0, 0)
+
+    def test_tags_changed(self):
+        self.post.tags.remove(self.tag1)
+        self.assertCounts(1, 0, 0, 1)
+        self.post.tags.clear()
+        self.assertCounts(1, 0, 0, 0)
+        self.tag1.post_set.add(self.post, self.create_post())
+        self.assertCounts(2, 0, 2, 0)
+        # 草稿的标签不计入文章数
+        self.create_post(status=Post.DRAFT).tags.add(self.tag2)
+        self.assertCounts(2, 0, 2, 0)
+
+    def test_full_recount(self):
+        Category.objects.update(num_posts=100)
+        Tag.objects.update(num_posts=100)
+        update_category_counts()
+        update_tag_counts()
+        self.assertCounts(1, 0, 1, 1)
+
+    def test_sidebar_single_query(self):
+        self.create_post(category=self.cate2)
+        cache.clear()
+        with self.assertNumQueries(1):
+            categories = get_categories()
+        self.assertEqual({(c.name, c.num_posts) for c in categories}, {('分类一', 1), ('分类二', 1)})
+        self.post.tags.remove(self.tag2)
+        self.assertEqual([tag.name for tag in get_tags()], ['标签一'])
+
+    def test_tag_cloud(self):
+        tags = [Tag(name=str(n), num_posts=n) for n in (1, 2, 10, 100, 0)]
+        weights = [weight for _, weight in tag_cloud(tags, buckets=5)]
+        self.assertEqual(weights, [1, 2, 3, 5])
+        self.assertEqual([weight for _, weight in tag_cloud(tags[:1] * 2, buckets=5)], [3, 3])
+        self.assertEqual(tag_cloud([]), [])
+
+    def test_show_tag_cloud(self):
+        self.create_post().tags.add(self.tag1)
+        html = Template('{% load blog_extras %}{% show_tag_cloud %}').render(Context({}))
+        self.assertInHTML('<li class="tag-weight-5"><a href="/tags/{}/">标签一 <span class="post-count">(2)</span></a></li>'.format(self.tag1.pk), html)
+        self.assertIn('tag-weight-1', html)
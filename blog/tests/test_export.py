@@ -0,0 +1,104 @@
+#测试静态导出
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from blog.export import export_site, url_to_path
+from blog.models import Category, Post, Tag
+
+
+class ExportSiteTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate1 = Category.objects.create(name='测试分类一')
+        self.cate2 = Category.objects.create(name='测试分类二')
+        self.tag = Tag.objects.create(name='测试标签')
+        self.post1 = Post.objects.create(
+            title='测试标题一',
+            body='测试内容一',
+            category=self.cate1,
+            author=self.user,
+        )
+        self.post1.tags.add(self.tag)
+        self.post2 = Post.objects.create(
+            title='测试标题二',
+            body='测试内容二',
+            category=self.cate2,
+            author=self.user,
+            created_time=timezone.now() - timedelta(days=100)
+        )
+        self.output_dir = os.path.join(tempfile.mkdtemp(), 'export')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.output_dir))
+
+    def read(self, path):
+        with open(os.path.join(self.output_dir, path), encoding='utf-8') as f:
+            return f.read()
+
+    def test_url_to_path(self):
+        self.assertEqual(url_to_path('/'), 'index.html')
+        self.assertEqual(url_to_path('/?page=2'), os.path.join('page', '2', 'index.html'))
+        self.assertEqual(url_to_path('/posts/1/'), os.path.join('posts', '1', 'index.html'))
+        self.assertEqual(url_to_path('/all/rss/', 'application/rss+xml'), os.path.join('all', 'rss', 'index.xml'))
+
+    def test_full_export(self):
+        full, written, failed = export_site(self.output_dir)
+        self.assertTrue(full)
+        self.assertEqual(failed, [])
+        self.assertIn(self.post1.title, self.read('index.html'))
+        self.assertIn(self.post1.title, self.read(url_to_path(self.post1.get_absolute_url())))
+        self.assertIn(self.post1.title, self.read(os.path.join('categories', str(self.cate1.pk), 'index.html')))
+        self.assertIn(self.post1.title, self.read(os.path.join('tags', str(self.tag.pk), 'index.html')))
+        self.assertIn(self.post2.title, self.read(os.path.join('all', 'rss', 'index.xml')))
+
+        # 导出渲染不计入阅读量
+        self.post1.refresh_from_db()
+        self.assertEqual(self.post1.views, 0)
+
+    def test_incremental_export(self):
+        Post.objects.create(
+            title='测试标题三',
+            body='测试内容三',
+            category=self.cate2,
+            author=self.user,
+        )
+        export_site(self.output_dir)
+
+        self.post2.body = '修改后的内容'
+        self.post2.category = self.cate1
+        self.post2.save()
+        full, written, failed = export_site(self.output_dir, incremental=True)
+        self.assertFalse(full)
+        self.assertIn('修改后的内容', self.read(url_to_path(self.post2.get_absolute_url())))
+        # 文章移入和移出的分类页都会被重新生成，移出的分类页中只剩下侧边栏最新文章里的链接
+        self.assertEqual(self.read(os.path.join('categories', str(self.cate1.pk), 'index.html')).count(self.post2.title), 2)
+        self.assertEqual(self.read(os.path.join('categories', str(self.cate2.pk), 'index.html')).count(self.post2.title), 1)
+        # 与修改无关的页面不会重新生成
+        self.assertLess(written, 8)
+
+    def test_incremental_export_falls_back_to_full_when_sidebar_changes(self):
+        export_site(self.output_dir)
+
+        self.post2.title = '修改后的标题'
+        self.post2.save()
+        full, written, failed = export_site(self.output_dir, incremental=True)
+        self.assertTrue(full)
+        self.assertIn('修改后的标题', self.read(os.path.join('tags', str(self.tag.pk), 'index.html')))
+
+        Post.objects.create(
+            title='新文章',
+            body='新内容',
+            category=self.cate2,
+            author=self.user,
+        )
+        full, written, failed = export_site(self.output_dir, incremental=True)
+        self.assertTrue(full)
+        self.assertIn('新文章', self.read(os.path.join('tags', str(self.tag.pk), 'index.html')))
@@ -0,0 +1,69 @@
+#测试文章详情页的片段缓存
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.template.defaultfilters import date
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Category, Post
+from comments.models import Comment
+
+
+class DetailFragmentCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='测试分类')
+        self.post = Post.objects.create(
+            title='测试标题',
+            body='# 标题\n\n测试内容',
+            category=self.cate,
+            author=user,
+        )
+        self.url = reverse('blog:detail', kwargs={'pk': self.post.pk})
+
+    def test_cached_fragments_do_not_load_body(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, '<h1 class="entry-title">测试标题</h1>', html=True)
+        self.assertContains(response, '测试内容')
+        # datetime 属性使用 ISO 8601 格式
+        self.assertContains(response, 'datetime="{}"'.format(date(timezone.localtime(self.post.created_time), 'c')))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertContains(response, '测试内容')
+        self.assertContains(response, '<div class="toc">')
+        for query in queries.captured_queries:
+            self.assertNotIn('rendered_body', query['sql'])
+
+    def test_counters_are_not_cached(self):
+        # 阅读量由页面加载后发送的请求统计
+        self.client.get(self.url)
+        self.client.post(reverse('blog:view', kwargs={'pk': self.post.pk}))
+        self.client.post(reverse('blog:view', kwargs={'pk': self.post.pk}))
+        Comment.objects.create(name='评论者', email='a@a.com', text='评论内容', post=self.post)
+        response = self.client.get(self.url)
+        self.assertContains(response, '1 评论')
+        self.assertContains(response, '2 阅读')
+
+    def test_fragments_refresh_after_edit(self):
+        self.client.get(self.url)
+        self.post.title = '新标题'
+        self.post.body = '新内容'
+        self.post.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, '新标题')
+        self.assertContains(response, '新内容')
+        self.assertNotContains(response, '测试内容')
+
+        self.cate.name = '新分类'
+        self.cate.save()
+        self.assertContains(self.client.get(self.url), '新分类')
@@ -0,0 +1,116 @@
+#测试响应的缓存策略、Surrogate-Key 和清除缓存
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from blog.models import Category, Post, Tag
+
+
+class HttpCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='测试分类')
+        self.tag = Tag.objects.create(name='测试标签')
+        self.post = Post.objects.create(title='测试标题', body='测试内容', category=self.cate, author=self.user)
+        self.post.tags.add(self.tag)
+
+    def keys(self, response):
+        return response['Surrogate-Key'].split()
+
+    def test_public_pages(self):
+        response = self.client.get(reverse('blog:index'))
+        self.assertEqual(
+            sorted(response['Cache-Control'].split(', ')),
+            ['max-age=60', 'public', 's-maxage=3600', 'stale-while-revalidate=60'],
+        )
+        self.assertEqual(self.keys(response), ['all', 'sidebar', 'post-{}'.format(self.post.pk)])
+
+        response = self.client.get(reverse('blog:tag', kwargs={'pk': self.tag.pk}))
+        self.assertIn('tag-{}'.format(self.tag.pk), self.keys(response))
+
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('post-{}'.format(self.post.pk), self.keys(response))
+        self.assertIn('category-{}'.format(self.cate.pk), self.keys(response))
+        # 评论表单由 JavaScript 单独加载，页面中没有 CSRF token，不会设置 cookie
+        self.assertEqual(response.cookies, {})
+
+        response = self.client.get(reverse('rss'))
+        self.assertIn('feed', self.keys(response))
+        response = self.client.get(reverse('rss'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('feed', self.keys(response))
+
+    def test_views_counted_by_beacon(self):
+        # 详情页会被共享缓存保存，阅读量由页面中的 script.js 单独发送请求统计
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertContains(response, 'data-view-url="{}"'.format(reverse('blog:view', kwargs={'pk': self.post.pk})))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+
+        response = Client(enforce_csrf_checks=True).post(reverse('blog:view', kwargs={'pk': self.post.pk}))
+        self.assertEqual(response.status_code, 204)
+        self.assertIn('no-store', response['Cache-Control'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+        self.assertEqual(self.client.get(reverse('blog:view', kwargs={'pk': self.post.pk})).status_code, 405)
+
+    def test_messages_are_private(self):
+        # 没有关键词的搜索会跳转到首页并显示提示消息，这个首页只属于当前访问者
+        self.client.get(reverse('blog:search'))
+        response = self.client.get(reverse('blog:index'))
+        self.assertContains(response, '请输入搜索关键词')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertFalse(response.has_header('Surrogate-Key'))
+
+        # 消息显示过之后恢复公开缓存
+        response = self.client.get(reverse('blog:index'))
+        self.assertIn('public', response['Cache-Control'])
+
+    @override_settings(HTTP_CACHE_PURGE_URL='http://127.0.0.1:6081/')
+    def test_purge(self):
+        with mock.patch('blog.http_cache.urllib.request.urlopen') as urlopen:
+            self.post.body = '新内容'
+            self.post.save()
+        request = urlopen.call_args[0][0]
+        self.assertEqual(request.get_method(), 'PURGE')
+        self.assertEqual(request.full_url, 'http://127.0.0.1:6081/')
+        # 只修改正文不会清除侧边栏
+        self.assertEqual(
+            sorted(request.get_header('Surrogate-key').split()),
+            ['api', 'author-{}'.format(self.user.pk), 'feed', 'post-{}'.format(self.post.pk)],
+        )
+
+        with mock.patch('blog.http_cache.urllib.request.urlopen') as urlopen:
+            self.post.title = '新标题'
+            self.post.save()
+        self.assertIn('sidebar', urlopen.call_args[0][0].get_header('Surrogate-key').split())
+
+        # 评论接口检查 CSRF，token 从不缓存的评论表单地址获取；发表评论后清除文章所在的页面
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('comments:comment', kwargs={'post_pk': self.post.pk})
+        data = {'name': '评论者', 'email': 'a@b.com', 'text': '评论内容'}
+        self.assertEqual(client.post(url, data).status_code, 403)
+        response = client.get(
+            reverse('comments:form', kwargs={'post_pk': self.post.pk}), HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        data['csrfmiddlewaretoken'] = response.context['csrf_token']
+        with mock.patch('blog.http_cache.urllib.request.urlopen') as urlopen:
+            response = client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('post-{}'.format(self.post.pk), urlopen.call_args[0][0].get_header('Surrogate-key').split())
+
+    def test_purge_disabled(self):
+        with mock.patch('blog.http_cache.urllib.request.urlopen') as urlopen:
+            self.post.save()
+        urlopen.assert_not_called()
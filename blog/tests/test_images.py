@@ -0,0 +1,91 @@
+#测试文章图片的上传、缩放版本和响应式 <img>
+import hashlib
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from PIL import Image
+
+from blog import images
+from blog.images import responsive_images
+from blog.models import Category, Post, PostImage
+
+
+class ImagesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.post = Post.objects.create(
+            title='测试标题', body='测试内容', category=Category.objects.create(name='测试分类'), author=self.user,
+        )
+
+    def jpeg(self, size=(200, 100)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='JPEG')
+        return buffer.getvalue()
+
+    def upload(self, content, name='photo.JPG'):
+        return PostImage.objects.create(post=self.post, image=SimpleUploadedFile(name, content))
+
+    def test_content_hashed_name(self):
+        content = self.jpeg()
+        image = self.upload(content)
+        self.assertEqual(image.image.name, 'posts/{}.jpg'.format(hashlib.sha256(content).hexdigest()[:20]))
+
+    def test_responsive_images(self):
+        image = self.upload(self.jpeg())
+        name = image.image.name
+        PostImage.objects.filter(pk=image.pk).update(
+            width=1000, height=500,
+            variants='{"thumbnail": "%s", "widths": {"640": "%s", "320": "%s"}}' % (
+                images.variant_name(name, 'thumb'), images.variant_name(name, '640w'), images.variant_name(name, '320w'),
+            ),
+        )
+        html = responsive_images('<p><img alt="a" src="{}" /><img alt="b" src="https://example.com/b.png" /></p>'.format(
+            image.image.url
+        ))
+        url = image.image.url
+        self.assertIn('srcset="{} 320w, {} 640w, {} 1000w"'.format(
+            url.replace('.jpg', '-320w.jpg'), url.replace('.jpg', '-640w.jpg'), url,
+        ), html)
+        self.assertIn('width="1000" height="500"', html)
+        # 外部图片只延迟加载
+        self.assertIn('<img alt="b" src="https://example.com/b.png" loading="lazy" />', html)
+        self.assertEqual(html.count('loading="lazy"'), 2)
+
+    def test_delete_files(self):
+        image = self.upload(self.jpeg())
+        storage, name = image.image.storage, image.image.name
+        self.assertTrue(storage.exists(name))
+        image.delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_generate_variants(self):
+        image = self.upload(self.jpeg((1000, 600)))
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (1000, 600))
+        variants = image.get_variants()
+        self.assertEqual(sorted(variants['widths']), ['320', '640', '960'])
+        self.assertTrue(image.image.storage.exists(variants['thumbnail']))
+
+        self.post.body = '![]({})'.format(image.image.url)
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertIn('960w', self.post.rendered_body)
+        self.assertIn('loading="lazy"', self.post.rendered_body)
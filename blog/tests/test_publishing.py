@@ -0,0 +1,126 @@
+#测试文章的发布状态和定时发布
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Category, Post, Tag
+from blog.publishing import publish_due_posts
+from blog.sidebar import get_categories, get_recent_posts
+from comments.models import Comment
+
+
+class PublishingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='测试分类')
+        self.tag = Tag.objects.create(name='测试标签')
+        self.published = self.create_post('已发布')
+        self.draft = self.create_post('草稿', status=Post.DRAFT)
+        self.scheduled = self.create_post(
+            '定时发布', status=Post.SCHEDULED, pub_time=timezone.now() + timedelta(hours=1),
+        )
+
+    def create_post(self, title, **kwargs):
+        post = Post.objects.create(title=title, body='测试内容', category=self.cate, author=self.user, **kwargs)
+        post.tags.add(self.tag)
+        return post
+
+    def test_published_manager(self):
+        self.assertQuerysetEqual(Post.objects.all(), [repr(self.published)])
+        self.assertEqual(Post.all_objects.count(), 3)
+        # 默认 Manager 包含全部文章，后台可以把评论、图片关联到未发布的文章上
+        self.assertIs(Post._default_manager, Post.all_objects)
+        self.assertEqual(self.tag.post_set.count(), 3)
+
+    def test_admin_attaches_comments_to_drafts(self):
+        self.client.login(username='admin', password='admin')
+        response = self.client.post(reverse('admin:comments_comment_add'), {
+            'name': '评论者', 'email': 'a@a.com', 'text': '评论内容', 'post': self.draft.pk, 'status': 'approved',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.all_objects.get().post, self.draft)
+
+    def test_views_hide_unpublished(self):
+        response = self.client.get(reverse('blog:index'))
+        self.assertContains(response, '已发布')
+        self.assertNotContains(response, '草稿')
+        self.assertEqual(self.client.get(self.draft.get_absolute_url()).status_code, 404)
+        self.assertEqual(self.client.get(self.scheduled.get_absolute_url()).status_code, 404)
+        self.assertNotContains(self.client.get(reverse('rss')), '定时发布')
+        self.assertEqual(get_categories()[0].num_posts, 1)
+
+    def test_scheduled_requires_pub_time(self):
+        self.scheduled.pub_time = None
+        with self.assertRaises(ValidationError):
+            self.scheduled.full_clean()
+
+    def test_publish_due_posts(self):
+        self.assertEqual([post.title for post in get_recent_posts()], ['已发布'])
+        self.assertEqual(publish_due_posts(), 0)
+
+        pub_time = self.scheduled.pub_time
+        self.assertEqual(publish_due_posts(now=pub_time + timedelta(minutes=1)), 1)
+        post = Post.objects.get(pk=self.scheduled.pk)
+        self.assertEqual(post.created_time, pub_time)
+        # 缓存的侧边栏在发布后立即更新
+        self.assertEqual([post.title for post in get_recent_posts()], ['定时发布', '已发布'])
+        # 草稿不会被发布
+        self.assertEqual(Post.all_objects.get(pk=self.draft.pk).status, Post.DRAFT)
+
+    def test_publish_scheduled_command(self):
+        Post.all_objects.filter(pk=self.scheduled.pk).update(pub_time=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        call_command('publish_scheduled', stdout=out)
+        self.assertIn('发布了 1 篇', out.getvalue())
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_publish_draft_on_save(self):
+        created_time = self.draft.created_time
+        self.draft.status = Post.PUBLISHED
+        self.draft.save()
+        self.assertGreater(Post.objects.get(pk=self.draft.pk).created_time, created_time)
+
+
+class PublishActionsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.client.login(username='admin', password='admin')
+        self.cate = Category.objects.create(name='测试分类')
+        self.url = reverse('admin:blog_post_changelist')
+        self.posts = [
+            Post.objects.create(title='测试标题{}'.format(i), body='测试内容', category=self.cate,
+                                author=self.user, status=Post.DRAFT)
+            for i in range(3)
+        ]
+
+    def run_action(self, action, posts):
+        response = self.client.post(self.url, {'action': action, '_selected_action': [post.pk for post in posts]})
+        self.assertEqual(response.status_code, 302)
+
+    def test_changelist_shows_drafts(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(self.client.get(reverse('admin:blog_post_change', args=[self.posts[0].pk])).status_code, 200)
+
+    def test_publish_and_unpublish(self):
+        self.run_action('publish', self.posts[:2])
+        self.assertEqual(Post.objects.count(), 2)
+        self.run_action('unpublish', self.posts[:1])
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)), [self.posts[1].pk])
@@ -0,0 +1,103 @@
+#测试相关文章
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+
+from blog.models import Category, Post, Tag
+from blog.related import cache_key, get_related_posts, rebuild_related_posts, refresh_related_posts, tag_posts_key
+
+
+class RelatedPostsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate1 = Category.objects.create(name='测试分类一')
+        self.cate2 = Category.objects.create(name='测试分类二')
+        self.tag1 = Tag.objects.create(name='测试标签一')
+        self.tag2 = Tag.objects.create(name='测试标签二')
+
+        def create(title, category, *tags):
+            post = Post.objects.create(title=title, body='测试内容', category=category, author=user)
+            post.tags.add(*tags)
+            return post
+
+        self.post = create('文章', self.cate1, self.tag1, self.tag2)
+        self.both_tags = create('两个相同标签', self.cate2, self.tag1, self.tag2)
+        self.one_tag = create('一个相同标签', self.cate2, self.tag1)
+        self.same_category = create('相同分类', self.cate1)
+        self.unrelated = create('无关文章', self.cate2)
+
+    def related_pks(self, post):
+        return [pk for pk, title in get_related_posts(post.pk, post.category_id)]
+
+    def test_related_posts_ordering(self):
+        rebuild_related_posts()
+        self.assertEqual(
+            self.related_pks(self.post),
+            [self.both_tags.pk, self.one_tag.pk, self.same_category.pk],
+        )
+        self.assertEqual(self.related_pks(self.unrelated), [self.one_tag.pk, self.both_tags.pk])
+
+    def test_compute_on_cache_miss(self):
+        # 缓存中没有时不在请求中计算，返回空列表并加入后台任务（测试中同步执行）
+        cache.delete(cache_key(self.post.pk))
+        self.assertEqual(get_related_posts(self.post.pk, self.post.category_id), [])
+        self.assertIsNotNone(cache.get(cache_key(self.post.pk)))
+        self.assertEqual(self.related_pks(self.post)[0], self.both_tags.pk)
+
+        # 任务执行之前的其它请求不会重复加入任务
+        cache.delete(cache_key(self.post.pk))
+        with mock.patch('blog.related.enqueue') as enqueue, self.assertNumQueries(0):
+            self.assertEqual(get_related_posts(self.post.pk, self.post.category_id), [])
+        enqueue.assert_not_called()
+
+    def test_incremental_refresh(self):
+        rebuild_related_posts()
+        # 标签没有变化时只读取这篇文章、它的标签和它所在分类的最新文章，不读取全部文章和标签
+        with self.assertNumQueries(3):
+            refresh_related_posts(self.one_tag.pk)
+        # 倒排表被淘汰后从数据库重新读取
+        cache.delete(tag_posts_key(self.tag1.pk))
+        self.one_tag.tags.remove(self.tag1)
+        self.assertEqual(self.related_pks(self.post), [self.both_tags.pk, self.same_category.pk])
+        self.assertNotIn(self.one_tag.pk, cache.get(tag_posts_key(self.tag1.pk)))
+
+        # 增量更新的结果和全量重建一致
+        incremental = {post.pk: get_related_posts(post.pk, post.category_id) for post in Post.objects.all()}
+        cache.clear()
+        rebuild_related_posts()
+        self.assertEqual({post.pk: get_related_posts(post.pk, post.category_id) for post in Post.objects.all()}, incremental)
+
+    def test_refresh_on_change(self):
+        rebuild_related_posts()
+
+        # 标签变化后，原来与它相关的文章和现在与它相关的文章都会被刷新
+        self.both_tags.tags.clear()
+        self.assertNotIn(self.both_tags.pk, self.related_pks(self.post))
+        self.unrelated.tags.add(self.tag2)
+        self.assertIn(self.unrelated.pk, self.related_pks(self.post))
+
+        # 标题变化后相关文章列表中的标题也会更新
+        self.one_tag.title = '新标题'
+        self.one_tag.save()
+        self.assertIn([self.one_tag.pk, '新标题'], get_related_posts(self.post.pk, self.post.category_id))
+
+        self.same_category.delete()
+        self.assertNotIn(self.same_category.pk, self.related_pks(self.post))
+
+    def test_show_related_posts(self):
+        template = Template(
+            '{% load blog_extras %}'
+            '{% show_related_posts post %}'
+        )
+        html = template.render(Context({'post': self.post}))
+        self.assertInHTML('<h3 class="widget-title">相关文章</h3>', html)
+        self.assertInHTML('<a href="{}">{}</a>'.format(self.both_tags.get_absolute_url(), self.both_tags.title), html)
@@ -0,0 +1,80 @@
+#测试有时间和大小限制的 Markdown 渲染
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from blog import rendering
+from blog.models import Category, Post, RenderRecord
+from blog.rendering import check_limits, get_render_stats, render_markdown, shutdown_pool
+
+
+class RenderingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_render(self):
+        result = render_markdown('# 标题\n\n正文 **加粗**')
+        self.assertIn('<strong>加粗</strong>', result['content'])
+        self.assertIn('标题', result['toc'])
+        self.assertEqual(get_render_stats()['total'], 1)
+
+    def test_limits(self):
+        self.assertIsNone(check_limits('# 标题\n\n正文'))
+        self.assertIsNotNone(check_limits('## h\n\n' * (rendering.MAX_HEADINGS + 1)))
+        self.assertIsNotNone(check_limits('| a |\n' * (rendering.MAX_TABLE_ROWS + 1)))
+        self.assertIsNotNone(check_limits('```\n' + 'x\n' * (rendering.MAX_CODE_LINES + 1) + '```\n'))
+
+        # 超出限制时不渲染，返回转义后的正文
+        with self.assertLogs('blog.rendering', 'WARNING'):
+            result = render_markdown('<script>\n\n' + '## h\n\n' * (rendering.MAX_HEADINGS + 1), 'post:1')
+        self.assertTrue(result['content'].startswith('<p>&lt;script&gt;</p>'))
+        self.assertEqual(result['toc'], '')
+        stats = get_render_stats()
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual(stats['recent'][0]['name'], 'post:1')
+
+    def test_render_process(self):
+        self.addCleanup(shutdown_pool)
+        with override_settings(MARKDOWN_RENDER_TIMEOUT=30):
+            self.assertIn('<em>强调</em>', render_markdown('*强调*')['content'])
+
+    def test_timeout(self):
+        self.addCleanup(shutdown_pool)
+        # 连续的“[”在 Markdown 中解析得非常慢，在渲染进程中超时后返回转义后的正文
+        with override_settings(MARKDOWN_RENDER_TIMEOUT=1), self.assertLogs('blog.rendering', 'WARNING'):
+            result = render_markdown('[' * 20000, 'post:2')
+        self.assertEqual(result['content'], '<p>{}</p>'.format('[' * 20000))
+        self.assertIsNone(rendering._pool)
+        self.assertEqual(get_render_stats()['timeout'], 1)
+
+    def test_render_post_content(self):
+        user = User.objects.create_user('admin')
+        with self.assertLogs('blog.rendering', 'WARNING'):
+            post = Post.objects.create(
+                title='测试标题', body='## h\n\n' * (rendering.MAX_HEADINGS + 1),
+                category=Category.objects.create(name='测试分类'), author=user,
+            )
+        post.refresh_from_db()
+        self.assertTrue(post.rendered_body.startswith('<p>## h</p>'))
+
+    def test_command(self):
+        with self.assertLogs('blog.rendering', 'WARNING'):
+            render_markdown('## h\n\n' * (rendering.MAX_HEADINGS + 1), 'post:3')
+        out = StringIO()
+        call_command('render_stats', stdout=out)
+        self.assertIn('超出大小限制 1 次', out.getvalue())
+        self.assertIn('post:3', out.getvalue())
+
+    def test_recent_records_are_trimmed(self):
+        body = '## h\n\n' * (rendering.MAX_HEADINGS + 1)
+        with self.assertLogs('blog.rendering', 'WARNING'):
+            for i in range(rendering.RECENT_RENDERS + 5):
+                render_markdown(body, 'post:{}'.format(i))
+        stats = get_render_stats()
+        self.assertEqual(stats['rejected'], rendering.RECENT_RENDERS + 5)
+        self.assertEqual(RenderRecord.objects.count(), rendering.RECENT_RENDERS)
+        self.assertEqual(stats['recent'][0]['name'], 'post:{}'.format(rendering.RECENT_RENDERS + 4))
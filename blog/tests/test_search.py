@@ -0,0 +1,94 @@
+#测试搜索结果的高亮摘要
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase
+from django.urls import reverse
+
+from blog.models import Category, Post
+from blog.search import find_positions, make_snippet, parse_terms
+
+
+class SnippetTestCase(TestCase):
+    def test_parse_terms(self):
+        self.assertEqual(parse_terms(' django  博客 django '), ['django', '博客'])
+
+    def test_find_positions(self):
+        self.assertEqual(find_positions('Django django', ['DJANGO']), [(0, 6), (7, 13)])
+        # 重叠的位置只保留先出现的，长关键词优先
+        self.assertEqual(find_positions('djangoproject', ['djangoproject', 'project']), [(0, 13)])
+        # 'İ'.lower() 是两个字符，位置仍然是原文中的位置
+        text = 'İstanbul django'
+        self.assertEqual([text[start:end] for start, end in find_positions(text, ['django'])], ['django'])
+
+    def test_make_snippet(self):
+        text = 'a' * 100 + ' Django <b> ' + 'b' * 100
+        snippet = make_snippet(text, ['django'])
+        self.assertIn('<mark>Django</mark> &lt;b&gt;', snippet)
+        self.assertTrue(snippet.startswith('…'))
+        self.assertTrue(snippet.endswith('…'))
+        self.assertLess(len(snippet), 120)
+
+    def test_fragments(self):
+        text = ' '.join(['django'] + ['x' * 100] * 10 + ['django'] * 10)
+        snippet = make_snippet(text, ['django'])
+        self.assertEqual(snippet.count('<mark>'), 11)
+        self.assertEqual(snippet.count('…'), 2)
+
+    def test_no_match(self):
+        self.assertEqual(make_snippet('测试内容', ['django']), '测试内容')
+
+    def test_time_limit(self):
+        # 超时后仍然使用已经找到的位置
+        snippet = make_snippet('django ' * 1000, ['django'], time_limit=0)
+        self.assertIn('<mark>django</mark>', snippet)
+
+
+class SearchViewTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='测试分类')
+        self.post = Post.objects.create(
+            title='Django 教程',
+            body='# 标题\n\n使用 **Django** 开发博客',
+            category=self.cate,
+            author=self.user,
+        )
+        self.url = reverse('blog:search')
+
+    def test_plain_text_saved(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.plain_text, '标题 使用 Django 开发博客')
+
+    def test_highlight(self):
+        response = self.client.get(self.url, {'q': '开发 django'})
+        self.assertContains(response, '<mark>开发</mark>')
+        self.assertContains(response, '<a href="{}"><mark>Django</mark> 教程</a>'.format(self.post.get_absolute_url()), html=True)
+        # 摘要来自纯文本，不包含 Markdown 标记
+        self.assertNotContains(response, '**')
+
+    def test_all_terms_required(self):
+        response = self.client.get(self.url, {'q': 'django flask'})
+        self.assertEqual(list(response.context['post_list']), [])
+
+    def test_empty_query(self):
+        response = self.client.get(self.url, {'q': '  '})
+        self.assertRedirects(response, reverse('blog:index'))
+
+    def test_paginated(self):
+        for i in range(12):
+            Post.objects.create(title='教程{}'.format(i), body='内容', category=self.cate, author=self.user)
+        # 只检查传给模板的数据
+        with mock.patch('blog.views.render', return_value=HttpResponse()) as render:
+            self.client.get(self.url, {'q': '教程', 'page': 2})
+        context = render.call_args[0][2]
+        self.assertEqual(context['paginator'].count, 13)
+        self.assertEqual(context['page_obj'].number, 2)
+        self.assertEqual(len(context['post_list']), 3)
+        # 只为当前页的文章生成摘要
+        self.assertTrue(all(post.snippet for post in context['post_list']))
@@ -0,0 +1,110 @@
+#测试站点地图
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from blog.models import Category, Post, Tag
+
+
+def content_of(response):
+    if response.streaming:
+        return b''.join(response.streaming_content).decode('utf-8')
+    return response.content.decode('utf-8')
+
+
+class SitemapTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='测试分类')
+        self.tag = Tag.objects.create(name='测试标签')
+        self.posts = []
+        for i in range(3):
+            post = Post.objects.create(
+                title='测试标题{}'.format(i),
+                body='测试内容',
+                category=self.cate,
+                author=self.user,
+            )
+            post.tags.add(self.tag)
+            self.posts.append(post)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/xml; charset=utf-8')
+        return content_of(response)
+
+    @mock.patch('blog.sitemaps.SITEMAP_CHUNK_SIZE', 2)
+    def test_index_lists_chunks(self):
+        content = self.get(reverse('sitemap'))
+        self.assertIn('<sitemapindex', content)
+        self.assertIn('http://testserver/sitemap-pages.xml', content)
+        first = self.posts[0].pk
+        chunk = (first - 1) // 2
+        self.assertIn('http://testserver/sitemap-posts-{}.xml'.format(chunk), content)
+        # 三篇文章至少分成两块
+        self.assertGreaterEqual(content.count('sitemap-posts-'), 2)
+
+    def test_posts_chunk(self):
+        content = self.get(reverse('sitemap_posts', kwargs={'chunk': 0}))
+        for post in self.posts:
+            post.refresh_from_db()
+            self.assertIn('<loc>http://testserver{}</loc>'.format(post.get_absolute_url()), content)
+            self.assertIn('<lastmod>{}</lastmod>'.format(post.modified_time.isoformat()), content)
+
+    def test_empty_chunk_404(self):
+        response = self.client.get(reverse('sitemap_posts', kwargs={'chunk': 1000}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_pages(self):
+        content = self.get(reverse('sitemap_pages'))
+        self.assertIn(reverse('blog:index'), content)
+        self.assertIn(reverse('blog:category', kwargs={'pk': self.cate.pk}), content)
+        self.assertIn(reverse('blog:tag', kwargs={'pk': self.tag.pk}), content)
+        created_time = self.posts[0].created_time
+        self.assertIn(reverse('blog:archive', kwargs={
+            'year': created_time.year, 'month': created_time.month,
+        }), content)
+
+    def test_cached(self):
+        url = reverse('sitemap_posts', kwargs={'chunk': 0})
+        first = self.get(url)
+        # 缓存命中时只有检查这一块是否存在的一条查询
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(url), first)
+        index = self.get(reverse('sitemap'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(reverse('sitemap')), index)
+
+    def test_regenerated_after_post_changed(self):
+        url = reverse('sitemap_posts', kwargs={'chunk': 0})
+        self.get(url)
+        self.get(reverse('sitemap_pages'))
+        post = self.posts[0]
+        post.title = '新标题'
+        post.save()
+        post.refresh_from_db()
+        self.assertIn(post.modified_time.isoformat(), self.get(url))
+
+    @mock.patch('blog.sitemaps.SITEMAP_CHUNK_SIZE', 1)
+    def test_only_changed_chunk_regenerated(self):
+        urls = [reverse('sitemap_posts', kwargs={'chunk': post.pk - 1}) for post in self.posts]
+        for url in urls:
+            self.get(url)
+        post = self.posts[0]
+        post.title = '新标题'
+        post.save()
+        # 其它块仍然命中缓存
+        with self.assertNumQueries(1):
+            self.get(urls[1])
+        with self.assertNumQueries(2):
+            self.get(urls[0])
@@ -0,0 +1,87 @@
+#测试静态文件流水线
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from blog.storage import BundledManifestStaticFilesStorage, minify_css
+
+
+class MinifyCSSTestCase(SimpleTestCase):
+    def test_minify_css(self):
+        css = '/* 注释 */\n.post  .entry-title {\n    color: #333;\n    margin: 0 auto;\n}\n'
+        self.assertEqual(minify_css(css), '.post .entry-title{color: #333;margin: 0 auto}')
+
+    def test_strings_are_kept(self):
+        css = '.a:before { content: "a , b" ; }\n.b { background: url("x; y") ; }\n.c:after { content: \'/* x */ {}\' }'
+        self.assertEqual(
+            minify_css(css),
+            '.a:before{content: "a , b"}.b{background: url("x; y")}.c:after{content: \'/* x */ {}\'}',
+        )
+
+
+class StaticBundleTestCase(SimpleTestCase):
+    def render(self, name):
+        template = Template('{% load blog_extras %}{% static_bundle name %}')
+        return template.render(Context({'name': name}))
+
+    def test_sources_without_bundled_storage(self):
+        html = self.render('blog/css/site.bundle.css')
+        for source in settings.STATIC_BUNDLES['blog/css/site.bundle.css']:
+            self.assertInHTML('<link rel="stylesheet" href="/static/{}">'.format(source), html)
+
+    def test_collectstatic_with_bundled_storage(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with override_settings(
+                STATIC_ROOT=static_root,
+                STATICFILES_STORAGE='blog.storage.BundledManifestStaticFilesStorage'):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+            hashed_name = staticfiles_storage.stored_name('blog/js/head.bundle.js')
+            self.assertNotEqual(hashed_name, 'blog/js/head.bundle.js')
+            self.assertTrue(os.path.exists(os.path.join(static_root, hashed_name + '.gz')))
+            self.assertTrue(os.path.exists(os.path.join(static_root, hashed_name + '.br')))
+            self.assertInHTML('<script src="/static/{}"></script>'.format(hashed_name), self.render('blog/js/head.bundle.js'))
+
+            with open(os.path.join(static_root, staticfiles_storage.stored_name('blog/css/site.bundle.css'))) as f:
+                bundle = f.read()
+            self.assertNotIn('\n', bundle)
+            self.assertIn('.pace', bundle)
+
+    def test_manifest_has_bundles(self):
+        # 生产环境渲染 {% static_bundle %} 时从 manifest 查找合并文件的哈希文件名，缺少时会抛出 ValueError
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with override_settings(
+                STATIC_ROOT=static_root,
+                STATICFILES_STORAGE='blog.storage.BundledManifestStaticFilesStorage'):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            with open(os.path.join(static_root, staticfiles_storage.manifest_name)) as f:
+                manifest = json.load(f)
+            for name in settings.STATIC_BUNDLES:
+                self.assertIn(name, manifest['paths'])
+                self.assertTrue(os.path.exists(os.path.join(static_root, manifest['paths'][name])))
+                self.render(name)
+
+    def test_production_settings_use_bundled_storage(self):
+        # 部署时的 collectstatic 使用生产环境的配置（见 fabfile.py），才会生成合并文件和 manifest
+        code = 'from django.conf import settings; print(settings.STATICFILES_STORAGE)'
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR,
+            env=dict(
+                os.environ, DJANGO_SETTINGS_MODULE='blogproject.settings.production', DJANGO_SECRET_KEY='test',
+            ),
+        )
+        storage = output.decode('utf-8').strip()
+        self.assertEqual(storage, '{}.{}'.format(
+            BundledManifestStaticFilesStorage.__module__, BundledManifestStaticFilesStorage.__name__,
+        ))
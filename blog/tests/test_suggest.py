@@ -0,0 +1,92 @@
+#测试搜索输入提示
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from blog import suggest
+from blog.models import Category, Post, Tag
+from blog.suggest import PrefixIndex, prefix_keys
+
+
+class PrefixIndexTestCase(TestCase):
+    def test_prefix_keys(self):
+        self.assertEqual(
+            prefix_keys('Django 博客教程'),
+            {'django 博客教程', '博客教程', '客教程', '教程', '程'},
+        )
+        # 全角字符和大小写统一
+        self.assertEqual(prefix_keys('ＰＹＴＨＯＮ'), {'python'})
+
+    def test_search(self):
+        index = PrefixIndex()
+        index.add('post', 1, 'Django 博客教程', '/posts/1/')
+        index.add('post', 2, '博客部署', '/posts/2/')
+        index.add('tag', 1, 'Django', '/tags/1/')
+        self.assertEqual([r['title'] for r in index.search('博客')], ['博客部署', 'Django 博客教程'])
+        self.assertEqual([r['title'] for r in index.search('教程')], ['Django 博客教程'])
+        self.assertEqual([r['type'] for r in index.search('DJ')], ['post', 'tag'])
+        self.assertEqual(index.search(' '), [])
+        self.assertEqual(index.search('flask'), [])
+
+        index.add('post', 1, 'Flask 教程', '/posts/1/')
+        self.assertEqual(index.search('django'), [{'type': 'tag', 'title': 'Django', 'url': '/tags/1/'}])
+        index.remove('post', 2)
+        self.assertEqual(index.search('博客'), [])
+        self.assertEqual(len(index), 2)
+
+    def test_limit(self):
+        index = PrefixIndex()
+        index.bulk_load([('post', i, '教程{}'.format(i), '/posts/{}/'.format(i)) for i in range(100)])
+        self.assertEqual(len(index.search('教程', limit=5)), 5)
+
+
+class SuggestViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        suggest.invalidate_index()
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='教程')
+        self.post = Post.objects.create(title='Django 博客教程', body='测试内容', category=self.cate, author=self.user)
+        self.url = reverse('blog:suggest')
+
+    def titles(self, q):
+        response = self.client.get(self.url, {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.json()['results']]
+
+    def test_no_queries(self):
+        self.assertEqual(self.titles('博客'), ['Django 博客教程'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('教程'), ['教程', 'Django 博客教程'])
+
+    def test_incremental_update(self):
+        self.titles('博客')
+        self.post.title = 'Flask 入门'
+        self.post.save()
+        Tag.objects.create(name='博客')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('博客'), ['博客'])
+            self.assertEqual(self.titles('flask'), ['Flask 入门'])
+
+        # 草稿不出现在提示中
+        self.post.status = Post.DRAFT
+        self.post.save()
+        self.assertEqual(self.titles('flask'), [])
+
+    def test_rebuild_after_other_process_changed(self):
+        self.titles('博客')
+        # 模拟其它进程修改了数据：数据库变化且版本号更新，本进程的索引没有收到信号
+        Post.objects.filter(pk=self.post.pk).update(title='Flask 入门')
+        cache.set(suggest.SUGGEST_VERSION_KEY, 'other')
+        self.assertEqual(self.titles('flask'), [])
+        with mock.patch('blog.suggest.time.monotonic', return_value=time.monotonic() + suggest.SUGGEST_CHECK_INTERVAL):
+            self.assertEqual(self.titles('flask'), ['Flask 入门'])
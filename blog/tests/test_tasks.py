@@ -0,0 +1,114 @@
+#测试后台任务队列
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from blog import tasks
+from blog.models import Category, Post, Task, generate_rich_content, render_post_content
+
+calls = []
+
+
+def record_call(*args):
+    calls.append(args)
+
+
+def always_fail():
+    raise ValueError('任务失败')
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=False)
+class TaskQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_deduplicate(self):
+        task = tasks.enqueue(record_call, 1)
+        self.assertEqual(task.name, 'blog.tests.test_tasks.record_call')
+        self.assertIsNone(tasks.enqueue(record_call, 1))
+        tasks.enqueue(record_call, 2)
+        self.assertEqual(Task.objects.count(), 2)
+
+        # 正在执行的任务不参与去重
+        Task.objects.filter(pk=task.pk).update(status=Task.RUNNING, started_time=timezone.now())
+        self.assertIsNotNone(tasks.enqueue(record_call, 1))
+
+    def test_work(self):
+        tasks.enqueue(record_call, 1, 'a')
+        tasks.enqueue(record_call, 2, 'b')
+        self.assertEqual(tasks.work(once=True), (2, 0))
+        self.assertEqual(calls, [(1, 'a'), (2, 'b')])
+        self.assertFalse(Task.objects.exists())
+
+    def test_retry_then_fail(self):
+        tasks.enqueue(always_fail)
+        self.assertEqual(tasks.work(once=True), (0, 1))
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('任务失败', task.last_error)
+        self.assertGreater(task.run_at, timezone.now())
+
+        for _ in range(tasks.MAX_ATTEMPTS - 1):
+            self.assertIsNotNone(tasks.claim(now=timezone.now() + timedelta(days=1)))
+            Task.objects.update(status=Task.PENDING, run_at=timezone.now())
+        task = tasks.claim()
+        self.assertFalse(tasks.run_task(task))
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        self.assertIsNone(tasks.claim())
+
+    def test_reclaim_stale_task(self):
+        tasks.enqueue(record_call, 1)
+        self.assertIsNotNone(tasks.claim())
+        self.assertIsNone(tasks.claim())
+        self.assertIsNotNone(tasks.claim(now=timezone.now() + tasks.TASK_TIMEOUT + timedelta(seconds=1)))
+
+    def test_post_save_renders_in_background(self):
+        user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        post = Post.objects.create(
+            title='测试标题', body='# 标题', category=Category.objects.create(name='测试分类'), author=user,
+        )
+        self.assertEqual(Post.objects.get(pk=post.pk).rendered_body, '')
+        self.assertTrue(Task.objects.filter(name='blog.models.render_post_content').exists())
+
+        # 渲染完成之前读取时不即时渲染，正文为 null 并标记为 pending
+        response = self.client.get(reverse('api:post_detail', kwargs={'pk': post.pk}), {'fields': 'body_html'})
+        self.assertIsNone(response.json()['result']['body_html'])
+        self.assertTrue(response.json()['result']['pending'])
+
+        tasks.work(once=True)
+        self.assertHTMLEqual(Post.objects.get(pk=post.pk).rendered_body, '<h1 id="标题">标题</h1>')
+
+        # 只修改标题不需要重新渲染
+        post.title = '新标题'
+        post.save()
+        self.assertFalse(Task.objects.filter(name='blog.models.render_post_content').exists())
+
+        # 渲染期间只修改了状态等其它字段时，不会有新的任务，渲染结果仍然保存
+        post.body = '新内容'
+        post.save()
+
+        def save_during_render(body, name=''):
+            Post.objects.filter(pk=post.pk).update(modified_time=timezone.now() + timedelta(seconds=1))
+            return generate_rich_content(body, name)
+
+        with mock.patch('blog.models.generate_rich_content', side_effect=save_during_render):
+            render_post_content(post.pk)
+        self.assertHTMLEqual(Post.objects.get(pk=post.pk).rendered_body, '<p>新内容</p>')
+
+        # 渲染期间正文又被修改时不保存过期的结果，由修改正文时加入的任务重新渲染
+        def edit_during_render(body, name=''):
+            Post.objects.filter(pk=post.pk).update(body='更新的内容', rendered_body='')
+            return generate_rich_content(body, name)
+
+        with mock.patch('blog.models.generate_rich_content', side_effect=edit_during_render):
+            render_post_content(post.pk)
+        self.assertEqual(Post.objects.get(pk=post.pk).rendered_body, '')
@@ -0,0 +1,76 @@
+#测试热门文章
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Category, Post, PostViewCount
+from blog.trending import rollup, top_posts
+
+
+class TrendingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        cate = Category.objects.create(name='测试')
+        self.post1 = Post.objects.create(title='测试标题一', body='测试内容', category=cate, author=user)
+        self.post2 = Post.objects.create(title='测试标题二', body='测试内容', category=cate, author=user)
+        self.now = timezone.now()
+
+    def test_increase_views_records_hourly_bucket(self):
+        self.post1.increase_views()
+        self.post1.increase_views()
+        bucket = PostViewCount.objects.get(post=self.post1)
+        self.assertEqual(bucket.period, PostViewCount.HOUR)
+        self.assertEqual(bucket.count, 2)
+
+    def test_top_posts_by_window(self):
+        PostViewCount.record(self.post1.pk, count=3, now=self.now)
+        PostViewCount.record(self.post2.pk, count=5, now=self.now - timedelta(days=3))
+        self.assertEqual([p['id'] for p in top_posts('day', now=self.now)], [self.post1.pk])
+        self.assertEqual([p['id'] for p in top_posts('week', now=self.now)], [self.post2.pk, self.post1.pk])
+        self.assertEqual(top_posts('week', num=1, now=self.now)[0]['views'], 5)
+
+    def test_top_posts_skip_unpublished(self):
+        PostViewCount.record(self.post1.pk, count=5, now=self.now)
+        PostViewCount.record(self.post2.pk, count=1, now=self.now)
+        Post.objects.filter(pk=self.post1.pk).update(status=Post.DRAFT)
+        # 阅读量最高的是草稿，仍然返回 num 篇已发布的文章
+        self.assertEqual([p['id'] for p in top_posts('day', num=1, now=self.now)], [self.post2.pk])
+
+    def test_rollup(self):
+        PostViewCount.record(self.post1.pk, count=2, now=self.now - timedelta(days=3, hours=1))
+        PostViewCount.record(self.post1.pk, count=3, now=self.now - timedelta(days=3))
+        PostViewCount.record(self.post1.pk, count=1, now=self.now)
+        PostViewCount.record(self.post2.pk, count=1, now=self.now - timedelta(days=40))
+        merged, expired = rollup(now=self.now)
+        self.assertEqual(expired, 1)
+        self.assertEqual(PostViewCount.objects.filter(period=PostViewCount.HOUR).count(), 1)
+        self.assertEqual(sum(PostViewCount.objects.filter(period=PostViewCount.DAY).values_list('count', flat=True)), 5)
+        self.assertEqual(top_posts('month', now=self.now)[0]['views'], 6)
+
+    def test_show_trending_posts(self):
+        PostViewCount.record(self.post1.pk, count=3)
+        template = Template(
+            '{% load blog_extras %}'
+            '{% show_trending_posts %}'
+        )
+        html = template.render(Context())
+        self.assertInHTML('<h3 class="widget-title">热门文章</h3>', html)
+        self.assertInHTML('<a href="{}">{}</a>'.format(self.post1.get_absolute_url(), self.post1.title), html)
+
+    def test_json_endpoint(self):
+        PostViewCount.record(self.post2.pk, count=3)
+        response = self.client.get(reverse('blog:trending'), {'window': 'day'})
+        self.assertEqual(response.json()['posts'][0]['id'], self.post2.pk)
+        response = self.client.get(reverse('blog:trending'), {'window': 'year'})
+        self.assertEqual(response.status_code, 400)
@@ -101,11 +101,14 @@ class PostDetailViewTestCase(BlogDataTestCase):
         self.assertEqual(response.status_code, 404)
 
     def test_increase_views(self):
+        # 阅读量由页面加载后发送的请求统计，访问详情页本身不计入
+        view_url = reverse('blog:view', kwargs={'pk': self.md_post.pk})
         self.client.get(self.url)
+        self.client.post(view_url)
         self.md_post.refresh_from_db()
         self.assertEqual(self.md_post.views, 1)
 
-        self.client.get(self.url)
+        self.client.post(view_url)
         self.md_post.refresh_from_db()
         self.assertEqual(self.md_post.views, 2)
 
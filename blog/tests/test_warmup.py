@@ -0,0 +1,116 @@
+#测试缓存预热
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from blog.feeds import FEED_CACHE_KEY
+from blog.models import Category, Post, Tag
+from blog.related import cache_key
+from blog.sidebar import SIDEBAR_CACHE_KEY, get_categories, get_recent_posts
+from blog.warmup import warm_caches, warm_templates
+
+
+class WarmupTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.cate = Category.objects.create(name='测试分类')
+        self.tag = Tag.objects.create(name='测试标签')
+        self.post = Post.objects.create(
+            title='测试标题',
+            body='测试内容',
+            category=self.cate,
+            author=self.user,
+        )
+        self.post.tags.add(self.tag)
+
+    def test_warm_caches(self):
+        cache.clear()
+        report = warm_caches()
+        self.assertEqual(report['failed'], [])
+        self.assertEqual(report['posts'], 1)
+        # 首页、RSS 和文章详情页
+        self.assertEqual(report['pages'], 3)
+        self.assertGreater(report['templates'], 0)
+        for key in (SIDEBAR_CACHE_KEY.format('categories'), FEED_CACHE_KEY, cache_key(self.post.pk)):
+            self.assertIsNotNone(cache.get(key))
+        self.assertGreaterEqual(report['keys'], 3)
+
+        # 预渲染不计入阅读量
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+
+    def test_render_missing_content(self):
+        Post.objects.filter(pk=self.post.pk).update(rendered_body='', rendered_toc='')
+        warm_caches()
+        self.post.refresh_from_db()
+        self.assertHTMLEqual(self.post.rendered_body, '<p>测试内容</p>')
+
+    def test_warm_templates(self):
+        self.assertGreaterEqual(warm_templates(), 4)
+
+    def test_sidebar_invalidated_on_change(self):
+        self.assertEqual([p.title for p in get_recent_posts()], ['测试标题'])
+        self.assertEqual([c.num_posts for c in get_categories()], [1])
+
+        Post.objects.create(title='新文章', body='新内容', category=self.cate, author=self.user)
+        self.assertEqual([p.title for p in get_recent_posts()], ['新文章', '测试标题'])
+        self.assertEqual([c.num_posts for c in get_categories()], [2])
+
+        self.cate.name = '新分类'
+        self.cate.save()
+        self.assertEqual([c.name for c in get_categories()], ['新分类'])
+
+        # 只修改阅读量不会清除侧边栏缓存
+        get_recent_posts()
+        self.post.increase_views()
+        self.assertIsNotNone(cache.get(SIDEBAR_CACHE_KEY.format('recent')))
+
+    def test_feed_conditional_get(self):
+        response = self.client.get(reverse('rss'))
+        self.assertIn('[测试分类] 测试标题', b''.join(response.streaming_content).decode('utf-8'))
+        # 内容没有变化时不查询数据库，直接返回 304
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('rss'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        # 分类改名会改变条目标题，RSS 的 ETag 随之变化
+        etag = response['ETag']
+        self.cate.name = '新分类'
+        self.cate.save()
+        response = self.client.get(reverse('rss'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('[新分类] 测试标题', b''.join(response.streaming_content).decode('utf-8'))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('warm_cache', stdout=out)
+        self.assertIn('缓存预热完成', out.getvalue())
+
+
+class StartupImportsTestCase(SimpleTestCase):
+    def test_lazy_imports(self):
+        # 在新的进程中启动应用，渲染 Markdown 和预热用到的重量级模块不应该被导入
+        code = (
+            'import json, sys; import blogproject.wsgi; '
+            'print(json.dumps([name for name in ("markdown", "django.test", "blog.viewsold") if name in sys.modules]))'
+        )
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE),
+        )
+        self.assertEqual(json.loads(output.decode('utf-8').strip().splitlines()[-1]), [])
@@ -0,0 +1,91 @@
+# 热门文章：根据 PostViewCount 中按时间分桶的阅读量统计一段时间内阅读量最高的文章。
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Post, PostViewCount
+
+# 支持的统计窗口
+WINDOWS = {
+    'day': timedelta(days=1),
+    'week': timedelta(days=7),
+    'month': timedelta(days=30),
+}
+
+# 最近 HOURLY_RETENTION 内的阅读量保留小时粒度，24 小时窗口的统计因此是精确的
+HOURLY_RETENTION = timedelta(days=2)
+
+TRENDING_CACHE_KEY = 'blog:trending:{}:{}'
+TRENDING_CACHE_TIMEOUT = 10 * 60
+
+
+def top_posts(window='week', num=5, now=None):
+    """
+    统计窗口内阅读量最高的 num 篇文章，返回 [{'id', 'title', 'url', 'views'}, ...]。
+
+    先在数据库中按文章汇总窗口内各个桶的阅读量，再用堆取出前 num 篇，不需要对全部文章排序。
+    汇总时就只统计已发布的文章，草稿、定时发布的文章阅读量再高也不会占用名额，总能取满 num 篇（文章足够多时）。
+    天桶只统计完全落在窗口内的，因此一周、一月的统计会少算窗口最早那一天的部分阅读量。
+    """
+    since = (now or timezone.now()) - WINDOWS[window]
+    totals = (
+        PostViewCount.objects
+        .filter(start__gte=since, post__status=Post.PUBLISHED)
+        .values_list('post_id')
+        .annotate(total=Sum('count'))
+        .order_by()
+    )
+    top = heapq.nlargest(num, totals, key=lambda item: item[1])
+
+    titles = dict(Post.objects.filter(pk__in=[pk for pk, _ in top]).values_list('pk', 'title'))
+    return [
+        {
+            'id': pk,
+            'title': titles[pk],
+            'url': reverse('blog:detail', kwargs={'pk': pk}),
+            'views': total,
+        }
+        for pk, total in top if pk in titles
+    ]
+
+
+def get_trending_posts(window='week', num=5):
+    """
+    带缓存的 top_posts，热门文章不需要实时准确，缓存 TRENDING_CACHE_TIMEOUT 秒。
+    """
+    key = TRENDING_CACHE_KEY.format(window, num)
+    posts = cache.get(key)
+    if posts is None:
+        posts = top_posts(window, num)
+        cache.set(key, posts, TRENDING_CACHE_TIMEOUT)
+    return posts
+
+
+def rollup(now=None):
+    """
+    把 HOURLY_RETENTION 之前的小时桶合并为天桶（按当前时区的自然日），并删除超出最长统计窗口的数据。
+    返回 (合并的小时桶数量, 删除的过期天桶数量)。
+    """
+    now = now or timezone.now()
+    cutoff = now - HOURLY_RETENTION
+
+    # 新的访问只会写入当前小时的桶，cutoff 之前的小时桶在合并期间不会再变化
+    hourly = PostViewCount.objects.filter(period=PostViewCount.HOUR, start__lt=cutoff)
+    days = defaultdict(int)
+    for post_id, start, count in hourly.values_list('post_id', 'start', 'count').iterator():
+        day = timezone.localtime(start).replace(hour=0, minute=0, second=0, microsecond=0)
+        days[post_id, day] += count
+
+    with transaction.atomic():
+        for (post_id, day), count in days.items():
+            PostViewCount.add(post_id, PostViewCount.DAY, day, count)
+        merged, _ = hourly.delete()
+
+    expired, _ = PostViewCount.objects.filter(start__lt=now - max(WINDOWS.values())).delete()
+    return merged, expired
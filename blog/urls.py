@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import viewsold, views
+from . import views
 
 # 我们首先从 django.urls 导入了 path 函数，又从当前目录下导入了 views 模块。然后我们把网址和处理函数的关系写在了 urlpatterns 列表里。
 # 绑定关系的写法是把网址和对应的处理函数作为参数传给 path 函数（第一个参数是网址，第二个参数是处理函数），另外我们还传递了另外一个参数 name，这个参数的值将作为处理函数 index 的别名，这在以后会用到。
@@ -21,8 +21,13 @@ app_name='blog'
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('posts/<int:pk>/', views.PostDetailView.as_view(), name='detail'),
+    path('posts/<int:pk>/view/', views.record_view, name='view'),
     path('archives/<int:year>/<int:month>/', views.ArchiveView.as_view(), name='archive'),
     path('categories/<int:pk>/', views.CategoryView.as_view(), name='category'),
     path('tags/<int:pk>/', views.TagView.as_view(), name='tag'),
     path('search/', views.search, name='search'),
+    path('search/suggest/', views.search_suggest, name='suggest'),
+    path('trending/', views.trending, name='trending'),
+    path('authors/', views.author_list, name='authors'),
+    path('authors/<int:pk>/', views.author_detail, name='author'),
 ]
\ No newline at end of file
@@ -1,29 +1,48 @@
-import re
-
-import markdown
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.generic import ListView
-from markdown.extensions.toc import TocExtension
-from django.utils.text import slugify
-from pure_pagination import PaginationMixin
-
-from .models import Post, Category, Tag
-from blog.models import Post, Category
-
-from django.views.generic import ListView, DetailView
-
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.views.generic import DetailView, ListView
+from pure_pagination import EmptyPage, PageNotAnInteger, PaginationMixin, Paginator
+
+from comments.models import Comment
+from .http_cache import (
+    AUTHORS_KEY, JSON, PAGE, SEARCH, add_surrogate_keys, author_key, cache_policy, category_key, post_key, tag_key,
+)
+from .models import AuthorStats, Post, Category, Tag
+from .paginator import InvalidCursor, keyset_page
+from .search import annotate_results, parse_terms, search_posts
+from .suggest import suggest
+from .trending import WINDOWS, get_trending_posts
+
+# 页面的缓存策略和 Surrogate-Key 见 blog/http_cache.py，子类继承 dispatch 上的装饰器
+@method_decorator(cache_policy(PAGE), name='dispatch')
 class IndexView(PaginationMixin,ListView):
     # model。将 model 指定为 Post，告诉 django 我要获取的模型是 Post。
     # template_name。指定这个视图渲染的模板。
     # context_object_name。指定获取的模型列表数据保存的变量名，这个变量会被传递给模板。
     model = Post
+    # Post 的默认 Manager 包含草稿，公开的页面只显示已发布的文章（见 blog/models.py 中的 PublishedManager）
+    queryset = Post.objects.all()
     template_name = 'blog/index.html'
     context_object_name = 'post_list'
     # 指定 paginate_by 属性后开启分页功能，其值代表每一页包含多少篇文章
     paginate_by = 10
 
+    def get_queryset(self):
+        # 列表中显示每篇文章的分类和作者，一并查询出来，避免每篇文章再各查询一次
+        return super().get_queryset().select_related('category', 'author')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # 这一页显示的文章被修改时需要清除这个页面的缓存
+        add_surrogate_keys(self.request, *(post_key(post.pk) for post in context['post_list']))
+        return context
+
 
 class CategoryView(IndexView):
     # model = Post
@@ -32,6 +51,7 @@ class CategoryView(IndexView):
 
     def get_queryset(self):
         cate = get_object_or_404(Category, pk=self.kwargs.get('pk'))
+        add_surrogate_keys(self.request, category_key(cate.pk))
         return super(CategoryView, self).get_queryset().filter(category=cate)
 
 class TagView(IndexView):
@@ -40,6 +60,7 @@ class TagView(IndexView):
     context_object_name = 'post_list'
     def get_queryset(self):
         t = get_object_or_404(Tag, pk=self.kwargs.get('pk'))
+        add_surrogate_keys(self.request, tag_key(t.pk))
         return super(TagView, self).get_queryset().filter(tags=t)
 
 
@@ -53,49 +74,151 @@ class ArchiveView(IndexView):
         return super().get_queryset().filter(created_time__year=year, created_time__month=month)
         # return super(ArchiveView, self).get_queryset().filter(created_time__year=year,created_time__month=month)
 
+@method_decorator(cache_policy(PAGE), name='dispatch')
 class PostDetailView(DetailView):
     # 这些属性的含义和 ListView 是一样的
     model = Post
+    queryset = Post.objects.all()
     template_name = 'blog/detail.html'
     context_object_name = 'post'
 
+    def get_queryset(self):
+        # 模板中文章的标题、正文和目录都放在片段缓存中（见 templates/blog/detail.html），缓存命中时用不到正文，
+        # 因此推迟加载正文相关的大字段，只有缓存未命中时才会再查询一次；
+        # 分类和作者随文章一起查询，评论数量也用聚合一起查出，模板中不需要再单独查询；
+        # 聚合不经过 Comment 的默认 Manager，需要自己过滤掉等待审核的评论
+        return (
+            super().get_queryset()
+            .select_related('category', 'author')
+            .defer('body', 'rendered_body', 'rendered_toc', 'plain_text')
+            .annotate(num_comments=Count('comment', filter=Q(comment__status=Comment.APPROVED)))
+        )
+
     def get(self, request, *args, **kwargs):
-        # 覆写 get 方法的目的是因为每当文章被访问一次，就得将文章阅读量 +1
+        # 覆写 get 方法的目的是为响应加上这篇文章的 Surrogate-Key
         # get 方法返回的是一个 HttpResponse 实例
         # 之所以需要先调用父类的 get 方法，是因为只有当 get 方法被调用后，
         # 才有 self.object 属性，其值为 Post 模型实例，即被访问的文章 post
         response = super(PostDetailView, self).get(request, *args, **kwargs)
+        # 标签改名时侧边栏的标签云也会变化，由 sidebar 键清除，这里不需要再查询文章的标签
+        add_surrogate_keys(request, post_key(self.object.pk), category_key(self.object.category_id))
 
-        # 将文章阅读量 +1
-        # 注意 self.object 的值就是被访问的文章 post
-        self.object.increase_views()
+        # 详情页会被共享缓存保存，缓存命中的访问不会到达这里，阅读量由页面加载后发送的请求统计，见 record_view
 
         # 视图必须返回一个 HttpResponse 对象
         return response
 
-    def get_object(self, queryset=None):
-        # 覆写 get_object 方法的目的是因为需要对 post 的 body 值进行渲染
-        post = super().get_object(queryset=None)
-        md = markdown.Markdown(extensions=[
-            'markdown.extensions.extra',
-            'markdown.extensions.codehilite',
-            # 记得在顶部引入 TocExtension 和 slugify
-            TocExtension(slugify=slugify),
-        ])
-        post.body = md.convert(post.body)
 
-        m = re.search(r'<div class="toc">\s*<ul>(.*)</ul>\s*</div>', md.toc, re.S)
-        post.toc = m.group(1) if m is not None else ''
+# 统计文章阅读量。详情页由 CDN 等共享缓存直接返回时请求不会到达 django，因此由页面中的 script.js 在加载后
+# 用 navigator.sendBeacon 请求这个地址，每次真实的访问都计入阅读量；静态导出的页面同样会发送这个请求。
+# 这个请求不代表访问者做任何操作，不需要 CSRF token；响应不能被缓存
+@csrf_exempt
+@require_POST
+def record_view(request, pk):
+    post = get_object_or_404(Post.objects.only('pk', 'views', 'author_id'), pk=pk)
+    post.increase_views()
+    response = HttpResponse(status=204)
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+# 搜索结果每页的文章数
+SEARCH_PAGE_SIZE = 10
 
-        return post
 
+@cache_policy(SEARCH)
 def search(request):
     q = request.GET.get('q')
+    terms = parse_terms(q or '')
 
-    if not q:
+    if not terms:
         error_msg = "请输入搜索关键词"
         messages.add_message(request, messages.ERROR, error_msg, extra_tags='danger')
         return redirect('blog:index')
 
-    post_list = Post.objects.filter(Q(title__icontains=q) | Q(body__icontains=q))
-    return render(request, 'blog/index.html', {'post_list': post_list})
\ No newline at end of file
+    # 只为当前页的文章生成高亮的标题和摘要，见 blog/search.py
+    queryset = search_posts(terms).select_related('category', 'author').defer('rendered_body', 'rendered_toc')
+    paginator = Paginator(queryset, SEARCH_PAGE_SIZE, request=request)
+    try:
+        page_obj = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page_obj = paginator.page(1)
+    except EmptyPage:
+        page_obj = paginator.page(paginator.num_pages)
+    post_list = annotate_results(list(page_obj.object_list), terms)
+    add_surrogate_keys(request, *(post_key(post.pk) for post in post_list))
+    return render(request, 'blog/index.html', {
+        'post_list': post_list,
+        'page_obj': page_obj,
+        'paginator': paginator,
+        'is_paginated': page_obj.has_other_pages(),
+        'q': q,
+    })
+
+
+# 搜索框的输入提示，例如 /search/suggest/?q=djan。结果从每个进程内存中的前缀索引读取，不查询数据库，见 blog/suggest.py
+@cache_policy(JSON)
+def search_suggest(request):
+    q = request.GET.get('q', '')[:50]
+    return JsonResponse({'q': q, 'results': suggest(q)})
+
+
+# 热门文章的 JSON 接口，例如 /trending/?window=day&num=10
+@cache_policy(JSON)
+def trending(request):
+    window = request.GET.get('window', 'week')
+    if window not in WINDOWS:
+        return JsonResponse({'error': 'window 必须是 {} 之一'.format('、'.join(WINDOWS))}, status=400)
+    try:
+        num = min(max(int(request.GET.get('num', 5)), 1), 50)
+    except ValueError:
+        return JsonResponse({'error': 'num 必须是整数'}, status=400)
+    return JsonResponse({'window': window, 'posts': get_trending_posts(window, num)})
+
+
+# 作者列表和作者页面每页的数量
+AUTHOR_PAGE_SIZE = 20
+AUTHOR_POSTS_PAGE_SIZE = 10
+
+
+def _keyset_page(request, queryset, ordering, per_page):
+    # 游标分页，地址中的 cursor 参数无效时返回 404，见 blog/paginator.py
+    try:
+        return keyset_page(queryset, ordering, per_page, request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('无效的 cursor')
+
+
+# 作者列表，按最新文章的时间倒序。文章数、总阅读量和最新文章时间都读取 AuthorStats 中维护好的统计数据，不查询文章表
+@cache_policy(PAGE)
+def author_list(request):
+    queryset = AuthorStats.objects.filter(num_posts__gt=0).select_related('user')
+    page_obj = _keyset_page(request, queryset, ('-latest_post_time', '-pk'), AUTHOR_PAGE_SIZE)
+    add_surrogate_keys(request, AUTHORS_KEY)
+    return render(request, 'blog/authors.html', {'author_list': page_obj.object_list, 'page_obj': page_obj})
+
+
+# 作者页面，例如 /authors/1/。文章按 (created_time, id) 做游标分页，走 Post 上 (status, author, created_time, id) 索引，
+# 只读取这一页的文章；评论数也只统计这一页的文章，不在查询文章时 GROUP BY
+@cache_policy(PAGE)
+def author_detail(request, pk):
+    stats = get_object_or_404(AuthorStats.objects.select_related('user'), pk=pk, num_posts__gt=0)
+    queryset = (
+        Post.objects.filter(author_id=pk)
+        .select_related('category')
+        .defer('body', 'rendered_body', 'rendered_toc', 'plain_text')
+    )
+    page_obj = _keyset_page(request, queryset, ('-created_time', '-id'), AUTHOR_POSTS_PAGE_SIZE)
+    counts = dict(
+        Comment.objects.filter(post__in=page_obj.object_list)
+        .order_by().values('post').annotate(n=Count('pk')).values_list('post', 'n')
+    )
+    for post in page_obj:
+        post.num_comments = counts.get(post.pk, 0)
+    add_surrogate_keys(request, author_key(pk), *(post_key(post.pk) for post in page_obj))
+    return render(request, 'blog/author.html', {
+        'author': stats.user,
+        'stats': stats,
+        'post_list': page_obj.object_list,
+        'page_obj': page_obj,
+    })
@@ -0,0 +1,136 @@
+# 部署后的缓存预热。部署完成后第一批访问者会同时遇到冷缓存：侧边栏聚合、相关文章、热门文章、RSS 和模板编译
+# 都要在他们的请求中完成，响应时间明显变慢。预热在重新启动应用之前把这些数据提前算好写入缓存（生产环境是多个进程
+# 共享的文件缓存），并编译一遍全部模板，模板中有语法错误时部署在重新启动应用之前就会停下来。
+# 编译好的模板只保存在编译它的进程中，部署命令的进程结束后就没有了，因此每个应用进程启动时还会各自调用一次
+# warm_templates，见 blogproject/wsgi.py 和 blogproject/asgi.py。
+import os
+import time
+
+from django.core.cache import caches
+from django.db.models import Q
+from django.template import engines
+from django.urls import reverse
+
+from .feeds import get_feed_state, invalidate_feed
+from .models import Post, render_post_content
+from .related import rebuild_related_posts
+from .sidebar import warm_sidebar
+from .trending import TRENDING_CACHE_KEY, WINDOWS, get_trending_posts
+
+# 预渲染详情页的热门文章数量
+HOT_POSTS_NUM = 20
+
+TEMPLATE_EXTENSIONS = ('.html', '.xml', '.txt')
+
+
+class CacheWriteRecorder:
+    """
+    记录预热期间写入缓存的键，用于统计预热填充了多少缓存。
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.keys = set()
+
+    def __enter__(self):
+        cache = self.cache
+        set_, add, set_many = cache.set, cache.add, cache.set_many
+
+        def record_set(key, *args, **kwargs):
+            self.keys.add(key)
+            return set_(key, *args, **kwargs)
+
+        def record_add(key, *args, **kwargs):
+            added = add(key, *args, **kwargs)
+            if added:
+                self.keys.add(key)
+            return added
+
+        def record_set_many(data, *args, **kwargs):
+            self.keys.update(data)
+            return set_many(data, *args, **kwargs)
+
+        cache.set, cache.add, cache.set_many = record_set, record_add, record_set_many
+        return self
+
+    def __exit__(self, *exc_info):
+        # 删除实例属性后恢复为类上定义的方法
+        for name in ('set', 'add', 'set_many'):
+            delattr(self.cache, name)
+
+
+def warm_templates():
+    """
+    编译项目模板目录下的全部模板，返回模板数量。
+
+    DEBUG 为 False 时 django 使用 cached.Loader，编译后的模板保存在当前进程中，之后的请求不再需要读取和解析模板文件；
+    模板中有语法错误时这里会直接抛出异常，不会等到访问者打开页面时才发现。
+    """
+    engine = engines['django'].engine
+    count = 0
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if not filename.endswith(TEMPLATE_EXTENSIONS):
+                    continue
+                name = os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+                engine.get_template(name)
+                count += 1
+    return count
+
+
+def hot_posts(num=HOT_POSTS_NUM):
+    """
+    需要预渲染的文章：最近一周阅读量最高的文章以及最新发布的文章，它们最可能在部署后马上被访问。
+    """
+    pks = [post['id'] for post in get_trending_posts('week', num)]
+    pks += Post.objects.order_by('-created_time').values_list('pk', flat=True)[:num]
+    return list(dict.fromkeys(pks))
+
+
+def render_missing_content():
+    """
+    为还没有渲染结果的文章渲染 Markdown，返回文章数量。正常情况下保存文章后由后台任务渲染，
+    这里处理的是还在队列中的文章，以及绕过 save 方法写入数据库的文章（例如 QuerySet.update 或者直接导入的数据）。
+    """
+    pks = list(Post.all_objects.filter(Q(rendered_body='') & ~Q(body='')).values_list('pk', flat=True))
+    for pk in pks:
+        render_post_content(pk)
+    return len(pks)
+
+
+def warm_caches(num_posts=HOT_POSTS_NUM):
+    """
+    预热全部缓存，返回统计信息 {'templates', 'posts', 'pages', 'keys', 'failed', 'seconds'}。
+    """
+    start = time.perf_counter()
+    templates = warm_templates()
+    render_missing_content()
+
+    with CacheWriteRecorder(caches['default']) as recorder:
+        warm_sidebar()
+        invalidate_feed()
+        get_feed_state()
+        rebuild_related_posts()
+        for window in WINDOWS:
+            caches['default'].delete(TRENDING_CACHE_KEY.format(window, 5))
+            get_trending_posts(window)
+
+        # 用完整的请求处理流程渲染首页和热门文章的详情页，页面中用到的其它缓存也会被一并填充
+        posts = hot_posts(num_posts)
+        urls = [reverse('blog:index'), reverse('rss')]
+        urls += [reverse('blog:detail', kwargs={'pk': pk}) for pk in posts]
+        # 导出模块依赖 django.test，只在预热时才导入，不影响应用进程的启动耗时
+        from .export import PageRenderer
+
+        renderer = PageRenderer()
+        failed = [url for url in urls if renderer.render(url).status_code != 200]
+
+    return {
+        'templates': templates,
+        'posts': len(posts),
+        'pages': len(urls) - len(failed),
+        'keys': len(recorder.keys),
+        'failed': failed,
+        'seconds': time.perf_counter() - start,
+    }
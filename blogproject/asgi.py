@@ -0,0 +1,197 @@
+"""
+ASGI config for blogproject project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+e.g. ``uvicorn blogproject.asgi:application``.
+
+Django 2.2 only speaks WSGI, so the views run unchanged in a thread pool while
+the event loop owns the sockets: request bodies are read and responses are
+written asynchronously, and a slow client no longer pins a worker thread.
+Responses are streamed chunk by chunk through a small bounded queue, so large
+or streaming responses are never buffered whole in memory.
+"""
+
+import asyncio
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogproject.settings.production')
+
+wsgi_application = get_wsgi_application()
+
+# 在接受请求之前编译好全部模板，见 blogproject/wsgi.py
+from blog.warmup import warm_templates  # noqa: E402
+
+warm_templates()
+
+# 同时执行视图的线程数，只有执行视图（查询数据库、渲染模板）时才会占用线程
+executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASGI_THREADS', 10)),
+    thread_name_prefix='asgi',
+)
+
+# 线程池和事件循环之间最多缓存的响应块数，客户端读取得慢时线程在这里等待，响应不会整个堆积在内存中
+RESPONSE_QUEUE_SIZE = 8
+# 线程等待队列空位时每隔这么多秒检查一次请求是否已经中止，事件循环已经停止时线程也不会一直等下去
+PUT_TIMEOUT = 1
+
+
+class ResponseAborted(Exception):
+    """
+    客户端断开或者请求被取消，事件循环不再发送响应。
+    """
+
+
+def build_environ(scope, body):
+    """
+    把 ASGI 的 HTTP scope 转换为 WSGI environ。
+    """
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        # WSGI 要求 PATH_INFO 是按 latin-1 解码的原始字节
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            key = 'CONTENT_TYPE'
+        elif name == 'CONTENT_LENGTH':
+            continue
+        else:
+            key = 'HTTP_' + name
+        # 同名请求头按 WSGI 的约定用逗号合并，HTTP/2 拆开发送的 Cookie 则用分号合并
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+def call_wsgi(environ, queue, loop, aborted):
+    """
+    在线程池中执行 WSGI 应用，把 http.response.start 和每一块 http.response.body 消息依次放入 queue，
+    由事件循环发送；结束时放入 None。迭代响应和关闭响应都在同一个线程中，数据库连接也在这个线程中归还。
+    aborted 被设置后停止迭代，关闭响应后直接返回。
+    """
+    started = {}
+
+    def put(message):
+        if aborted.is_set():
+            raise ResponseAborted
+        try:
+            future = asyncio.run_coroutine_threadsafe(queue.put(message), loop)
+        except RuntimeError:
+            # 事件循环已经关闭
+            raise ResponseAborted
+        while True:
+            try:
+                return future.result(timeout=PUT_TIMEOUT)
+            except TimeoutError:
+                if aborted.is_set():
+                    future.cancel()
+                    raise ResponseAborted
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [
+            (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+        ]
+
+    def send_start():
+        # WSGI 应用可以在返回第一块响应体时才调用 start_response
+        if not started.get('sent'):
+            started['sent'] = True
+            put({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+
+    try:
+        try:
+            response = wsgi_application(environ, start_response)
+            try:
+                for chunk in response:
+                    send_start()
+                    if chunk:
+                        put({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                send_start()
+            finally:
+                # close 会触发 django 的 request_finished 信号，归还数据库连接
+                if hasattr(response, 'close'):
+                    response.close()
+        finally:
+            put(None)
+    except ResponseAborted:
+        pass
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise ValueError('Unsupported ASGI scope type: {}'.format(scope['type']))
+
+    # 请求体在事件循环中读取完毕后才交给线程池，慢速上传不会占用线程
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+
+    environ = build_environ(scope, b''.join(chunks))
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=RESPONSE_QUEUE_SIZE)
+    aborted = threading.Event()
+    future = loop.run_in_executor(executor, call_wsgi, environ, queue, loop, aborted)
+
+    # 响应同样由事件循环逐块发送，普通页面只有一块，线程放入队列后就可以处理下一个请求
+    try:
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            await send(message)
+    except BaseException:
+        # 客户端断开、任务被取消（CancelledError 不是 Exception 的子类）时通知线程停止迭代并关闭响应，
+        # 并清空队列让正在等待空位的线程不必等到下一次检查。这里不能 await，取消之后事件循环可能已经在关闭
+        aborted.set()
+        while not queue.empty():
+            queue.get_nowait()
+        raise
+    # 视图抛出的异常在这里重新抛出，由 ASGI 服务器返回 500 或者断开连接
+    await future
+    await send({'type': 'http.response.body', 'body': b''})
@@ -102,6 +102,20 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# 相关文章等预先计算的数据按文章分别缓存，条目数量和文章数量成正比，因此调大 MAX_ENTRIES
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -143,3 +157,54 @@ STATIC_URL = '/static/'
 # 加入下面的配置
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+
+# 上传的文章图片保存在这里，生产环境由 nginx 直接提供服务；文件名包含内容哈希，可以让浏览器长期缓存：
+#   location /media/ {
+#       expires max;
+#   }
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# 静态导出目录，python manage.py export_site 会把预渲染的页面写到这里，由 nginx 直接提供服务
+STATIC_EXPORT_ROOT = os.path.join(BASE_DIR, 'export')
+
+# 为 True 时 blog.background.run_in_background 同步执行任务，生产环境放到后台线程执行
+BACKGROUND_TASKS_EAGER = False
+
+# 渲染 Markdown 的超时时间（秒），在单独的渲染进程中执行，超时后放弃渲染并显示转义后的纯文本，见 blog/rendering.py。
+# 为 None 时在当前进程中直接渲染，只检查正文的大小
+MARKDOWN_RENDER_TIMEOUT = 5
+# 每个 django 进程的渲染进程数
+MARKDOWN_RENDER_PROCESSES = 1
+
+# 内容变化时清除 CDN、varnish 等共享缓存的地址，例如 'http://127.0.0.1:6081/'，见 blog/http_cache.py。
+# 清除请求使用 HTTP_CACHE_PURGE_METHOD 方法，要清除的键放在 Surrogate-Key 头中；为 None 时不发送清除请求
+HTTP_CACHE_PURGE_URL = None
+HTTP_CACHE_PURGE_METHOD = 'PURGE'
+
+# collectstatic 时合并的静态文件，键为合并后的文件名，值为按顺序合并的源文件。
+# 模板中使用 {% static_bundle %} 引入：使用 blog.storage.BundledManifestStaticFilesStorage 时引入合并后带哈希的文件，
+# 否则（例如本地开发）逐个引入源文件。
+STATIC_BUNDLES = {
+    'blog/css/site.bundle.css': [
+        'blog/css/pace.css',
+        'blog/css/custom.css',
+    ],
+    'blog/js/head.bundle.js': [
+        'blog/js/pace.min.js',
+        'blog/js/modernizr.custom.js',
+    ],
+    'blog/js/site.bundle.js': [
+        'blog/js/script.js',
+    ],
+}
+
+# 发表评论前依次执行的垃圾评论检查，每项检查是一个接收评论、返回分数的函数，见 comments/spam.py。
+# 总分达到 COMMENT_SPAM_THRESHOLD 的评论保存为等待审核，在后台审核通过后才会显示
+COMMENT_SPAM_CHECKS = [
+    'comments.spam.link_check',
+    'comments.spam.duplicate_check',
+    'comments.spam.email_history_check',
+    'comments.spam.bayes_check',
+]
+COMMENT_SPAM_THRESHOLD = 1.0
@@ -3,3 +3,9 @@ from .common import *
 SECRET_KEY = 'development-secret-key'
 DEBUG = True
 ALLOWED_HOSTS = ['*']
+
+# 开发环境和测试中后台任务同步执行，便于调试和断言结果
+BACKGROUND_TASKS_EAGER = True
+
+# 开发环境中直接在当前进程渲染 Markdown，不启动渲染进程，便于调试
+MARKDOWN_RENDER_TIMEOUT = None
@@ -2,3 +2,32 @@ from .common import *
 SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
 DEBUG = False
 ALLOWED_HOSTS = ['duanlt.top']
+
+# 模板只在每个进程中编译一次：cached.Loader 把编译后的模板保存在进程内，之后 get_template（包括每个 inclusion_tag
+# 在每次渲染页面时的模板查找）只是一次字典查找。DEBUG 为 False 时 django 默认也会这样配置，这里显式写出来，
+# 避免以后修改 DEBUG 或添加 loaders 时不小心丢掉缓存。显式指定 loaders 时不能同时设置 APP_DIRS。
+# 每个应用进程启动时由 blog.warmup.warm_templates 预先编译全部模板（见 blogproject/wsgi.py 和 scripts/bench_templates.py），
+# 部署时 python manage.py warm_cache 也会编译一遍，模板中有语法错误时在重新启动应用之前就会发现
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# collectstatic 时合并、压缩静态文件，生成带内容哈希的文件名以及 gzip、brotli 压缩版本
+STATICFILES_STORAGE = 'blog.storage.BundledManifestStaticFilesStorage'
+
+# 多个 gunicorn 进程需要共享缓存，本地内存缓存每个进程各有一份，改用文件缓存。
+# 文件缓存每次写入都会列出缓存目录检查是否需要淘汰，一次写入大量的项（例如 python manage.py build_related_posts
+# 重建全部文章的相关文章）时耗时和项数的平方成正比；文章较多时应改用 memcached 或 redis 等缓存
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
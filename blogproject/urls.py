@@ -16,10 +16,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
-from blog.feeds import AllPostsRssFeed
+from blog import sitemaps
+from blog.feeds import AllPostsRssFeed, AuthorPostsRssFeed
 
 """
 django 匹配 URL 模式是在 blogproject 目录（即 settings.py 文件所在的目录）的 urls.py 下的，
@@ -31,4 +34,16 @@ urlpatterns = [
     path('', include('comments.urls')),
 
     path('all/rss/', AllPostsRssFeed(), name='rss'),
+    path('authors/<int:pk>/rss/', AuthorPostsRssFeed(), name='author_rss'),
+
+    # 只读的 JSON 接口，见 blog/api.py
+    path('api/v1/', include('blog.api')),
+
+    # 站点地图，见 blog/sitemaps.py
+    path('sitemap.xml', sitemaps.index, name='sitemap'),
+    path('sitemap-pages.xml', sitemaps.pages, name='sitemap_pages'),
+    path('sitemap-posts-<int:chunk>.xml', sitemaps.posts, name='sitemap_posts'),
 ]
+
+# 开发环境中由 django 提供上传的图片，生产环境中由 nginx 直接提供（DEBUG 为 False 时 static 返回空列表）
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
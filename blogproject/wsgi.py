@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogproject.settings.production')
 
 application = get_wsgi_application()
+
+# 每个 worker 进程在接受请求之前编译好全部模板，避免每个进程的第一批请求承担模板编译的开销
+from blog.warmup import warm_templates  # noqa: E402
+
+warm_templates()
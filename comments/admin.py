@@ -2,13 +2,109 @@ from django.contrib import admin
 
 # Register your models here.
 
+import operator
+from functools import reduce
+
 from django.contrib import admin
-from .models import Comment
+from django.db.models import Q
+
+from blog.bulk import CHUNK_SIZE, bulk_delete
+from blog.http_cache import API_KEY, bump_version, comments_version_key, post_key, purge
+from blog.paginator import EstimatedCountPaginator
+from blog.tasks import enqueue
+from .models import PATH_SEPARATOR, Comment
+from .spam import forget_email_history, train_spam_model
 
 
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ['name', 'email', 'url', 'post', 'created_time']
-    fields = ['name', 'email', 'url', 'text', 'post']
+    list_display = ['name', 'email', 'url', 'post', 'ip_address', 'status', 'spam_score', 'created_time']
+    fields = ['name', 'email', 'url', 'text', 'post', 'parent', 'ip_address', 'status', 'spam_score', 'spam_reasons']
+
+    # 评论表可能有几十万行，列表页的查询都要能走索引：
+    # 文章标题用 JOIN 一次查出来；时间只提供今天、最近 7 天、本月、今年这几个范围过滤，走 created_time 索引；
+    # 搜索只支持邮箱精确匹配和名字前缀匹配，不会对全文做 LIKE '%...%' 扫描
+    list_select_related = ['post']
+    list_filter = ['status', 'created_time']
+    search_fields = ['=email', '^name']
+    # 文章用输入 id 的方式选择，编辑页不需要加载全部文章
+    raw_id_fields = ['post', 'parent']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_readonly_fields(self, request, obj=None):
+        # 评论的路径在创建时生成，之后不能再移动到别的评论下面
+        if obj is not None:
+            return ['parent', 'spam_score', 'spam_reasons']
+        return ['spam_score', 'spam_reasons']
+
+    def get_queryset(self, request):
+        # 后台显示全部评论，包括等待审核的评论和垃圾评论；列表页只显示文章标题，不需要查询文章正文
+        return Comment.all_objects.select_related('post').defer(
+            'post__body', 'post__rendered_body', 'post__rendered_toc', 'post__plain_text',
+        )
+
+    # 审核评论：通过或者标记为垃圾评论之后，清除发表者的邮箱历史，并在后台用新的标记重新训练贝叶斯模型（见 comments/spam.py）。
+    # 清理垃圾评论：选中几条垃圾评论，删除同一邮箱或同一 IP 发表的全部评论以及它们的回复。
+    # 回复按物化路径的前缀找出，用 blog.bulk.bulk_delete 分批删除，不逐条加载评论、不发送信号，删除之后统一清除缓存
+    actions = ['approve', 'mark_spam', 'delete_by_email', 'delete_by_ip']
+
+    def _set_status(self, request, queryset, status):
+        rows = list(queryset.values_list('post_id', 'email'))
+        count = queryset.update(status=status)
+        forget_email_history({email for _, email in rows})
+        post_ids = sorted({post_id for post_id, _ in rows})
+        # update() 不会发送 post_save 信号，这里自己更新评论接口的版本号
+        bump_version(*(comments_version_key(post_id) for post_id in post_ids))
+        purge(*(post_key(post_id) for post_id in post_ids), API_KEY)
+        enqueue(train_spam_model)
+        self.message_user(request, '已修改 {} 条评论'.format(count))
+
+    def approve(self, request, queryset):
+        self._set_status(request, queryset, Comment.APPROVED)
+    approve.short_description = '审核通过'
+
+    def mark_spam(self, request, queryset):
+        self._set_status(request, queryset, Comment.SPAM)
+    mark_spam.short_description = '标记为垃圾评论'
+
+    def _delete_matching(self, request, lookup):
+        # 按路径排序后，一条评论的回复紧跟在它后面；已经在某条评论回复中的评论不需要再单独匹配
+        roots = []
+        for path, post_id in sorted(Comment.all_objects.filter(lookup).values_list('path', 'post_id')):
+            if not roots or not path.startswith(roots[-1][0] + PATH_SEPARATOR):
+                roots.append((path, post_id))
+
+        count = 0
+        post_ids = set()
+        emails = set()
+        for i in range(0, len(roots), CHUNK_SIZE):
+            # 路径以 path 开头的评论就是这条评论和它的全部回复，走 (post, status, path) 索引
+            subtree = reduce(operator.or_, (
+                Q(post_id=post_id, path__startswith=path) for path, post_id in roots[i:i + CHUNK_SIZE]
+            ))
+            comments = Comment.all_objects.filter(subtree)
+            rows = list(comments.values_list('post_id', 'email'))
+            post_ids.update(post_id for post_id, _ in rows)
+            emails.update(email for _, email in rows)
+            bulk_delete(comments)
+            count += len(rows)
+
+        if post_ids:
+            post_ids = sorted(post_ids)
+            bump_version(*(comments_version_key(post_id) for post_id in post_ids))
+            purge(*(post_key(post_id) for post_id in post_ids), API_KEY)
+            forget_email_history(emails)
+        self.message_user(request, '已删除 {} 条评论'.format(count))
+
+    def delete_by_email(self, request, queryset):
+        emails = set(queryset.values_list('email', flat=True))
+        self._delete_matching(request, Q(email__in=emails))
+    delete_by_email.short_description = '删除相同邮箱发表的全部评论'
+
+    def delete_by_ip(self, request, queryset):
+        ips = set(queryset.exclude(ip_address=None).values_list('ip_address', flat=True))
+        self._delete_matching(request, Q(ip_address__in=ips))
+    delete_by_ip.short_description = '删除相同 IP 发表的全部评论'
 
 
 admin.site.register(Comment, CommentAdmin)
\ No newline at end of file
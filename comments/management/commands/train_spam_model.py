@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from comments.spam import MIN_TRAINING, train_spam_model
+
+
+class Command(BaseCommand):
+    help = '用后台标记的垃圾评论和审核通过的评论重新训练垃圾评论的贝叶斯模型'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        model = train_spam_model()
+        self.stdout.write(self.style.SUCCESS('已用 {} 条垃圾评论和 {} 条正常评论训练模型，共 {} 个词，耗时 {:.2f} 秒'.format(
+            model['num_spam'], model['num_ham'], len(model['weights']), time.perf_counter() - start,
+        )))
+        if model['num_spam'] < MIN_TRAINING or model['num_ham'] < MIN_TRAINING:
+            self.stdout.write(self.style.WARNING(
+                '垃圾评论和正常评论都至少需要 {} 条，在此之前不使用模型打分'.format(MIN_TRAINING)
+            ))
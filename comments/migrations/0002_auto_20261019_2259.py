@@ -0,0 +1,30 @@
+# Generated by Django 2.2.3 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['-created_time'], 'verbose_name': '评论', 'verbose_name_plural': '评论'},
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254, verbose_name='邮箱'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created_time', 'id'], name='comments_co_created_a352d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_time'], name='comments_co_post_id_a047fa_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0002_auto_20261019_2259'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, db_index=True, null=True, verbose_name='IP 地址'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.3 on 2026-10-19 15:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_root_paths(apps, schema_editor):
+    # 已有的评论都是根评论，路径为 ROOT_BASE - id（见 comments/models.py），分批更新
+    Comment = apps.get_model('comments', 'Comment')
+    batch = []
+    for pk in list(Comment.objects.order_by('pk').values_list('pk', flat=True)):
+        batch.append(Comment(pk=pk, path='{:010d}'.format(10 ** 10 - 1 - pk)))
+        if len(batch) >= 500:
+            Comment.objects.bulk_update(batch, ['path'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_comment_ip_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='comments.Comment', verbose_name='回复的评论'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=55, verbose_name='路径'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comments_co_post_id_adad8a_idx'),
+        ),
+        migrations.RunPython(set_root_paths, migrations.RunPython.noop),
+    ]
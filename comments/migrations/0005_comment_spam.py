@@ -0,0 +1,52 @@
+# Generated by Django 2.2.3 on 2026-10-19 15:39
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0004_comment_threads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weights', models.TextField(verbose_name='词权重')),
+                ('prior', models.FloatField(verbose_name='先验对数几率')),
+                ('num_spam', models.PositiveIntegerField(verbose_name='垃圾评论数')),
+                ('num_ham', models.PositiveIntegerField(verbose_name='正常评论数')),
+                ('created_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='训练时间')),
+            ],
+            options={
+                'verbose_name': '垃圾评论模型',
+                'verbose_name_plural': '垃圾评论模型',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comments_co_post_id_adad8a_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='spam_reasons',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='得分明细'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='spam_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='垃圾评论得分'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='status',
+            field=models.CharField(choices=[('approved', '已通过'), ('held', '等待审核'), ('spam', '垃圾评论')], default='approved', max_length=10, verbose_name='状态'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'status', 'path'], name='comments_co_post_id_298690_idx'),
+        ),
+    ]
@@ -1,23 +1,149 @@
 from django.db import models
 
 # Create your models here.
-from django.db import models
+import json
+import re
+
+from django.db import models, transaction
+from django.db.models import CharField, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+# 评论的回复以物化路径（materialized path）保存：path 由根评论到这条评论每一级的编号依次拼接而成，
+# 例如 9999999957.0000000051.0000000060。按 path 排序就是整棵评论树的显示顺序，每条回复都紧跟在它回复的评论之后，
+# 因此一篇文章的全部评论、或者一页根评论连同它们的全部回复，都只需要一条走 (post, path) 索引的有序查询，
+# 模板按顺序输出、按层级缩进即可，不需要逐层递归查询回复。
+# 根评论的编号是 ROOT_BASE - id，新的根评论排在前面（和原来的按时间倒序一致）；回复的编号就是 id，同一条评论的回复按时间正序。
+SEGMENT_WIDTH = 10
+ROOT_BASE = 10 ** SEGMENT_WIDTH - 1
+PATH_SEPARATOR = '.'
+# 比任何路径都大的值，用于表示“没有下一页”
+PATH_END = '~'
+ROOT_PATH_RE = re.compile(r'^\d{%d}$' % SEGMENT_WIDTH)
+# 回复最多嵌套的层数（包括根评论），回复更深一层的评论时改为回复它的上一级
+MAX_DEPTH = 5
+
+
+def path_segment(pk, root):
+    return '{:0{}d}'.format(ROOT_BASE - pk if root else pk, SEGMENT_WIDTH)
+
+
+class CommentQuerySet(models.QuerySet):
+    def thread_page(self, post_id, start=None, num_threads=20):
+        """
+        读取一页评论：从路径为 start 的根评论开始（为 None 时从第一条开始）的 num_threads 条根评论以及它们的全部回复，
+        按显示顺序排列。返回 (评论列表, 下一页第一条根评论的路径)，没有下一页时后者为 None。
+
+        下一页的起点由子查询在同一条 SQL 中找出，读取一页评论只有一次查询。
+        """
+        comments = self.filter(post_id=post_id)
+        if start is not None and ROOT_PATH_RE.match(start):
+            comments = comments.filter(path__gte=start)
+        roots = comments.filter(parent=None).order_by('path').values('path')[num_threads:num_threads + 1]
+        next_start = Coalesce(Subquery(roots), Value(PATH_END), output_field=CharField())
+        comment_list = list(
+            comments.annotate(next_start=next_start).filter(path__lt=next_start).order_by('path')
+        )
+        if not comment_list or comment_list[0].next_start == PATH_END:
+            return comment_list, None
+        return comment_list, comment_list[0].next_start
+
+
+class PublicCommentManager(models.Manager.from_queryset(CommentQuerySet)):
+    """
+    只返回审核通过的评论。作为 Comment 的默认 Manager，文章页的评论列表、评论数（post.comment_set）和接口
+    都看不到等待审核的评论和垃圾评论；后台管理以及需要全部评论的地方使用 all_objects。
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(status=Comment.APPROVED)
+
+
 # 评论会保存评论用户的 name（名字）、email（邮箱）、url（个人网站，可以为空），用户发表的内容将存放在 text 字段里，created_time 记录评论时间。
 # 最后，这个评论是关联到某篇文章（Post）的，由于一个评论只能属于一篇文章，一篇文章可以有多个评论，是一对多的关系，因此这里我们使用了 ForeignKey。
 class Comment(models.Model):
+    APPROVED = 'approved'
+    HELD = 'held'
+    SPAM = 'spam'
+    STATUS_CHOICES = (
+        (APPROVED, '已通过'),
+        (HELD, '等待审核'),
+        (SPAM, '垃圾评论'),
+    )
+
     name = models.CharField('名字', max_length=50)
-    email = models.EmailField('邮箱')
+    email = models.EmailField('邮箱', db_index=True)
     url = models.URLField('网址', blank=True)
     text = models.TextField('内容')
     created_time = models.DateTimeField('创建时间', default=timezone.now)
     post = models.ForeignKey('blog.Post', verbose_name='文章', on_delete=models.CASCADE)
+    # 评论者的 IP 地址，后台可以按 IP 批量删除垃圾评论
+    ip_address = models.GenericIPAddressField('IP 地址', null=True, blank=True, db_index=True)
+    # 回复的评论，为空表示根评论。删除一条评论时它下面的回复一起删除
+    parent = models.ForeignKey(
+        'self', verbose_name='回复的评论', null=True, blank=True, related_name='replies', on_delete=models.CASCADE,
+    )
+    # 物化路径，保存时生成
+    path = models.CharField('路径', max_length=(SEGMENT_WIDTH + 1) * MAX_DEPTH, blank=True, editable=False)
+    # 发表时由 comments/spam.py 打分，分数达到阈值的评论等待审核，后台标记的垃圾评论用于训练贝叶斯模型
+    status = models.CharField('状态', max_length=10, choices=STATUS_CHOICES, default=APPROVED)
+    spam_score = models.FloatField('垃圾评论得分', default=0, editable=False)
+    spam_reasons = models.CharField('得分明细', max_length=200, blank=True, editable=False)
+
+    objects = PublicCommentManager()
+    all_objects = CommentQuerySet.as_manager()
 
     class Meta:
         verbose_name = '评论'
         verbose_name_plural = verbose_name
         ordering = ['-created_time']
+        # 后台评论列表按时间倒序分页、按时间过滤，接口按文章查询评论并按时间排序；
+        # 文章详情页按 (post, status, path) 读取审核通过的评论树
+        indexes = [
+            models.Index(fields=['created_time', 'id']),
+            models.Index(fields=['post', 'created_time']),
+            models.Index(fields=['post', 'status', 'path']),
+        ]
+
+    def __str__(self):
+        return '{}: {}'.format(self.name, self.text[:20])
+
+    @property
+    def depth(self):
+        # 根评论为 0
+        return self.path.count(PATH_SEPARATOR)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            return super().save(*args, **kwargs)
+        while self.parent is not None and self.parent.depth >= MAX_DEPTH - 1:
+            self.parent = self.parent.parent
+        if self.parent is not None:
+            self.post_id = self.parent.post_id
+        # 路径包含自己的 id，插入之后才能生成
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.parent is None:
+                self.path = path_segment(self.pk, root=True)
+            else:
+                self.path = self.parent.path + PATH_SEPARATOR + path_segment(self.pk, root=False)
+            Comment.all_objects.filter(pk=self.pk).update(path=self.path)
+
+
+class SpamModel(models.Model):
+    """
+    由后台标记的垃圾评论和审核通过的评论训练出的朴素贝叶斯模型，见 comments/spam.py。
+    weights 是 JSON 格式的 {词: 对数似然比}，只保留最新训练的一行。
+    """
+    weights = models.TextField('词权重')
+    prior = models.FloatField('先验对数几率')
+    num_spam = models.PositiveIntegerField('垃圾评论数')
+    num_ham = models.PositiveIntegerField('正常评论数')
+    created_time = models.DateTimeField('训练时间', default=timezone.now)
+
+    class Meta:
+        verbose_name = '垃圾评论模型'
+        verbose_name_plural = verbose_name
 
     def __str__(self):
-        return '{}: {}'.format(self.name, self.text[:20])
\ No newline at end of file
+        return '{} 个词，{} 条垃圾评论，{} 条正常评论'.format(len(json.loads(self.weights)), self.num_spam, self.num_ham)
@@ -0,0 +1,289 @@
+# 发表评论前的垃圾评论打分。
+#
+# 评论通过表单验证之后、写入数据库之前，依次执行 settings.COMMENT_SPAM_CHECKS 中的检查，每项检查返回一个分数，
+# 正数表示像垃圾评论，负数表示像正常评论。总分达到 COMMENT_SPAM_THRESHOLD 的评论保存为“等待审核”，
+# 不会出现在文章页的评论列表中（见 comments/models.py 的 PublicCommentManager），由管理员在后台通过或者标记为垃圾评论。
+# 检查项是普通的函数，接收还没有保存的评论，可以在配置中增减或替换。默认的检查有：
+# - link_check           正文中的链接数量
+# - duplicate_check      最近一段时间内是否有人发表过相同的内容（按规范化之后的哈希判断）
+# - email_history_check  这个邮箱以前的评论有多少被标记为垃圾评论、有多少审核通过
+# - bayes_check          后台标记的垃圾评论和审核通过的评论训练出的朴素贝叶斯模型
+#
+# 打分在处理评论请求的进程中同步执行，不能拖慢发表评论：内容哈希和邮箱历史都保存在缓存中，
+# 贝叶斯模型的词权重预先训练好，每个进程加载到内存中的字典里，打分只需要几次字典查找，整个打分通常在 1 毫秒以内，
+# 见 scripts/bench_spam.py。
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+from .models import Comment, SpamModel
+
+DEFAULT_CHECKS = (
+    'comments.spam.link_check',
+    'comments.spam.duplicate_check',
+    'comments.spam.email_history_check',
+    'comments.spam.bayes_check',
+)
+DEFAULT_THRESHOLD = 1.0
+
+# 链接：第一个链接不扣分，之后每个链接的分数
+LINK_RE = re.compile(r'https?://|www\.', re.I)
+LINK_POINTS = 0.4
+# 规范化之后至少有这么多个字符的内容才检查重复，“谢谢分享”之类的短评论经常相同
+DUPLICATE_MIN_LENGTH = 20
+DUPLICATE_WINDOW = 24 * 3600
+DUPLICATE_KEY = 'comments:text-hash:{}'
+DUPLICATE_POINTS = 1.0
+# 邮箱的历史评论数，缓存未命中时从数据库统计一次
+EMAIL_HISTORY_KEY = 'comments:email-history:{}'
+EMAIL_HISTORY_TIMEOUT = 7 * 24 * 3600
+# 审核通过的评论达到这个数量、且没有垃圾评论的邮箱视为老读者
+TRUSTED_COMMENTS = 3
+
+# 贝叶斯模型：出现次数少于 MIN_TOKEN_COUNT 的词不参与训练，每条评论只使用权重绝对值最大的 MAX_INTERESTING 个词，
+# 垃圾评论和正常评论都至少有 MIN_TRAINING 条时才使用模型
+MIN_TOKEN_COUNT = 2
+MIN_WEIGHT = 0.5
+MAX_TOKENS = 50000
+MAX_INTERESTING = 15
+MIN_TRAINING = 5
+BAYES_POINTS = 2.5
+SPAM_MODEL_VERSION_KEY = 'comments:spam-model-version'
+# 检查其它进程是否重新训练过模型的间隔（秒）
+SPAM_MODEL_CHECK_INTERVAL = 30
+
+URL_HOST_RE = re.compile(r'(?:https?://|www\.)([^\s/?#"\'<>]+)')
+LATIN_RE = re.compile(r'[a-z0-9]{2,30}')
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+NON_WORD_RE = re.compile(r'\W+')
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def tokenize(text):
+    """
+    把评论切分为词的集合：链接的域名、英文单词和数字，以及中文里每两个相邻的字。
+    """
+    text = normalize(text)
+    tokens = {'url:' + host for host in URL_HOST_RE.findall(text)}
+    tokens.update(LATIN_RE.findall(text))
+    for run in CJK_RE.findall(text):
+        if len(run) == 1:
+            tokens.add(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _comment_tokens(text, url=''):
+    return tokenize('{} {}'.format(text, url))
+
+
+# 检查项
+
+
+def link_check(comment):
+    links = len(LINK_RE.findall(comment.text))
+    return max(links - 1, 0) * LINK_POINTS
+
+
+def text_hash(text):
+    # 去掉空白和标点、统一大小写和全角半角之后再计算哈希，只改了几个空格的内容仍然算重复
+    return hashlib.sha1(NON_WORD_RE.sub('', normalize(text)).encode('utf-8')).hexdigest()
+
+
+def duplicate_check(comment):
+    if len(NON_WORD_RE.sub('', comment.text)) < DUPLICATE_MIN_LENGTH:
+        return 0
+    return DUPLICATE_POINTS if cache.get(DUPLICATE_KEY.format(text_hash(comment.text))) else 0
+
+
+def _email_key(email):
+    return EMAIL_HISTORY_KEY.format(hashlib.md5(email.encode('utf-8')).hexdigest())
+
+
+def get_email_history(email):
+    """
+    返回邮箱的历史评论数 {'approved': n, 'held': n, 'spam': n}。
+    """
+    key = _email_key(email)
+    history = cache.get(key)
+    if history is None:
+        history = dict.fromkeys((Comment.APPROVED, Comment.HELD, Comment.SPAM), 0)
+        rows = Comment.all_objects.filter(email=email).order_by().values('status').annotate(n=Count('pk'))
+        history.update((row['status'], row['n']) for row in rows)
+        cache.set(key, history, EMAIL_HISTORY_TIMEOUT)
+    return history
+
+
+def forget_email_history(emails):
+    # 后台修改评论状态之后调用，下次打分时重新统计
+    cache.delete_many([_email_key(email) for email in emails])
+
+
+def email_history_check(comment):
+    history = get_email_history(comment.email)
+    if history[Comment.SPAM]:
+        return 2.0 * history[Comment.SPAM] / (history[Comment.SPAM] + history[Comment.APPROVED])
+    if history[Comment.APPROVED] >= TRUSTED_COMMENTS:
+        return -0.5
+    return 0
+
+
+def bayes_check(comment):
+    model = get_spam_model()
+    if model is None:
+        return 0
+    weights = model['weights']
+    found = [weights[token] for token in _comment_tokens(comment.text, comment.url) if token in weights]
+    found.sort(key=abs, reverse=True)
+    log_odds = model['prior'] + sum(found[:MAX_INTERESTING])
+    probability = 1 / (1 + math.exp(-max(min(log_odds, 50), -50)))
+    return (probability - 0.5) * BAYES_POINTS
+
+
+# 打分流程
+
+
+@lru_cache(maxsize=None)
+def _load_checks(paths):
+    return [(path.rsplit('.', 1)[-1], import_string(path)) for path in paths]
+
+
+def get_checks():
+    return _load_checks(tuple(getattr(settings, 'COMMENT_SPAM_CHECKS', DEFAULT_CHECKS)))
+
+
+def score_comment(comment):
+    """
+    保存评论之前调用：为评论打分，设置 spam_score、spam_reasons，分数达到阈值时把状态设为等待审核。
+    """
+    score = 0
+    reasons = []
+    for name, check in get_checks():
+        points = check(comment)
+        if points:
+            score += points
+            reasons.append('{}:{:+.2f}'.format(name, points))
+    comment.spam_score = round(score, 3)
+    comment.spam_reasons = ' '.join(reasons)[:200]
+    threshold = getattr(settings, 'COMMENT_SPAM_THRESHOLD', DEFAULT_THRESHOLD)
+    comment.status = Comment.HELD if score >= threshold else Comment.APPROVED
+    return comment.spam_score
+
+
+def record_comment(comment):
+    """
+    保存评论之后调用：记下内容的哈希，并把这条评论计入邮箱的历史。
+    """
+    if len(NON_WORD_RE.sub('', comment.text)) >= DUPLICATE_MIN_LENGTH:
+        cache.set(DUPLICATE_KEY.format(text_hash(comment.text)), 1, DUPLICATE_WINDOW)
+    key = _email_key(comment.email)
+    history = cache.get(key)
+    if history is not None:
+        history[comment.status] += 1
+        cache.set(key, history, EMAIL_HISTORY_TIMEOUT)
+
+
+# 贝叶斯模型
+
+
+def build_spam_model(spam_docs, ham_docs):
+    """
+    由垃圾评论和正常评论的词集合训练模型，返回 {'weights', 'prior', 'num_spam', 'num_ham'}。
+    每个词的权重是它在垃圾评论和正常评论中出现比例的对数比（加一平滑），打分时把评论中各个词的权重相加。
+    """
+    spam_counts, ham_counts = Counter(), Counter()
+    num_spam = num_ham = 0
+    for tokens in spam_docs:
+        spam_counts.update(tokens)
+        num_spam += 1
+    for tokens in ham_docs:
+        ham_counts.update(tokens)
+        num_ham += 1
+    weights = {}
+    for token in set(spam_counts) | set(ham_counts):
+        spam, ham = spam_counts[token], ham_counts[token]
+        if spam + ham < MIN_TOKEN_COUNT:
+            continue
+        weight = math.log((spam + 1) / (num_spam + 2)) - math.log((ham + 1) / (num_ham + 2))
+        if abs(weight) >= MIN_WEIGHT:
+            weights[token] = round(weight, 3)
+    if len(weights) > MAX_TOKENS:
+        weights = dict(sorted(weights.items(), key=lambda item: abs(item[1]), reverse=True)[:MAX_TOKENS])
+    return {
+        'weights': weights,
+        'prior': math.log((num_spam + 1) / (num_ham + 1)),
+        'num_spam': num_spam,
+        'num_ham': num_ham,
+    }
+
+
+def train_spam_model():
+    """
+    后台任务：用后台标记的垃圾评论和审核通过的评论重新训练模型，保存到数据库，其它进程在检查间隔内加载新的模型。
+    """
+    rows = Comment.all_objects.filter(status__in=(Comment.SPAM, Comment.APPROVED)).values_list('status', 'text', 'url')
+    spam_docs, ham_docs = [], []
+    for status, text, url in rows.iterator():
+        (spam_docs if status == Comment.SPAM else ham_docs).append(_comment_tokens(text, url))
+    model = build_spam_model(spam_docs, ham_docs)
+    with transaction.atomic():
+        SpamModel.objects.all().delete()
+        SpamModel.objects.create(
+            weights=json.dumps(model['weights'], ensure_ascii=False), prior=model['prior'],
+            num_spam=model['num_spam'], num_ham=model['num_ham'],
+        )
+    # 换一个新的版本号，其它进程之后会重新加载；本进程直接使用新的模型
+    global _model, _version, _checked
+    with _lock:
+        _version = uuid.uuid4().hex
+        cache.set(SPAM_MODEL_VERSION_KEY, _version, timeout=None)
+        _model = load_spam_model()
+        _checked = time.monotonic()
+    return model
+
+
+_lock = threading.Lock()
+_model = None
+_version = None
+_checked = None
+
+
+def load_spam_model():
+    row = SpamModel.objects.order_by('-pk').first()
+    if row is None or row.num_spam < MIN_TRAINING or row.num_ham < MIN_TRAINING:
+        return None
+    return {'weights': json.loads(row.weights), 'prior': row.prior}
+
+
+def get_spam_model():
+    """
+    返回本进程内存中的模型，训练数据不足时返回 None。每隔 SPAM_MODEL_CHECK_INTERVAL 秒检查一次版本号，
+    重新训练过时从数据库重新加载。
+    """
+    global _model, _version, _checked
+    now = time.monotonic()
+    if _checked is not None and now - _checked < SPAM_MODEL_CHECK_INTERVAL:
+        return _model
+    with _lock:
+        version = cache.get_or_set(SPAM_MODEL_VERSION_KEY, lambda: uuid.uuid4().hex, timeout=None)
+        if _checked is None or version != _version:
+            _model = load_spam_model()
+            _version = version
+        _checked = now
+        return _model
@@ -1,14 +1,42 @@
 from django import template
 from ..forms import CommentForm
+from ..models import Comment
 
 register = template.Library()
 
+# 每页显示的根评论数，它们的回复全部显示在同一页
+THREADS_PER_PAGE = 20
+
 
 @register.inclusion_tag('comments/inclusions/_form.html', takes_context=True)
 def show_comment_form(context, post, form=None):
     if form is None:
         form = CommentForm()
+    # 点击评论的“回复”链接后地址中带有 ?reply=评论 id，表单提交时一并提交 parent
+    request = context.get('request')
+    reply = request.GET.get('reply', '') if request is not None else ''
+    reply_to = Comment.objects.filter(pk=reply, post=post).only('pk', 'name').first() if reply.isdigit() else None
     return {
         'form': form,
         'post': post,
-    }
\ No newline at end of file
+        'reply_to': reply_to,
+    }
+
+
+@register.inclusion_tag('comments/inclusions/_list.html', takes_context=True)
+def show_comments(context, post):
+    # 评论按物化路径排序，一条查询读出一页根评论和它们的全部回复，模板按顺序输出、按层级缩进，见 comments/models.py。
+    # 更早的根评论通过 ?comments=下一页第一条根评论的路径 翻页
+    request = context.get('request')
+    start = request.GET.get('comments') if request is not None else None
+    comment_list, next_start = Comment.objects.thread_page(post.pk, start, THREADS_PER_PAGE)
+    # 文章详情页的视图已经随文章一起查询了评论数
+    comment_count = getattr(post, 'num_comments', None)
+    if comment_count is None:
+        comment_count = post.comment_set.count()
+    return {
+        'post': post,
+        'comment_count': comment_count,
+        'comment_list': comment_list,
+        'next_start': next_start,
+    }
@@ -0,0 +1,84 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Category, Post
+from ..models import Comment
+
+
+class CommentAdminTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.client.login(username='admin', password='admin')
+        cate = Category.objects.create(name='测试')
+        self.posts = [
+            Post.objects.create(title='测试标题{}'.format(i), body='测试内容', category=cate, author=self.user)
+            for i in range(3)
+        ]
+        self.url = reverse('admin:comments_comment_changelist')
+
+    def create_comments(self, num, **kwargs):
+        for i in range(num):
+            data = {
+                'name': '评论者{}'.format(i),
+                'email': 'user{}@example.com'.format(i),
+                'text': '评论内容',
+                'post': self.posts[i % len(self.posts)],
+            }
+            data.update(kwargs)
+            Comment.objects.create(**data)
+
+    def test_changelist_joins_posts(self):
+        self.create_comments(3)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        self.create_comments(12)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.url)
+        self.assertEqual(len(many), len(few))
+        self.assertContains(response, '测试标题1')
+        for query in many.captured_queries:
+            self.assertNotIn('rendered_body', query['sql'])
+
+    def test_search_by_email(self):
+        self.create_comments(3)
+        response = self.client.get(self.url, {'q': 'user1@example.com'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_delete_spam(self):
+        self.create_comments(3, email='spam@example.com')
+        self.create_comments(2, ip_address='10.0.0.1')
+        self.create_comments(1)
+        selected = Comment.objects.filter(email='spam@example.com')[:1]
+        self.client.post(self.url, {'action': 'delete_by_email', '_selected_action': [c.pk for c in selected]})
+        self.assertEqual(Comment.objects.count(), 3)
+
+        selected = Comment.objects.filter(ip_address='10.0.0.1')[:1]
+        self.client.post(self.url, {'action': 'delete_by_ip', '_selected_action': [c.pk for c in selected]})
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_delete_spam_with_replies(self):
+        post = self.posts[0]
+        spam = Comment.objects.create(name='垃圾', email='spam@example.com', text='广告', post=post)
+        reply = Comment.objects.create(name='读者', email='reader@example.com', text='回复', post=post, parent=spam)
+        Comment.objects.create(name='垃圾', email='spam@example.com', text='广告', post=post, parent=reply)
+        Comment.objects.create(name='读者', email='reader@example.com', text='评论', post=post)
+        url = reverse('api:comment_list', kwargs={'pk': post.pk})
+        etag = self.client.get(url)['ETag']
+
+        self.client.post(self.url, {'action': 'delete_by_email', '_selected_action': [spam.pk]})
+        self.assertEqual(list(Comment.all_objects.values_list('text', flat=True)), ['评论'])
+        # 评论接口的 ETag 随之变化
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_comment_records_ip(self):
+        url = reverse('comments:comment', kwargs={'post_pk': self.posts[0].pk})
+        data = {'name': '评论者', 'email': 'a@example.com', 'text': '评论内容'}
+        self.client.post(url, data, HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.2')
+        self.assertEqual(Comment.objects.get().ip_address, '10.0.0.2')
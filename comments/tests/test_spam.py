@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from blog.models import Category, Post
+from .. import spam
+from ..models import Comment, SpamModel
+
+SPAM_TEXT = '低价代理发票，加微信领取优惠 http://cheap.example/{}'
+HAM_TEXT = '文章写得很好，谢谢博主分享的教程 {}'
+
+
+class SpamTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # 模型保存在进程内，每个测试重新加载
+        spam._checked = None
+        self.addCleanup(setattr, spam, '_checked', None)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.post = Post.objects.create(
+            title='测试标题', body='测试内容', category=Category.objects.create(name='测试'), author=self.user,
+        )
+        self.url = reverse('comments:comment', kwargs={'post_pk': self.post.pk})
+
+    def submit(self, text, email='a@a.com'):
+        self.client.post(self.url, {'name': '评论者', 'email': email, 'text': text})
+        return Comment.all_objects.order_by('-pk').first()
+
+    def test_links(self):
+        comment = self.submit('看看 http://a.example http://b.example http://c.example http://d.example')
+        self.assertEqual(comment.status, Comment.HELD)
+        self.assertIn('link_check', comment.spam_reasons)
+        self.assertEqual(self.submit('参考 http://a.example').status, Comment.APPROVED)
+
+    def test_duplicate(self):
+        text = '这是一条足够长的评论内容，用来测试重复内容的检查。'
+        self.assertEqual(self.submit(text).status, Comment.APPROVED)
+        # 只改了空白和标点也算重复
+        self.assertEqual(self.submit(text.replace('，', ' , '), email='b@b.com').status, Comment.HELD)
+        # 短评论不检查
+        self.submit('谢谢分享')
+        self.assertEqual(self.submit('谢谢分享', email='b@b.com').status, Comment.APPROVED)
+
+    def test_email_history(self):
+        Comment.objects.create(name='评论者', email='s@s.com', text='垃圾', post=self.post, status=Comment.SPAM)
+        self.assertEqual(self.submit('你好', email='s@s.com').status, Comment.HELD)
+        self.assertEqual(self.submit('你好', email='a@a.com').status, Comment.APPROVED)
+
+    def test_held_comments_hidden(self):
+        self.submit('第一条评论')
+        self.submit('看看 http://a.example http://b.example http://c.example http://d.example')
+        self.assertEqual(Comment.all_objects.count(), 2)
+        self.assertEqual(self.post.comment_set.count(), 1)
+        comments, _ = Comment.objects.thread_page(self.post.pk)
+        self.assertEqual([comment.text for comment in comments], ['第一条评论'])
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(response.context['post'].num_comments, 1)
+        self.assertNotContains(response, 'http://d.example')
+
+    def test_mark_spam_trains_model(self):
+        for i in range(spam.MIN_TRAINING):
+            Comment.objects.create(name='评论者', email='h{}@h.com'.format(i), text=HAM_TEXT.format(i), post=self.post)
+            Comment.objects.create(
+                name='评论者', email='s{}@s.com'.format(i), text=SPAM_TEXT.format(i), post=self.post, status=Comment.HELD,
+            )
+        self.assertIsNone(spam.get_spam_model())
+
+        # 在后台把等待审核的评论标记为垃圾评论，后台任务重新训练模型
+        self.client.login(username='admin', password='admin')
+        held = Comment.all_objects.filter(status=Comment.HELD)
+        self.client.post(reverse('admin:comments_comment_changelist'), {
+            'action': 'mark_spam', '_selected_action': [comment.pk for comment in held],
+        })
+        self.assertEqual(Comment.all_objects.filter(status=Comment.SPAM).count(), spam.MIN_TRAINING)
+        self.assertEqual(SpamModel.objects.get().num_spam, spam.MIN_TRAINING)
+        self.assertIsNotNone(spam.get_spam_model())
+
+        spam_comment = Comment(name='新人', email='n@n.com', text=SPAM_TEXT.format(99))
+        ham_comment = Comment(name='新人', email='n@n.com', text=HAM_TEXT.format(99))
+        self.assertGreater(spam.bayes_check(spam_comment), 0)
+        self.assertLess(spam.bayes_check(ham_comment), 0)
+        spam.score_comment(spam_comment)
+        spam.score_comment(ham_comment)
+        self.assertEqual(spam_comment.status, Comment.HELD)
+        self.assertEqual(ham_comment.status, Comment.APPROVED)
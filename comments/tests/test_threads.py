@@ -0,0 +1,89 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from blog.models import Category, Post
+from ..models import MAX_DEPTH, Comment
+
+
+class CommentThreadTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_superuser(
+            username='admin',
+            email='admin@hellogithub.com',
+            password='admin'
+        )
+        self.post = Post.objects.create(
+            title='测试标题', body='测试内容', category=Category.objects.create(name='测试'), author=self.user,
+        )
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(name='评论者', email='a@a.com', text=text, post=self.post, parent=parent)
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_tree_order(self):
+        first = self.comment('一')
+        second = self.comment('二')
+        reply = self.comment('一.1', parent=first)
+        self.comment('一.1.1', parent=reply)
+        self.comment('一.2', parent=first)
+        self.comment('二.1', parent=second)
+        # 新的根评论在前，回复紧跟在它回复的评论之后并按时间正序
+        with self.assertNumQueries(1):
+            comments, next_start = Comment.objects.thread_page(self.post.pk)
+        self.assertEqual(self.texts(comments), ['二', '二.1', '一', '一.1', '一.1.1', '一.2'])
+        self.assertEqual([comment.depth for comment in comments], [0, 1, 0, 1, 2, 1])
+        self.assertIsNone(next_start)
+
+    def test_thread_pages(self):
+        for i in range(5):
+            root = self.comment('根{}'.format(i))
+            self.comment('回复{}'.format(i), parent=root)
+        comments, next_start = Comment.objects.thread_page(self.post.pk, num_threads=2)
+        self.assertEqual(self.texts(comments), ['根4', '回复4', '根3', '回复3'])
+        comments, next_start = Comment.objects.thread_page(self.post.pk, next_start, num_threads=2)
+        self.assertEqual(self.texts(comments), ['根2', '回复2', '根1', '回复1'])
+        comments, next_start = Comment.objects.thread_page(self.post.pk, next_start, num_threads=2)
+        self.assertEqual(self.texts(comments), ['根0', '回复0'])
+        self.assertIsNone(next_start)
+
+    def test_max_depth(self):
+        parent = None
+        for i in range(MAX_DEPTH + 2):
+            parent = self.comment(str(i), parent=parent)
+        self.assertEqual(parent.depth, MAX_DEPTH - 1)
+
+    def test_delete_thread(self):
+        root = self.comment('根')
+        self.comment('回复', parent=root)
+        root.delete()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_reply_view(self):
+        root = self.comment('根')
+        url = reverse('comments:comment', kwargs={'post_pk': self.post.pk})
+        data = {'name': '回复者', 'email': 'b@b.com', 'text': '回复内容', 'parent': root.pk}
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertEqual(Comment.objects.get(text='回复内容').parent, root)
+
+        # 不能回复其它文章下的评论
+        other = Post.objects.create(title='其它文章', body='内容', category=self.post.category, author=self.user)
+        other_url = reverse('comments:comment', kwargs={'post_pk': other.pk})
+        self.assertEqual(self.client.post(other_url, data).status_code, 404)
+
+    def test_render_without_extra_queries(self):
+        root = self.comment('根')
+        self.comment('回复', parent=root)
+        template = Template('{% load comments_extras %}{% show_comments post %}')
+        self.post.num_comments = 2
+        context = Context({'post': self.post, 'request': RequestFactory().get('/')})
+        with self.assertNumQueries(1):
+            html = template.render(context)
+        self.assertIn('comment-depth-1', html)
+        self.assertIn('?reply={}'.format(root.pk), html)
@@ -5,4 +5,5 @@ from . import views
 app_name = 'comments'
 urlpatterns = [
     path('comment/<int:post_pk>', views.comment, name='comment'),
+    path('comment/<int:post_pk>/form/', views.comment_form, name='form'),
 ]
\ No newline at end of file
@@ -2,12 +2,35 @@ from django.shortcuts import render
 
 # Create your views here.
 
+from blog.http_cache import API_KEY, PRIVATE, cache_policy, post_key, purge
 from blog.models import Post
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib import messages
+from . import spam
 from .forms import CommentForm
-from .templatetags.comments_extras import register
+from .models import Comment
+
+
+def get_client_ip(request):
+    # 部署在 nginx 之后时 REMOTE_ADDR 是 nginx 的地址，nginx 通过 $proxy_add_x_forwarded_for 把客户端地址追加在
+    # X-Forwarded-For 的最后，取最后一个才是 nginx 看到的地址，前面的部分可以被客户端伪造
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded_for:
+        return forwarded_for.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR') or None
+
+
+# 文章详情页会被 CDN 等共享缓存保存（见 blog/http_cache.py），页面中不能包含每个访问者各不相同的 CSRF token，
+# 因此详情页只放一个占位元素，由 script.js 从这个不缓存的地址加载带有 CSRF token 的评论表单。
+# 不是 Ajax 请求时（例如浏览器禁用了 JavaScript，点击了占位元素中的链接）返回只有评论表单的完整页面。
+@require_GET
+@cache_policy(PRIVATE)
+def comment_form(request, post_pk):
+    post = get_object_or_404(Post.objects, pk=post_pk)
+    if request.is_ajax():
+        return render(request, 'comments/inclusions/_form_fragment.html', {'post': post})
+    return render(request, 'comments/preview.html', {'post': post, 'form': CommentForm()})
 
 
 @require_POST
@@ -15,7 +38,7 @@ def comment(request, post_pk):
     # 先获取被评论的文章，因为后面需要把评论和被评论的文章关联起来。
     # 这里我们使用了 django 提供的一个快捷函数 get_object_or_404，
     # 这个函数的作用是当获取的文章（Post）存在时，则获取；否则返回 404 页面给用户。
-    post = get_object_or_404(Post, pk=post_pk)
+    post = get_object_or_404(Post.objects, pk=post_pk)
 
     # django 将用户提交的数据封装在 request.POST 中，这是一个类字典对象。
     # 我们利用这些数据构造了 CommentForm 的实例，这样就生成了一个绑定了用户提交数据的表单。
@@ -29,9 +52,28 @@ def comment(request, post_pk):
 
         # 将评论和被评论的文章关联起来。
         comment.post = post
+        comment.ip_address = get_client_ip(request)
+        # 回复某条评论时表单中带有 parent，只能回复同一篇文章下的评论
+        parent_pk = request.POST.get('parent')
+        if parent_pk:
+            comment.parent = get_object_or_404(
+                Comment, pk=parent_pk if parent_pk.isdigit() else None, post=post,
+            )
+
+        # 保存之前为评论打分，像垃圾评论的评论保存为等待审核，不会显示在文章页上
+        spam.score_comment(comment)
 
         # 最终将评论数据保存进数据库，调用模型实例的 save 方法
         comment.save()
+        spam.record_comment(comment)
+
+        if comment.status != Comment.APPROVED:
+            # 等待审核的评论不影响文章页的内容，不需要清除缓存
+            messages.add_message(request, messages.INFO, '评论已提交，审核通过后才会显示。', extra_tags='info')
+            return redirect(post)
+
+        # 清除共享缓存中这篇文章的详情页和所在的列表页，新的评论和评论数马上可以看到
+        purge(post_key(post.pk), API_KEY)
 
         # 重定向到 post 的详情页，实际上当 redirect 函数接收一个模型的实例时，它会调用这个模型实例的 get_absolute_url 方法，
         # 然后重定向到 get_absolute_url 方法返回的 URL。
@@ -46,12 +88,3 @@ def comment(request, post_pk):
     }
     messages.add_message(request, messages.ERROR, '评论发表失败！请修改表单中的错误后重新提交。', extra_tags='danger')
     return render(request, 'comments/preview.html', context=context)
-
-@register.inclusion_tag('comments/inclusions/_list.html', takes_context=True)
-def show_comments(context, post):
-    comment_list = post.comment_set.all().order_by('-created_time')
-    comment_count = comment_list.count()
-    return {
-        'comment_count': comment_count,
-        'comment_list': comment_list,
-    }
\ No newline at end of file
@@ -2,6 +2,11 @@ from fabric import task
 from invoke import Responder
 from _credentials import github_username, github_password
 
+# manage.py 默认使用本地开发配置，部署时的命令必须使用生产环境的配置：否则 collectstatic 不会合并静态文件、
+# 也不会生成 manifest，warm_cache 会把缓存写进当前进程的本地内存缓存，应用进程根本读不到。
+# 生产环境的配置从环境变量读取 DJANGO_SECRET_KEY，pipenv run 会加载项目根目录下 .env 文件中的环境变量
+MANAGE = 'pipenv run python manage.py {} --settings=blogproject.settings.production'
+
 
 def _get_github_auth_responders():
     """
@@ -22,27 +27,38 @@ def _get_github_auth_responders():
 def deploy(c):
     supervisor_conf_path = '~/etc/'
     supervisor_program_name = 'hellodjango-blog-tutorial'
+    supervisor_tasks_program_name = 'hellodjango-blog-tutorial-tasks'
 
     project_root_path = '~/apps/HelloDjango-blog-tutorial/'
 
-    # 先停止应用
-    with c.cd(supervisor_conf_path):
-        cmd = 'supervisorctl stop {}'.format(supervisor_program_name)
-        c.run(cmd)
-
     # 进入项目根目录，从 Git 拉取最新代码
+    # 拉取代码、安装依赖、预热缓存期间旧的进程继续提供服务，最后才重新启动应用，
+    # 已经运行的进程在重新启动前不会加载新的代码
     with c.cd(project_root_path):
         cmd = 'git pull'
         responders = _get_github_auth_responders()
         c.run(cmd, watchers=responders)
 
     # 安装依赖，迁移数据库，收集静态文件
+    # 生产环境的 STATICFILES_STORAGE 会在 collectstatic 时合并、压缩静态文件，
+    # 生成带哈希的文件名以及 gzip、brotli 压缩版本，见 blog/storage.py
     with c.cd(project_root_path):
         c.run('pipenv install --deploy --ignore-pipfile')
-        c.run('pipenv run python manage.py migrate')
-        c.run('pipenv run python collectstatic --noinput')
+        c.run(MANAGE.format('migrate'))
+        c.run(MANAGE.format('collectstatic --noinput'))
+
+    # 预热缓存：编译全部模板，计算侧边栏、RSS、相关文章和热门文章并预渲染热门文章，新进程启动后直接命中缓存，
+    # 见 blog/warmup.py。
+    # 有页面渲染失败时命令返回非 0，部署在这里停止，旧的进程继续提供服务
+    with c.cd(project_root_path):
+        c.run(MANAGE.format('warm_cache'))
 
-    # 重新启动应用
+    # 重新启动应用。
+    # 后台任务 worker 也需要重新启动才会加载新的代码，supervisor 中的配置类似：
+    #   [program:hellodjango-blog-tutorial-tasks]
+    #   command=pipenv run python manage.py run_tasks --settings=blogproject.settings.production
+    #   directory=/path/to/HelloDjango-blog-tutorial
+    #   stopsignal=INT
     with c.cd(supervisor_conf_path):
-        cmd = 'supervisorctl start {}'.format(supervisor_program_name)
+        cmd = 'supervisorctl restart {} {}'.format(supervisor_program_name, supervisor_tasks_program_name)
         c.run(cmd)
@@ -0,0 +1,175 @@
+"""
+整表操作的内存基准测试，比较一次性加载全部文章和分批流式处理（blog/bulk.py）的内存占用：
+
+- feed-list     旧的 RSS 实现：list(Post.objects...) 加载全部文章后再生成 RSS
+- feed-stream   AllPostsRssFeed：逐批读取文章，边生成边输出
+- delete        QuerySet.delete()：先查出全部文章，再逐个发送删除信号
+- bulk-delete   blog.bulk.bulk_delete：按主键分批用 DELETE 语句删除
+
+每个文章数量先生成一个临时的 SQLite 数据库（正文较长，每篇文章带一条评论和一个标签），
+每种操作都在新的进程中、对数据库的一份副本执行，测量操作期间 Python 分配内存的峰值（tracemalloc）
+和进程的最大常驻内存（ru_maxrss）。流式的两种操作的峰值应该不随文章数量增长：
+
+    python scripts/bench_memory.py [--sizes 1000 4000 16000] [--body-kb 8]
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 将项目根目录添加到 Python 的模块搜索路径中
+back = os.path.dirname
+BASE_DIR = back(back(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+MODES = ('feed-list', 'feed-stream', 'delete', 'bulk-delete')
+
+
+def setup_django(database):
+    import django
+    from django.conf import settings
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogproject.settings.local')
+    settings.DATABASES['default']['NAME'] = database
+    # 和生产环境一样，派生数据的更新写入任务队列，不在删除时同步执行
+    settings.BACKGROUND_TASKS_EAGER = False
+    django.setup()
+
+
+def prepare(database, size, body_kb):
+    """
+    创建数据库并生成 size 篇文章。
+    """
+    setup_django(database)
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from blog.models import Category, Post, Tag
+    from comments.models import Comment
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('bench')
+    category = Category.objects.create(name='bench')
+    tag = Tag.objects.create(name='bench')
+    paragraph = '这是一段用于测试内存占用的正文。' * 8 + '\n\n'
+    body = paragraph * max(1, body_kb * 1024 // len(paragraph.encode('utf-8')))
+    # bulk_create 不调用 Post.save，需要自己填上 save 中设置的字段
+    now = timezone.now()
+
+    batch = 500
+    for start in range(0, size, batch):
+        posts = Post.objects.bulk_create([
+            Post(title='文章 {}'.format(n), body=body, rendered_body='<p>{}</p>'.format(body),
+                 plain_text=body, modified_time=now, category=category, author=user)
+            for n in range(start, min(start + batch, size))
+        ])
+        # SQLite 的 bulk_create 不返回主键，按标题重新查询
+        pks = Post.objects.filter(title__in=[post.title for post in posts]).values_list('pk', flat=True)
+        Post.tags.through.objects.bulk_create([Post.tags.through(post_id=pk, tag_id=tag.pk) for pk in pks])
+        Comment.objects.bulk_create([
+            Comment(name='bench', email='bench@example.com', text='评论', post_id=pk) for pk in pks
+        ])
+
+
+def run_child(mode, database):
+    """
+    在当前进程中执行 mode 对应的操作并测量，结果以 JSON 输出到标准输出。
+    """
+    setup_django(database)
+
+    from django.urls import reverse
+    from django.utils.feedgenerator import Rss201rev2Feed
+
+    from blog.bulk import bulk_delete
+    from blog.export import PageRenderer
+    from blog.models import Post
+
+    renderer = PageRenderer()
+    tracemalloc.start()
+    start = time.perf_counter()
+    if mode == 'feed-list':
+        feed = Rss201rev2Feed(title='duanlt-blog', link='/', description='duanlt-blog 全部文章')
+        for post in list(Post.objects.select_related('category')):
+            feed.add_item(title='[%s] %s' % (post.category, post.title), link=post.get_absolute_url(),
+                          description=post.body_html)
+        size = len(feed.writeString('utf-8'))
+    elif mode == 'feed-stream':
+        response = renderer.render(reverse('rss'))
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    elif mode == 'delete':
+        size = Post.all_objects.all().delete()[0]
+    else:
+        size = bulk_delete(Post.all_objects.all())
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(json.dumps({
+        'seconds': seconds,
+        'peak': peak,
+        'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'size': size,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较整表操作一次性加载和流式处理的内存占用')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 4000, 16000], help='文章数量')
+    parser.add_argument('--body-kb', type=int, default=8, help='每篇文章正文的大小（KB）')
+    parser.add_argument('--child', choices=MODES + ('prepare',), help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == 'prepare':
+        prepare(args.database, args.size, args.body_kb)
+        return
+    if args.child:
+        run_child(args.child, args.database)
+        return
+
+    script = os.path.abspath(__file__)
+    workdir = tempfile.mkdtemp(prefix='bench-memory-')
+    results = {}
+    try:
+        for size in args.sizes:
+            template = os.path.join(workdir, 'template-{}.sqlite3'.format(size))
+            print('生成 {} 篇文章……'.format(size), file=sys.stderr)
+            subprocess.check_call(
+                [sys.executable, script, '--child', 'prepare', '--database', template,
+                 '--size', str(size), '--body-kb', str(args.body_kb)],
+                cwd=BASE_DIR,
+            )
+            for mode in MODES:
+                database = os.path.join(workdir, 'db.sqlite3')
+                shutil.copyfile(template, database)
+                output = subprocess.check_output(
+                    [sys.executable, script, '--child', mode, '--database', database],
+                    cwd=BASE_DIR,
+                )
+                results[mode, size] = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+            os.remove(template)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # ru_maxrss 在 Linux 上的单位是 KB，在 macOS 上是字节
+    rss_unit = 1 if sys.platform == 'darwin' else 1024
+    print('{:<12} {:>8} {:>10} {:>14} {:>14}'.format('mode', 'posts', 'time', 'python peak', 'max rss'))
+    for mode in MODES:
+        for size in args.sizes:
+            result = results[mode, size]
+            print('{:<12} {:>8} {:>8.2f}s {:>12.1f}MB {:>12.1f}MB'.format(
+                mode, size, result['seconds'], result['peak'] / 2 ** 20, result['maxrss'] * rss_unit / 2 ** 20,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+进程启动耗时的基准测试：测量导入 blogproject.wsgi（即 gunicorn 每个 worker 启动时做的全部事情：django.setup、
+导入所有应用和 URL 配置、编译模板）需要多长时间，并用 python -X importtime 列出最耗时的模块。
+
+每次都在新的进程中运行，结果取中位数。同时检查启动时不应该导入的重量级模块（见 LAZY_MODULES），
+它们应该推迟到第一次使用时才导入：
+
+    python scripts/bench_startup.py [--repeat 5] [--top 15] [--settings blogproject.settings.production]
+
+使用 --save 把结果保存为 JSON，之后用 --compare 和保存的结果比较，跟踪启动耗时的变化：
+
+    python scripts/bench_startup.py --save startup.json
+    python scripts/bench_startup.py --compare startup.json
+
+启动时导入了 LAZY_MODULES 中的模块，或者使用 --max-ms 并且启动耗时超过了限制时，以状态码 1 退出。
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# 将项目根目录添加到 Python 的模块搜索路径中
+back = os.path.dirname
+BASE_DIR = back(back(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+# 启动时不应该导入的模块：Markdown 渲染只在保存文章时用到，django.test 只在预热和静态导出时用到，
+# viewsold 是教程早期版本的视图，已经不在 URL 配置中
+LAZY_MODULES = ('markdown', 'pygments', 'django.test', 'blog.viewsold', 'PIL')
+
+# 子进程中执行的代码：测量导入 blogproject.wsgi 的时间，并输出导入了哪些 LAZY_MODULES
+CHILD_CODE = '''
+import json, sys, time
+start = time.perf_counter()
+import blogproject.wsgi
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'loaded': [name for name in %r if name in sys.modules]}))
+''' % (LAZY_MODULES,)
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def child_env(settings_module):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    # 生产环境的配置要求设置密钥，基准测试中用一个假的即可
+    env.setdefault('DJANGO_SECRET_KEY', 'bench-startup')
+    return env
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出，返回 {模块名: (自身耗时, 累计耗时)}，单位为微秒。
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def run_once(settings_module):
+    """
+    启动两个新的进程：一个不带 importtime 测量真实的启动耗时，一个带 importtime 获取每个模块的导入耗时。
+    """
+    env = child_env(settings_module)
+    output = subprocess.check_output([sys.executable, '-c', CHILD_CODE], cwd=BASE_DIR, env=env)
+    result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import blogproject.wsgi'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True,
+    )
+    result['modules'] = parse_importtime(process.stderr.decode('utf-8'))
+    return result
+
+
+def summarize(runs, top):
+    elapsed = statistics.median(run['elapsed'] for run in runs) * 1000
+    names = set().union(*(run['modules'] for run in runs))
+
+    def median_us(name, index):
+        return statistics.median(run['modules'].get(name, (0, 0))[index] for run in runs)
+
+    self_times = sorted(((median_us(name, 0), name) for name in names), reverse=True)[:top]
+    # 项目自己的模块按累计耗时排列，包含它们导入的第三方模块
+    project = sorted(
+        ((median_us(name, 1), name) for name in names if name.split('.')[0] in ('blog', 'comments', 'blogproject')),
+        reverse=True,
+    )[:top]
+    return {
+        'elapsed_ms': elapsed,
+        'importtime_ms': median_us('blogproject.wsgi', 1) / 1000,
+        'modules': len(names),
+        'loaded': sorted(set().union(*(run['loaded'] for run in runs))),
+        'top_self': [(name, us / 1000) for us, name in self_times],
+        'top_project': [(name, us / 1000) for us, name in project],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量导入 blogproject.wsgi 的启动耗时')
+    parser.add_argument('--settings', default='blogproject.settings.production', help='DJANGO_SETTINGS_MODULE')
+    parser.add_argument('--repeat', type=int, default=5, help='启动的进程数，结果取中位数')
+    parser.add_argument('--top', type=int, default=15, help='列出最耗时的模块数量')
+    parser.add_argument('--save', help='把结果保存到这个 JSON 文件')
+    parser.add_argument('--compare', help='和之前保存的 JSON 结果比较')
+    parser.add_argument('--max-ms', type=float, help='启动耗时超过这个值（毫秒）时以状态码 1 退出')
+    args = parser.parse_args()
+
+    summary = summarize([run_once(args.settings) for _ in range(args.repeat)], args.top)
+
+    print('启动耗时（导入 blogproject.wsgi）：{:.1f}ms，importtime 合计 {:.1f}ms，共导入 {} 个模块'.format(
+        summary['elapsed_ms'], summary['importtime_ms'], summary['modules'],
+    ))
+    print()
+    print('自身耗时最多的模块：')
+    for name, ms in summary['top_self']:
+        print('  {:>8.1f}ms  {}'.format(ms, name))
+    print()
+    print('项目模块的累计耗时：')
+    for name, ms in summary['top_project']:
+        print('  {:>8.1f}ms  {}'.format(ms, name))
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        print()
+        print('和 {} 比较：启动耗时 {:.1f}ms -> {:.1f}ms（{:+.1f}ms），模块数 {} -> {}'.format(
+            args.compare, previous['elapsed_ms'], summary['elapsed_ms'],
+            summary['elapsed_ms'] - previous['elapsed_ms'], previous['modules'], summary['modules'],
+        ))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    if summary['loaded']:
+        print()
+        print('启动时导入了应该推迟导入的模块：{}'.format('、'.join(summary['loaded'])))
+        failed = True
+    if args.max_ms is not None and summary['elapsed_ms'] > args.max_ms:
+        print()
+        print('启动耗时超过了 {:.0f}ms 的限制'.format(args.max_ms))
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+模板加载方式的启动基准测试，比较三种配置：
+
+- filesystem   每次都从文件读取并编译模板（不使用 cached.Loader）
+- cached       使用 cached.Loader，但启动时不预先编译，第一批请求承担编译开销
+- cached+warm  使用 cached.Loader，并在启动时调用 blog.warmup.warm_templates，即生产环境的配置
+
+每种配置都在新的进程中运行，测量启动耗时、启动后第一次渲染首页和文章详情页的耗时（time-to-first-response），
+以及之后平均每次渲染的耗时。使用本地开发配置和其中的数据库，运行前先执行 migrate 并用 scripts/fake.py 生成数据：
+
+    python scripts/bench_templates.py [--renders 50] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 将项目根目录添加到 Python 的模块搜索路径中
+back = os.path.dirname
+BASE_DIR = back(back(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+MODES = ('filesystem', 'cached', 'cached+warm')
+
+BASE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def run_child(mode, renders):
+    """
+    在当前进程中按 mode 配置模板加载方式并测量，结果以 JSON 输出到标准输出。
+    """
+    start = time.perf_counter()
+
+    import django
+    from django.conf import settings
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogproject.settings.local')
+    # 模板引擎在第一次使用时才创建，在 django.setup 之前修改配置即可生效
+    template_settings = settings.TEMPLATES[0]
+    template_settings['APP_DIRS'] = False
+    if mode == 'filesystem':
+        template_settings['OPTIONS']['loaders'] = BASE_LOADERS
+    else:
+        template_settings['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', BASE_LOADERS)]
+    django.setup()
+
+    from django.urls import reverse
+
+    from blog.export import PageRenderer
+    from blog.models import Post
+    from blog.warmup import warm_templates
+
+    if mode == 'cached+warm':
+        warm_templates()
+    startup = time.perf_counter() - start
+
+    post = Post.objects.order_by('-created_time').first()
+    if post is None:
+        raise SystemExit('数据库中没有文章，请先运行 scripts/fake.py')
+    urls = [reverse('blog:index'), reverse('blog:detail', kwargs={'pk': post.pk})]
+    # 不经过 HTTP，直接走完整的请求处理流程，并且不会增加文章阅读量
+    renderer = PageRenderer()
+
+    first = {}
+    for url in urls:
+        t = time.perf_counter()
+        renderer.render(url)
+        first[url] = time.perf_counter() - t
+    first_response = time.perf_counter() - start
+
+    per_render = {}
+    for url in urls:
+        t = time.perf_counter()
+        for _ in range(renders):
+            renderer.render(url)
+        per_render[url] = (time.perf_counter() - t) / renders
+
+    print(json.dumps({
+        'startup': startup,
+        'first_response': first_response,
+        'first': first,
+        'per_render': per_render,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较不同模板加载方式的启动和渲染耗时')
+    parser.add_argument('--renders', type=int, default=50, help='每个页面重复渲染的次数')
+    parser.add_argument('--repeat', type=int, default=3, help='每种配置启动的进程数，结果取中位数')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.renders)
+        return
+
+    results = {}
+    for mode in MODES:
+        runs = []
+        for _ in range(args.repeat):
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, '--renders', str(args.renders)],
+                cwd=BASE_DIR,
+            )
+            runs.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+        results[mode] = runs
+
+    def median(runs, *keys):
+        values = []
+        for run in runs:
+            value = run
+            for key in keys:
+                value = value[key]
+            values.append(value)
+        return statistics.median(values) * 1000
+
+    urls = list(results[MODES[0]][0]['per_render'])
+    header = '{:<12} {:>10} {:>12}'.format('mode', 'startup', 'first resp.')
+    header += ''.join(' {:>14} {:>14}'.format('first ' + url, 'avg ' + url) for url in urls)
+    print(header)
+    for mode, runs in results.items():
+        row = '{:<12} {:>8.1f}ms {:>10.1f}ms'.format(
+            mode, median(runs, 'startup'), median(runs, 'first_response'),
+        )
+        for url in urls:
+            row += ' {:>12.2f}ms {:>12.2f}ms'.format(median(runs, 'first', url), median(runs, 'per_render', url))
+        print(row)
+
+    baseline = results['filesystem']
+    print()
+    for url in urls:
+        saved = median(baseline, 'per_render', url) - median(results['cached+warm'], 'per_render', url)
+        print('cached+warm 相比 filesystem 每次渲染 {} 节省 {:.2f}ms'.format(url, saved))
+
+
+if __name__ == '__main__':
+    main()
@@ -19,16 +19,20 @@ if __name__ == '__main__':
 
     # 这是整个脚本最为重要的部分。首先设置 DJANGO_SETTINGS_MODULE 环境变量，这将指定 django 启动时使用的配置文件，然后运行 django.setup() 启动 django。
     # 这是关键步骤，只有在 django 启动后，我们才能使用 django 的 ORM 系统。django 启动后，就可以导入各个模型，以便创建数据。
+    from blog.bulk import bulk_delete
     from blog.models import Category, Post, Tag
+    from blog.signals import posts_changed_in_bulk
     from comments.models import Comment
     from django.contrib.auth.models import User
     # 这一段脚本用于清除旧数据，因此每次运行脚本，都会清除原有数据，然后重新生成。
+    # 用 bulk_delete 分批删除，不会把全部文章读入内存，也不会为每篇文章发送一次信号，删除完后统一清除一次缓存。
     print('clean database')
-    Post.objects.all().delete()
-    Category.objects.all().delete()
-    Tag.objects.all().delete()
-    Comment.objects.all().delete()
+    bulk_delete(Comment.all_objects.all())
+    bulk_delete(Post.all_objects.all())
+    bulk_delete(Category.objects.all())
+    bulk_delete(Tag.objects.all())
     User.objects.all().delete()
+    posts_changed_in_bulk()
     print('create a blog user')
     user = User.objects.create_superuser('admin', 'admin@hellogithub.com', 'admin')
 